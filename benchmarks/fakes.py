@@ -0,0 +1,366 @@
+"""Deterministic local stand-ins for the services a call talks to.
+
+Used by the load test (benchmarks/load_test.py) and the offline agent tests.
+None of these open a network connection to a provider: the LLM and TTS
+plugins sleep for a configurable latency and return scripted output, FakeS3
+keeps objects in memory and WebhookSink is a local HTTP server that counts
+the webhooks it receives. Sessions are driven with text, so STT is modelled
+as a delay before each user turn rather than as a plugin.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+from collections import Counter
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from aiohttp import web
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    APIConnectOptions,
+    llm,
+    tts,
+    utils,
+)
+from livekit.agents.voice.io import AudioOutput, AudioOutputCapabilities
+
+from shared import plugin_pool
+from shared.plugin_pool import PipelineSpec, PluginKey
+from shared.tokens import estimate_tokens
+
+
+@dataclass(frozen=True)
+class FakeLatency:
+    """Provider latencies injected by the fake plugins, in seconds"""
+
+    stt: float = 0.2
+    llm_ttft: float = 0.4
+    llm_tokens_per_second: float = 80.0
+    tts_ttfb: float = 0.25
+    # speaking rate used to size the synthesized audio
+    tts_chars_per_second: float = 15.0
+    # paid once by every new LLM/TTS instance, like opening its connection
+    connect: float = 0.0
+
+    @classmethod
+    def instant(cls) -> FakeLatency:
+        return cls(stt=0.0, llm_ttft=0.0, llm_tokens_per_second=0.0, tts_ttfb=0.0)
+
+
+@dataclass(frozen=True)
+class FakeResponse:
+    """What the fake LLM answers to a user message.
+
+    With ``tool_calls`` the first completion only calls the tools, and
+    ``text`` is spoken once their outputs are in the chat context.
+    """
+
+    text: str
+    tool_calls: tuple[tuple[str, dict[str, Any]], ...] = ()
+
+
+DEFAULT_RESPONSE = FakeResponse("Sure, could you tell me a little more about that?")
+
+
+class FakeLLM(llm.LLM):
+    """Answers from a script keyed by a substring of the latest user message"""
+
+    def __init__(
+        self,
+        responses: dict[str, FakeResponse] | None = None,
+        *,
+        latency: FakeLatency | None = None,
+    ) -> None:
+        super().__init__()
+        self._responses = responses or {}
+        self._latency = latency or FakeLatency()
+        self._connected = False
+
+    @property
+    def model(self) -> str:
+        return "fake"
+
+    def respond_to(self, user_text: str) -> FakeResponse:
+        lowered = user_text.lower()
+        for trigger, response in self._responses.items():
+            if trigger.lower() in lowered:
+                return response
+        return DEFAULT_RESPONSE
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list[llm.FunctionTool | llm.RawFunctionTool] | None = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs: Any,
+    ) -> FakeLLMStream:
+        return FakeLLMStream(
+            self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options
+        )
+
+
+class FakeLLMStream(llm.LLMStream):
+    async def _run(self) -> None:
+        fake: FakeLLM = self._llm  # type: ignore[assignment]
+        items = self._chat_ctx.items
+        user_text = next(
+            (
+                item.text_content or ""
+                for item in reversed(items)
+                if item.type == "message" and item.role == "user"
+            ),
+            "",
+        )
+        response = fake.respond_to(user_text)
+        answered_tools = bool(items) and items[-1].type == "function_call_output"
+        # like a real model, only call the tools this turn was given
+        available = {
+            llm.utils.get_function_info(tool).name
+            for tool in self._tools
+            if llm.utils.is_function_tool(tool)
+        }
+        tool_calls = [
+            (name, args) for name, args in response.tool_calls if name in available
+        ]
+        request_id = utils.shortuuid()
+
+        if not fake._connected:
+            fake._connected = True
+            await asyncio.sleep(fake._latency.connect)
+        await asyncio.sleep(fake._latency.llm_ttft)
+        if tool_calls and not answered_tools:
+            calls = [
+                llm.FunctionToolCall(
+                    name=name,
+                    arguments=json.dumps(args),
+                    call_id=f"call_{utils.shortuuid()}",
+                )
+                for name, args in tool_calls
+            ]
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    id=request_id,
+                    delta=llm.ChoiceDelta(role="assistant", tool_calls=calls),
+                )
+            )
+            completion_tokens = len(calls) * 10
+        else:
+            words = response.text.split(" ")
+            for i, word in enumerate(words):
+                if i and fake._latency.llm_tokens_per_second:
+                    await asyncio.sleep(1 / fake._latency.llm_tokens_per_second)
+                content = word if i == len(words) - 1 else f"{word} "
+                self._event_ch.send_nowait(
+                    llm.ChatChunk(
+                        id=request_id,
+                        delta=llm.ChoiceDelta(role="assistant", content=content),
+                    )
+                )
+            completion_tokens = len(words)
+
+        prompt_tokens = sum(
+            estimate_tokens(item.text_content or "")
+            for item in items
+            if item.type == "message"
+        )
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                id=request_id,
+                usage=llm.CompletionUsage(
+                    completion_tokens=completion_tokens,
+                    prompt_tokens=prompt_tokens,
+                    total_tokens=prompt_tokens + completion_tokens,
+                ),
+            )
+        )
+
+
+class FakeTTS(tts.TTS):
+    """Renders silence sized to the text's speaking time after ``tts_ttfb``"""
+
+    def __init__(
+        self,
+        *,
+        latency: FakeLatency | None = None,
+        sample_rate: int = 24000,
+        voice: str | None = None,
+    ) -> None:
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=sample_rate,
+            num_channels=1,
+        )
+        self._latency = latency or FakeLatency()
+        self._connected = False
+        self.voice = voice
+
+    def update_options(self, *, voice: str | None = None) -> None:
+        self.voice = voice
+
+    def synthesize(
+        self,
+        text: str,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> FakeChunkedStream:
+        return FakeChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class FakeChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        fake: FakeTTS = self._tts  # type: ignore[assignment]
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=fake.sample_rate,
+            num_channels=1,
+            mime_type="audio/pcm",
+        )
+        if not fake._connected:
+            fake._connected = True
+            await asyncio.sleep(fake._latency.connect)
+        await asyncio.sleep(fake._latency.tts_ttfb)
+        seconds = max(0.2, len(self._input_text) / fake._latency.tts_chars_per_second)
+        output_emitter.push(b"\x00\x00" * int(fake.sample_rate * seconds))
+        output_emitter.flush()
+
+
+class FakeAudioOutput(AudioOutput):
+    """Audio sink that "plays" instantly and records when each segment started"""
+
+    def __init__(self) -> None:
+        super().__init__(
+            label="fake", capabilities=AudioOutputCapabilities(pause=False)
+        )
+        self.segment_starts: list[float] = []
+        self._capturing = False
+        self._pushed = 0.0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if not self._capturing:
+            self._capturing = True
+            self._pushed = 0.0
+            self.segment_starts.append(time.perf_counter())
+        self._pushed += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        self._finish(interrupted=False)
+
+    def clear_buffer(self) -> None:
+        self._finish(interrupted=True)
+
+    def first_audio_after(self, since: float) -> float | None:
+        return next((t for t in self.segment_starts if t >= since), None)
+
+    def _finish(self, *, interrupted: bool) -> None:
+        if self._capturing:
+            self._capturing = False
+            self.on_playback_finished(
+                playback_position=self._pushed, interrupted=interrupted
+            )
+
+
+class FakeS3:
+    """In-memory stand-in for the subset of the boto3 S3 client we use"""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+        self._uploads: dict[str, list[tuple[int, bytes]]] = {}
+        self.bytes_sent = 0
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):  # noqa: N803
+        self.bytes_sent += len(Body)
+        self.objects[Key] = Body
+
+    def upload_file(self, Filename, Bucket, Key):  # noqa: N803
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket, Key, f.read())
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):  # noqa: N803
+        upload_id = f"upload-{len(self._uploads)}-{utils.shortuuid()}"
+        self._uploads[upload_id] = []
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):  # noqa: N803
+        self.bytes_sent += len(Body)
+        self._uploads[UploadId].append((PartNumber, Body))
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):  # noqa: N803
+        parts = dict(self._uploads.pop(UploadId))
+        self.objects[Key] = b"".join(
+            parts[p["PartNumber"]] for p in MultipartUpload["Parts"]
+        )
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):  # noqa: N803
+        self._uploads.pop(UploadId, None)
+
+
+class WebhookSink:
+    """Local HTTP server standing in for the Qualif webhook endpoints"""
+
+    def __init__(self) -> None:
+        self.received: Counter[str] = Counter()
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        self.url = f"http://127.0.0.1:{port}/livekit"
+        return self.url
+
+    async def aclose(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        self.received[data.get("event") or data.get("status") or request.path] += 1
+        return web.json_response({"ok": True})
+
+
+@contextlib.contextmanager
+def fake_plugins(
+    specs: list[PipelineSpec],
+    *,
+    latency: FakeLatency | None = None,
+    responses: dict[str, FakeResponse] | None = None,
+) -> Iterator[None]:
+    """Build fakes wherever the given pipelines would build a real plugin.
+
+    Agents keep calling ``borrow_plugins(PIPELINE)`` as they do in production;
+    only the factories behind the pipeline's plugin keys are swapped out, and
+    they are restored on exit.
+    """
+    latency = latency or FakeLatency()
+    builders = {
+        # sessions are driven with text, so there is no audio to transcribe or
+        # detect turns on; callers add ``latency.stt`` before each user turn
+        "stt": lambda key: None,
+        "llm": lambda key: FakeLLM(responses, latency=latency),
+        "tts": lambda key: FakeTTS(latency=latency, voice=key.voice),
+        "turn_detection": lambda key: None,
+    }
+    keys: set[PluginKey] = {key for spec in specs for key in spec.keys().values()}
+    saved = dict(plugin_pool._FACTORIES)
+    try:
+        for key in keys:
+            plugin_pool.register_factory(key.kind, key.provider)(builders[key.kind])
+        yield
+    finally:
+        plugin_pool._FACTORIES.clear()
+        plugin_pool._FACTORIES.update(saved)
@@ -0,0 +1,198 @@
+"""Check what each persona sends and how soon the caller hears it on the first turn.
+
+Starts every persona's agent against the fake LLM and TTS in
+benchmarks/fakes.py and records the prompt tokens of the first LLM request
+(0 when the opener plays from the phrase cache), its time to first token, and
+the time from session start to the first audio. Each persona runs twice, so
+the second call finds its opener in the phrase cache as production does.
+
+A persona fails the check when the first request carries more than its system
+prompt plus a short opener (the whole prompt sent again as reply
+instructions, say), or when the first audio is later than one LLM and one
+TTS round trip:
+
+    uv run python benchmarks/first_turn.py
+    uv run python benchmarks/first_turn.py --llm-ttft 0.6 --tts-ttfb 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+os.environ.setdefault("PHRASE_CACHE_DIR", tempfile.mkdtemp(prefix="phrase-cache-"))
+
+from livekit.agents import Agent, AgentSession, MetricsCollectedEvent, metrics
+
+from agent import LivspaceAgent
+from dra_homes_inbound.agent import DraHomesInboundAgent
+from fakes import FakeAudioOutput, FakeLatency, FakeTTS, fake_plugins
+from livspace.agent import LivspaceInboundAgent
+from master_agent.agent import MasterOutboundAgent
+from meragi_inbound.agent import MeragiInboundAgent
+from personas import get_persona
+from shared.tokens import estimate_tokens
+
+DIAL_INFO = {
+    "phone_number": "+910000000000",
+    "bridge_id": "bench",
+    "dynamic_vars": {"lead_honorific": "Mr."},
+}
+
+AGENTS: dict[str, Callable[[], Agent]] = {
+    "livspace_inbound": lambda: LivspaceInboundAgent(dial_info=DIAL_INFO),
+    "dra_homes_inbound": lambda: DraHomesInboundAgent(
+        customer_name="Rahul",
+        lead_honorific="Mr.",
+        greeting_time="morning",
+        salutation="Mr.",
+        dial_info=DIAL_INFO,
+    ),
+    "master_outbound": lambda: MasterOutboundAgent(
+        customer_name="Rahul",
+        lead_honorific="Mr.",
+        greeting_time="evening",
+        salutation="Mr.",
+        dial_info=DIAL_INFO,
+    ),
+    "meragi_inbound": lambda: MeragiInboundAgent(
+        customer_name="Priya", dial_info=DIAL_INFO
+    ),
+    "livspace_demo": lambda: LivspaceAgent(dial_info=DIAL_INFO),
+}
+
+# room for the opener's own instructions and the rendered call details
+OPENER_TOKENS = 200
+# streaming the first sentence, scheduling and playout on top of the provider latencies
+SLACK = 0.3
+
+
+@dataclass
+class FirstTurn:
+    persona: str
+    prompt_tokens: int
+    ttft: float | None
+    first_audio: float
+    prompt_budget: int
+    audio_budget: float
+
+    @property
+    def failures(self) -> list[str]:
+        failures = []
+        if self.prompt_tokens > self.prompt_budget:
+            failures.append(
+                f"first request has {self.prompt_tokens} prompt tokens, budget {self.prompt_budget}"
+            )
+        if self.first_audio > self.audio_budget:
+            failures.append(
+                f"first audio after {self.first_audio:.2f}s, budget {self.audio_budget:.2f}s"
+            )
+        return failures
+
+
+async def _first_turn(
+    persona: str, latency: FakeLatency
+) -> tuple[int, int, float | None, float]:
+    """System prompt tokens, then the first request's prompt tokens, ttft and first audio"""
+    with fake_plugins(list(get_persona(persona).pipelines), latency=latency):
+        agent = AGENTS[persona]()
+    system_prompt = estimate_tokens(agent.instructions)
+    # the session-level TTS only speaks for personas whose pipeline has none
+    session = AgentSession(
+        tts=FakeTTS(latency=latency), resume_false_interruption=False
+    )
+    audio = FakeAudioOutput()
+    session.output.audio = audio
+    requests: list[metrics.LLMMetrics] = []
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        if isinstance(ev.metrics, metrics.LLMMetrics):
+            requests.append(ev.metrics)
+
+    started = time.perf_counter()
+    await session.start(agent)
+    while not audio.segment_starts and time.perf_counter() - started < 10:
+        await asyncio.sleep(0.005)
+    first_audio = audio.segment_starts[0] - started
+    if session.current_speech is not None:
+        await session.current_speech.wait_for_playout()
+        # let the scheduler finish with the opener before closing the session
+        await asyncio.sleep(0)
+    await session.aclose()
+
+    if not requests:
+        return system_prompt, 0, None, first_audio
+    return system_prompt, requests[0].prompt_tokens, requests[0].ttft, first_audio
+
+
+async def measure(persona: str, latency: FakeLatency) -> FirstTurn:
+    await _first_turn(persona, latency)  # renders the opener into the phrase cache
+    system_prompt, prompt_tokens, ttft, first_audio = await _first_turn(
+        persona, latency
+    )
+    return FirstTurn(
+        persona=persona,
+        prompt_tokens=prompt_tokens,
+        ttft=ttft,
+        first_audio=first_audio,
+        prompt_budget=system_prompt + OPENER_TOKENS,
+        audio_budget=latency.llm_ttft + latency.tts_ttfb + SLACK,
+    )
+
+
+async def run(args: argparse.Namespace) -> list[FirstTurn]:
+    latency = FakeLatency(llm_ttft=args.llm_ttft, tts_ttfb=args.tts_ttfb)
+    return [await measure(persona, latency) for persona in args.persona or AGENTS]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--persona",
+        action="append",
+        choices=sorted(AGENTS),
+        help="persona to check (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--llm-ttft",
+        type=float,
+        default=FakeLatency.llm_ttft,
+        help="fake LLM time to first token",
+    )
+    parser.add_argument(
+        "--tts-ttfb",
+        type=float,
+        default=FakeLatency.tts_ttfb,
+        help="fake TTS time to first byte",
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(
+        f"{'persona':<20}{'prompt tok':>12}{'budget':>9}{'ttft':>9}{'1st audio':>11}{'budget':>9}"
+    )
+    for r in results:
+        ttft = f"{r.ttft * 1000:.0f}ms" if r.ttft is not None else "-"
+        print(
+            f"{r.persona:<20}{r.prompt_tokens:>12}{r.prompt_budget:>9}{ttft:>9}"
+            f"{r.first_audio * 1000:>9.0f}ms{r.audio_budget * 1000:>7.0f}ms"
+        )
+    failures = [f"{r.persona}: {failure}" for r in results for failure in r.failures]
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Measure the gap a caller hears when the Livspace demo agent transfers them.
+
+Compares the in-place role switch (``RoleAgent.switch_role``) with the old
+handoff, which returned a freshly built Agent from the transfer tool and so
+tore down and rebuilt the whole pipeline. The gap is the time from the
+transfer tool starting to the first audio of the new team's greeting.
+
+The fake LLM and TTS pay ``--connect`` once per new instance, standing in
+for the connections (and STT stream) a rebuilt pipeline has to reopen:
+
+    uv run python benchmarks/handoff.py --runs 20 --connect 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+os.environ.setdefault("PHRASE_CACHE_DIR", tempfile.mkdtemp(prefix="phrase-cache-"))
+
+from livekit.agents import Agent, AgentSession
+
+from agent import PIPELINE, ROLES, LivspaceAgent
+from fakes import FakeAudioOutput, FakeLatency, FakeResponse, fake_plugins
+
+RESPONSES = {
+    "project": FakeResponse(
+        "Hi, this is Raj from Project Support. How can I help?",
+        (("transfer_to_project_support", {}),),
+    ),
+}
+
+
+class _TimedAgent(LivspaceAgent):
+    handoff_started: float | None = None
+
+    async def switch_role(self, name: str) -> str:
+        self.handoff_started = time.perf_counter()
+        return await super().switch_role(name)
+
+
+class _RebuiltTeamAgent(Agent):
+    """What a transfer used to return: a new agent with its own pipeline"""
+
+    def __init__(self, name: str, chat_ctx) -> None:
+        role = ROLES[name]
+        super().__init__(
+            instructions=role.instructions,
+            chat_ctx=chat_ctx,
+            tools=list(role.tools),
+            **PIPELINE.build(),
+        )
+        self._intro = role.intro
+
+    async def on_enter(self) -> None:
+        self.session.generate_reply(instructions=self._intro, allow_interruptions=True)
+
+
+class _RebuildingAgent(LivspaceAgent):
+    handoff_started: float | None = None
+
+    async def switch_role(self, name: str) -> None:
+        self.handoff_started = time.perf_counter()
+        self.session.update_agent(_RebuiltTeamAgent(name, self.chat_ctx))
+
+
+async def _settle(session: AgentSession) -> None:
+    while session.current_speech is not None:
+        await session.current_speech.wait_for_playout()
+        await asyncio.sleep(0)
+
+
+async def measure(agent_cls: type[LivspaceAgent], latency: FakeLatency) -> float:
+    with fake_plugins([PIPELINE], latency=latency, responses=RESPONSES):
+        agent = agent_cls(dial_info={})
+        audio = FakeAudioOutput()
+        session = AgentSession(resume_false_interruption=False)
+        session.output.audio = audio
+        await session.start(agent)
+        await _settle(session)
+
+        session.generate_reply(user_input="I have a question about my project")
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+            started = agent.handoff_started
+            if started is not None and audio.first_audio_after(started) is not None:
+                break
+        await _settle(session)
+        await session.aclose()
+
+    if agent.handoff_started is None:
+        raise RuntimeError("the transfer tool was never called")
+    return audio.first_audio_after(agent.handoff_started) - agent.handoff_started
+
+
+async def run(args: argparse.Namespace) -> None:
+    latency = FakeLatency(
+        llm_ttft=args.llm_ttft, tts_ttfb=args.tts_ttfb, connect=args.connect
+    )
+    print(f"{'handoff':<16}{'p50 gap':>10}{'p95 gap':>10}{'max':>10}")
+    for label, agent_cls in (
+        ("rebuild agent", _RebuildingAgent),
+        ("switch role", _TimedAgent),
+    ):
+        gaps = sorted([await measure(agent_cls, latency) for _ in range(args.runs)])
+        p95 = gaps[min(len(gaps) - 1, int(0.95 * len(gaps)))]
+        print(
+            f"{label:<16}{statistics.median(gaps) * 1000:>8.0f}ms{p95 * 1000:>8.0f}ms{gaps[-1] * 1000:>8.0f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--connect",
+        type=float,
+        default=0.3,
+        help="fake connection setup per new LLM/TTS instance",
+    )
+    parser.add_argument(
+        "--llm-ttft",
+        type=float,
+        default=FakeLatency.llm_ttft,
+        help="fake LLM time to first token",
+    )
+    parser.add_argument(
+        "--tts-ttfb",
+        type=float,
+        default=FakeLatency.tts_ttfb,
+        help="fake TTS time to first byte",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Compare the Livspace prompt with and without the resident knowledge base.
+
+Static mode (default) estimates the prompt tokens sent on every LLM turn:
+
+    uv run python benchmarks/livspace_prompt.py
+
+Live mode also measures time-to-first-token against the configured Gemini
+model (needs GOOGLE_API_KEY in .env.local):
+
+    uv run python benchmarks/livspace_prompt.py --live --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from dotenv import load_dotenv
+from livekit.agents import llm
+
+from livspace import knowledge_base
+from livspace.agent import PIPELINE, LivspaceInboundAgent
+from livspace.constants import INSTRUCTIONS, RESIDENT_INSTRUCTIONS
+from shared.tokens import estimate_tokens, estimate_tool_tokens
+
+load_dotenv(".env.local")
+
+QUESTIONS = [
+    "Hi, I want to get my kitchen done, what's the process?",
+    "Do you charge for the site visit?",
+    "What is your cancellation policy?",
+    "How many cities are you in?",
+]
+
+
+def _tools(include_search: bool) -> list:
+    # bind the tools to an uninitialized agent so no plugins get built
+    agent = LivspaceInboundAgent.__new__(LivspaceInboundAgent)
+    tools = llm.find_function_tools(agent)
+    if not include_search:
+        tools = [
+            t
+            for t in tools
+            if llm.utils.get_function_info(t).name != "search_knowledge_base"
+        ]
+    return tools
+
+
+def static_report() -> None:
+    variants = {
+        "before (resident KB)": (INSTRUCTIONS, _tools(include_search=False)),
+        "after (KB on demand)": (RESIDENT_INSTRUCTIONS, _tools(include_search=True)),
+    }
+    print(
+        f"{'variant':<24}{'prompt chars':>14}{'prompt tok':>12}{'tool tok':>10}{'total tok':>11}"
+    )
+    totals = {}
+    for name, (instructions, tools) in variants.items():
+        prompt_tokens = estimate_tokens(instructions)
+        tool_tokens = estimate_tool_tokens(tools)
+        totals[name] = prompt_tokens + tool_tokens
+        print(
+            f"{name:<24}{len(instructions):>14}{prompt_tokens:>12}{tool_tokens:>10}{totals[name]:>11}"
+        )
+
+    before, after = totals.values()
+    print(
+        f"\nsaved per turn: ~{before - after} tokens ({(before - after) / before:.0%})"
+    )
+
+    print("\nretrieval cost on turns that call search_knowledge_base:")
+    for question in QUESTIONS:
+        passages = knowledge_base.search(question)
+        cost = sum(estimate_tokens(p["section"] + p["content"]) for p in passages)
+        sections = ", ".join(p["section"].split(" > ")[-1] for p in passages) or "-"
+        print(f"  {question[:44]:<46}+{cost:>4} tok  [{sections}]")
+
+
+async def _ttft(
+    model: llm.LLM, instructions: str, tools: list, question: str
+) -> tuple[float, int | None]:
+    chat_ctx = llm.ChatContext()
+    chat_ctx.add_message(role="system", content=instructions)
+    chat_ctx.add_message(role="user", content=question)
+
+    started = time.perf_counter()
+    ttft = None
+    prompt_tokens = None
+    async with model.chat(chat_ctx=chat_ctx, tools=tools) as stream:
+        async for chunk in stream:
+            if ttft is None and chunk.delta is not None:
+                ttft = time.perf_counter() - started
+            if chunk.usage is not None:
+                prompt_tokens = chunk.usage.prompt_tokens
+    return ttft or float("nan"), prompt_tokens
+
+
+async def live_report(runs: int) -> None:
+    model = PIPELINE.build()["llm"]
+    variants = {
+        "before (resident KB)": (INSTRUCTIONS, _tools(include_search=False)),
+        "after (KB on demand)": (RESIDENT_INSTRUCTIONS, _tools(include_search=True)),
+    }
+    print(f"\n{'variant':<24}{'prompt tok':>12}{'ttft p50':>10}{'ttft p95':>10}")
+    for name, (instructions, tools) in variants.items():
+        samples = []
+        prompt_tokens = None
+        for _ in range(runs):
+            for question in QUESTIONS:
+                ttft, prompt_tokens = await _ttft(model, instructions, tools, question)
+                samples.append(ttft)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        print(
+            f"{name:<24}{prompt_tokens or '-':>12}{statistics.median(samples):>10.3f}{p95:>10.3f}"
+        )
+    await model.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="measure time-to-first-token against the real LLM",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="passes over the question set per variant (live mode)",
+    )
+    args = parser.parse_args()
+
+    static_report()
+    if args.live:
+        asyncio.run(live_report(args.runs))
+
+
+if __name__ == "__main__":
+    main()
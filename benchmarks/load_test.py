@@ -0,0 +1,549 @@
+"""Find how many concurrent calls each persona sustains per core.
+
+Runs N simultaneous text-driven sessions of a persona against the fake
+STT/LLM/TTS in benchmarks/fakes.py, with the call's S3 event log going to an
+in-memory S3 and its webhooks to a local HTTP server. For each concurrency
+level it reports per-turn latency (end of user speech to first agent audio),
+event-loop lag, CPU per session and RSS growth:
+
+    uv run python benchmarks/load_test.py
+    uv run python benchmarks/load_test.py --persona livspace_inbound --levels 1,10,50,100
+
+Sessions share one event loop here, whereas the worker runs each job in its
+own process. The loop-lag ceiling therefore describes packing calls into a
+single process, while "calls/core" (one core divided by the CPU a session
+uses) is the process-per-job capacity. Meragi runs on a realtime model in
+production; here the scripted LLM stands in for it, so its numbers only
+cover the agent-side work.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+os.environ.setdefault("PHRASE_CACHE_DIR", tempfile.mkdtemp(prefix="phrase-cache-"))
+os.environ.setdefault("WEBHOOK_SPOOL_DIR", tempfile.mkdtemp(prefix="webhook-spool-"))
+
+from livekit.agents import (
+    Agent,
+    AgentSession,
+    ConversationItemAddedEvent,
+    MetricsCollectedEvent,
+    metrics,
+)
+
+from dra_homes_inbound.agent import DraHomesInboundAgent
+from fakes import (
+    FakeAudioOutput,
+    FakeLatency,
+    FakeResponse,
+    FakeS3,
+    FakeTTS,
+    WebhookSink,
+    fake_plugins,
+)
+from livspace.agent import LivspaceInboundAgent
+from master_agent.agent import MasterOutboundAgent
+from meragi_inbound.agent import MeragiInboundAgent
+from personas import get_persona
+from shared.event_sink import EventSink
+from shared.latency import LatencyTracker
+from shared.s3_log import S3LogWriter
+from shared.serialization import project_event
+from shared.webhooks import drain_webhooks, get_dispatcher, post_webhook, send_webhook
+
+DIAL_INFO = {"phone_number": "+910000000000", "bridge_id": "bench", "trunk_id": "bench"}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A scripted call: what the caller says and how the fake LLM answers"""
+
+    persona: str
+    make_agent: Callable[[], Agent]
+    turns: tuple[str, ...]
+    responses: dict[str, FakeResponse] = field(default_factory=dict)
+
+
+SCENARIOS = {
+    scenario.persona: scenario
+    for scenario in (
+        Scenario(
+            persona="livspace_inbound",
+            make_agent=lambda: LivspaceInboundAgent(dial_info=DIAL_INFO),
+            turns=(
+                "Hi, I want to get my kitchen done.",
+                "What is your cancellation policy?",
+                "I live in 560078, do you serve that area?",
+                "What's the status of project BLR12345?",
+                "Okay, that's all, thanks.",
+            ),
+            responses={
+                "cancellation": FakeResponse(
+                    "You can cancel before the design is signed off for a full refund.",
+                    (("search_knowledge_base", {"query": "cancellation policy"}),),
+                ),
+                "560078": FakeResponse(
+                    "Yes, we serve 560078 in Bangalore.",
+                    (("check_serviceability", {"pincode": "560078"}),),
+                ),
+                "BLR12345": FakeResponse(
+                    "Your project is in the installation phase.",
+                    (
+                        (
+                            "get_project_details",
+                            {"identifier": "BLR12345", "identifier_type": "project_id"},
+                        ),
+                    ),
+                ),
+            },
+        ),
+        Scenario(
+            persona="dra_homes_inbound",
+            make_agent=lambda: DraHomesInboundAgent(
+                customer_name="Rahul",
+                lead_honorific="Mr.",
+                greeting_time="morning",
+                salutation="Mr.",
+                dial_info=DIAL_INFO,
+            ),
+            turns=(
+                "Yes, speaking.",
+                "I'm looking for a three bedroom apartment.",
+                "Somewhere near the airport, maybe next month.",
+                "Okay, thanks.",
+            ),
+        ),
+        Scenario(
+            persona="master_outbound",
+            make_agent=lambda: MasterOutboundAgent(
+                customer_name="Rahul",
+                lead_honorific="Mr.",
+                greeting_time="evening",
+                salutation="Mr.",
+                dial_info=DIAL_INFO,
+            ),
+            turns=(
+                "Yes, who is this?",
+                "I did fill a form last week.",
+                "Call me back tomorrow please.",
+                "Bye.",
+            ),
+        ),
+        Scenario(
+            persona="meragi_inbound",
+            make_agent=lambda: MeragiInboundAgent(
+                customer_name="Priya", dial_info=DIAL_INFO
+            ),
+            turns=(
+                "Hi, I'm planning my wedding in Bangalore.",
+                "Three events, about two hundred guests.",
+                "That works, thank you.",
+            ),
+            responses={
+                "guests": FakeResponse(
+                    "That comes to about nine lakhs in total.",
+                    (
+                        (
+                            "budget_calculator",
+                            {"city": "Bangalore", "number_of_events": 3, "pax": 200},
+                        ),
+                    ),
+                ),
+            },
+        ),
+    )
+}
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up a task that sleeps ``interval``"""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+        self.samples: list[float] = []
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            self.samples.append(
+                max(0.0, time.perf_counter() - started - self._interval)
+            )
+
+
+@dataclass
+class LevelResult:
+    persona: str
+    concurrency: int
+    sessions_failed: int
+    turns: int
+    turn_p50: float | None
+    turn_p95: float | None
+    turn_p99: float | None
+    llm_ttft_p95: float | None
+    loop_lag_p50: float
+    loop_lag_p99: float
+    loop_lag_max: float
+    cpu_seconds_per_session: float
+    cpu_utilisation_per_session: float
+    rss_growth_mb: float
+    webhooks_received: int
+    s3_bytes: int
+
+
+def _percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        # peak rather than current RSS, but still shows growth between levels
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def _wait_for_greeting(
+    session: AgentSession, audio: FakeAudioOutput, timeout: float = 10.0
+) -> None:
+    deadline = time.perf_counter() + timeout
+    while not audio.segment_starts and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    if session.current_speech is not None:
+        await session.current_speech.wait_for_playout()
+
+
+async def run_call(
+    scenario: Scenario,
+    index: int,
+    *,
+    latency: FakeLatency,
+    think_time: float,
+    webhook_url: str,
+    s3: FakeS3,
+) -> tuple[list[float], LatencyTracker]:
+    """One call, with the per-call side work the persona's entrypoint does"""
+    room = f"bench-{scenario.persona}-{index}"
+    audio = FakeAudioOutput()
+    # the session-level TTS only speaks for personas whose pipeline has none
+    session = AgentSession(
+        tts=FakeTTS(latency=latency),
+        preemptive_generation=True,
+        resume_false_interruption=False,
+    )
+    session.output.audio = audio
+
+    usage_collector = metrics.UsageCollector()
+    latency_tracker = LatencyTracker(scenario.persona)
+    events = EventSink(S3LogWriter(s3, "bench"))
+    events.start()
+    events_key = f"{scenario.persona}/{room}/session_events_{room}.jsonl"
+
+    @session.on("metrics_collected")
+    def _on_metrics_collected(ev: MetricsCollectedEvent):
+        usage_collector.collect(ev.metrics)
+        latency_tracker.collect(ev.metrics)
+
+    @session.on("conversation_item_added")
+    def _on_conversation_item_added(ev: ConversationItemAddedEvent):
+        events.emit(project_event(ev), events_key)
+
+    @session.on("function_tools_executed")
+    def _on_function_tools_executed(ev):
+        data = ev.model_dump()
+        data["event"] = "function_tools_executed"
+        post_webhook(data, f"{webhook_url}/events")
+
+    turn_latencies: list[float] = []
+    try:
+        await session.start(scenario.make_agent())
+        await _wait_for_greeting(session, audio)
+        for text in scenario.turns:
+            # the caller talks, then the STT finalizes the transcript
+            await asyncio.sleep(think_time)
+            started = time.perf_counter()
+            await asyncio.sleep(latency.stt)
+            await session.run(user_input=text)
+            first_audio = audio.first_audio_after(started)
+            if first_audio is not None:
+                turn_latencies.append(first_audio - started)
+    finally:
+        await session.aclose()
+        await events.aclose()
+        summary = usage_collector.get_summary()
+        await send_webhook(
+            {
+                "conversation_id": room,
+                "status": "completed",
+                "transcript": session.history.to_dict(),
+                "summary": summary.__dict__,
+                "latency": {
+                    "turns": latency_tracker.waterfall(),
+                    "summary": latency_tracker.summary(),
+                },
+            },
+            f"{webhook_url}/webhook_listener/bench",
+        )
+    return turn_latencies, latency_tracker
+
+
+async def run_level(
+    scenario: Scenario,
+    concurrency: int,
+    *,
+    latency: FakeLatency,
+    think_time: float,
+    ramp: float,
+) -> LevelResult:
+    sink = WebhookSink()
+    webhook_url = await sink.start()
+    s3 = FakeS3()
+    monitor = LoopLagMonitor()
+
+    async def _staggered(index: int):
+        await asyncio.sleep(ramp * index / concurrency)
+        return await run_call(
+            scenario,
+            index,
+            latency=latency,
+            think_time=think_time,
+            webhook_url=webhook_url,
+            s3=s3,
+        )
+
+    gc.collect()
+    rss_before = _rss_bytes()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    monitor.start()
+    with fake_plugins(
+        list(get_persona(scenario.persona).pipelines),
+        latency=latency,
+        responses=scenario.responses,
+    ):
+        results = await asyncio.gather(
+            *(_staggered(i) for i in range(concurrency)), return_exceptions=True
+        )
+    await drain_webhooks()
+    await monitor.aclose()
+    cpu = time.process_time() - cpu_before
+    wall = time.perf_counter() - wall_before
+    gc.collect()
+    rss_growth = _rss_bytes() - rss_before
+    await sink.aclose()
+
+    failed = [r for r in results if isinstance(r, BaseException)]
+    for error in failed[:3]:
+        logging.getLogger("load-test").error(f"session failed: {error!r}")
+    completed = [r for r in results if not isinstance(r, BaseException)]
+    turns = [t for turn_latencies, _ in completed for t in turn_latencies]
+    ttfts = [
+        t["llm_ttft"]
+        for _, tracker in completed
+        for t in tracker.waterfall()
+        if t["llm_ttft"] is not None
+    ]
+    lag = monitor.samples or [0.0]
+    return LevelResult(
+        persona=scenario.persona,
+        concurrency=concurrency,
+        sessions_failed=len(failed),
+        turns=len(turns),
+        turn_p50=_percentile(turns, 50),
+        turn_p95=_percentile(turns, 95),
+        turn_p99=_percentile(turns, 99),
+        llm_ttft_p95=_percentile(ttfts, 95),
+        loop_lag_p50=statistics.median(lag),
+        loop_lag_p99=_percentile(lag, 99) or 0.0,
+        loop_lag_max=max(lag),
+        cpu_seconds_per_session=cpu / concurrency,
+        cpu_utilisation_per_session=cpu / wall / concurrency,
+        rss_growth_mb=rss_growth / concurrency / 1e6,
+        webhooks_received=sum(sink.received.values()),
+        s3_bytes=s3.bytes_sent,
+    )
+
+
+def capacity(
+    levels: list[LevelResult], *, max_lag: float, max_turn_increase: float
+) -> int | None:
+    """Highest concurrency before loop lag or turn latency exceeds its budget"""
+    if not levels or levels[0].turn_p95 is None:
+        return None
+    baseline = levels[0].turn_p95
+    ceiling = None
+    for level in levels:
+        if level.sessions_failed or level.turn_p95 is None:
+            break
+        if (
+            level.loop_lag_p99 > max_lag
+            or level.turn_p95 > baseline + max_turn_increase
+        ):
+            break
+        ceiling = level.concurrency
+    return ceiling
+
+
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def print_report(persona: str, levels: list[LevelResult], ceiling: int | None) -> None:
+    print(f"\n{persona}")
+    print(
+        f"{'calls':>6}{'fail':>6}{'turn p50':>10}{'p95':>7}{'p99':>7}{'ttft p95':>10}"
+        f"{'lag p50':>9}{'p99':>7}{'max':>7}{'cpu s/call':>12}{'core %/call':>13}{'MB/call':>9}"
+    )
+    for r in levels:
+        print(
+            f"{r.concurrency:>6}{r.sessions_failed:>6}{_ms(r.turn_p50):>10}{_ms(r.turn_p95):>7}{_ms(r.turn_p99):>7}"
+            f"{_ms(r.llm_ttft_p95):>10}{_ms(r.loop_lag_p50):>9}{_ms(r.loop_lag_p99):>7}{_ms(r.loop_lag_max):>7}"
+            f"{r.cpu_seconds_per_session:>12.3f}{r.cpu_utilisation_per_session:>13.2%}{r.rss_growth_mb:>9.2f}"
+        )
+    busiest = levels[-1]
+    per_core = (
+        1 / busiest.cpu_utilisation_per_session
+        if busiest.cpu_utilisation_per_session
+        else float("inf")
+    )
+    print(
+        f"single-loop ceiling: {ceiling if ceiling is not None else '-'} calls; CPU-bound estimate: ~{per_core:.0f} calls/core"
+    )
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    latency = FakeLatency(
+        stt=args.stt,
+        llm_ttft=args.llm_ttft,
+        llm_tokens_per_second=args.llm_tps,
+        tts_ttfb=args.tts_ttfb,
+    )
+    report: dict[str, Any] = {}
+    for persona in args.persona or list(SCENARIOS):
+        scenario = SCENARIOS[persona]
+        levels = []
+        for concurrency in args.levels:
+            levels.append(
+                await run_level(
+                    scenario,
+                    concurrency,
+                    latency=latency,
+                    think_time=args.think_time,
+                    ramp=args.ramp,
+                )
+            )
+        ceiling = capacity(
+            levels, max_lag=args.max_lag, max_turn_increase=args.max_turn_increase
+        )
+        print_report(persona, levels, ceiling)
+        report[persona] = {
+            "levels": [asdict(level) for level in levels],
+            "ceiling": ceiling,
+        }
+    await get_dispatcher().aclose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--persona",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="persona to test (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--levels",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[1, 5, 10, 25, 50],
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=1.0,
+        help="seconds the caller speaks before each turn",
+    )
+    parser.add_argument(
+        "--ramp",
+        type=float,
+        default=1.0,
+        help="seconds over which a level's calls are started",
+    )
+    parser.add_argument(
+        "--stt", type=float, default=FakeLatency.stt, help="fake STT finalization delay"
+    )
+    parser.add_argument(
+        "--llm-ttft",
+        type=float,
+        default=FakeLatency.llm_ttft,
+        help="fake LLM time to first token",
+    )
+    parser.add_argument(
+        "--llm-tps",
+        type=float,
+        default=FakeLatency.llm_tokens_per_second,
+        help="fake LLM tokens/s",
+    )
+    parser.add_argument(
+        "--tts-ttfb",
+        type=float,
+        default=FakeLatency.tts_ttfb,
+        help="fake TTS time to first byte",
+    )
+    parser.add_argument(
+        "--max-lag",
+        type=float,
+        default=0.05,
+        help="loop lag p99 budget for the ceiling",
+    )
+    parser.add_argument(
+        "--max-turn-increase",
+        type=float,
+        default=0.1,
+        help="turn p95 growth over 1 call allowed for the ceiling",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Measure what logging a call's session events costs, before and after projection.
+
+Builds the events of a scripted call (state changes, transcripts, conversation
+items, tool calls and the metrics every turn emits) and serializes each one
+the old way, ``json.dumps(ev.model_dump())``, and the new way,
+``dumps_line(project_event(ev))``. It reports the CPU per event by event type
+and the bytes of the whole session log, plus its zstd size when the zstandard
+package is installed:
+
+    uv run python benchmarks/serialization.py
+    uv run python benchmarks/serialization.py --turns 40 --repeat 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from livekit.agents import metrics
+from livekit.agents.llm import ChatMessage, FunctionCall, FunctionCallOutput
+from livekit.agents.voice.events import (
+    AgentStateChangedEvent,
+    CloseEvent,
+    CloseReason,
+    ConversationItemAddedEvent,
+    FunctionToolsExecutedEvent,
+    MetricsCollectedEvent,
+    SpeechCreatedEvent,
+    UserInputTranscribedEvent,
+    UserStateChangedEvent,
+)
+
+from shared.serialization import compressor, dumps_line, orjson, project_event
+
+LLM_LABEL = "livekit.plugins.openai.llm.LLM"
+TTS_LABEL = "livekit.plugins.elevenlabs.tts.TTS"
+STT_LABEL = "livekit.plugins.deepgram.stt.STT"
+
+
+def call_events(turns: int) -> list[Any]:
+    """The session events of a call with ``turns`` user turns"""
+    now = time.time()
+    events: list[Any] = []
+    for turn in range(turns):
+        speech_id = f"speech_{turn:04d}"
+        user_text = "Haan, mujhe apne 3BHK ke liye modular kitchen aur wardrobes chahiye, budget around 8 lakh."
+        agent_text = "Great choice! Can you tell me your pincode so I can check if we serve your area?"
+        events += [
+            UserStateChangedEvent(old_state="listening", new_state="speaking"),
+            UserInputTranscribedEvent(
+                transcript=user_text[:40], is_final=False, language="hi"
+            ),
+            UserInputTranscribedEvent(
+                transcript=user_text, is_final=True, language="hi"
+            ),
+            UserStateChangedEvent(old_state="speaking", new_state="listening"),
+            MetricsCollectedEvent(
+                metrics=metrics.VADMetrics(
+                    label="livekit.plugins.silero.vad.VAD",
+                    timestamp=now,
+                    idle_time=0.2,
+                    inference_duration_total=0.03,
+                    inference_count=32,
+                )
+            ),
+            MetricsCollectedEvent(
+                metrics=metrics.STTMetrics(
+                    label=STT_LABEL,
+                    request_id=f"stt_{turn}",
+                    timestamp=now,
+                    duration=0.0,
+                    audio_duration=3.1,
+                    streamed=True,
+                )
+            ),
+            MetricsCollectedEvent(
+                metrics=metrics.EOUMetrics(
+                    timestamp=now,
+                    end_of_utterance_delay=0.52,
+                    transcription_delay=0.21,
+                    on_user_turn_completed_delay=0.0,
+                    last_speaking_time=now,
+                    speech_id=speech_id,
+                )
+            ),
+            ConversationItemAddedEvent(
+                item=ChatMessage(
+                    role="user", content=[user_text], transcript_confidence=0.93
+                )
+            ),
+            AgentStateChangedEvent(old_state="listening", new_state="thinking"),
+            # a real SpeechHandle needs a running loop; it is excluded from the dump anyway
+            SpeechCreatedEvent.model_construct(
+                type="speech_created",
+                user_initiated=False,
+                source="generate_reply",
+                created_at=now,
+            ),
+            MetricsCollectedEvent(
+                metrics=metrics.LLMMetrics(
+                    label=LLM_LABEL,
+                    request_id=f"chatcmpl_{turn}",
+                    timestamp=now,
+                    duration=0.9,
+                    ttft=0.42,
+                    cancelled=False,
+                    completion_tokens=38,
+                    prompt_tokens=2400 + 60 * turn,
+                    prompt_cached_tokens=2304,
+                    total_tokens=2438 + 60 * turn,
+                    tokens_per_second=42.2,
+                    speech_id=speech_id,
+                )
+            ),
+            MetricsCollectedEvent(
+                metrics=metrics.TTSMetrics(
+                    label=TTS_LABEL,
+                    request_id=f"tts_{turn}",
+                    timestamp=now,
+                    ttfb=0.23,
+                    duration=1.1,
+                    audio_duration=4.6,
+                    cancelled=False,
+                    characters_count=len(agent_text),
+                    streamed=True,
+                    speech_id=speech_id,
+                )
+            ),
+            AgentStateChangedEvent(old_state="thinking", new_state="speaking"),
+            ConversationItemAddedEvent(
+                item=ChatMessage(role="assistant", content=[agent_text])
+            ),
+            AgentStateChangedEvent(old_state="speaking", new_state="listening"),
+        ]
+        if turn % 4 == 3:
+            call = FunctionCall(
+                call_id=f"call_{turn}",
+                name="check_pincode",
+                arguments='{"pincode": "560102"}',
+            )
+            output = FunctionCallOutput(
+                call_id=call.call_id,
+                name=call.name,
+                output='{"serviceable": true}',
+                is_error=False,
+            )
+            events.append(
+                FunctionToolsExecutedEvent(
+                    function_calls=[call], function_call_outputs=[output]
+                )
+            )
+    events.append(CloseEvent(error=None, reason=CloseReason.USER_INITIATED))
+    return events
+
+
+def before(ev: Any) -> bytes:
+    return (json.dumps(ev.model_dump()) + "\n").encode("utf-8")
+
+
+def after(ev: Any) -> bytes:
+    return dumps_line(project_event(ev))
+
+
+def cpu_per_event(
+    serialize: Callable[[Any], bytes], events: list[Any], repeat: int
+) -> dict[str, float]:
+    """Mean CPU seconds per event, by event type (``metrics_collected`` split by metrics type)"""
+    by_type: dict[str, list[Any]] = defaultdict(list)
+    for ev in events:
+        name = (
+            ev.type if ev.type != "metrics_collected" else f"metrics:{ev.metrics.type}"
+        )
+        by_type[name].append(ev)
+
+    cpu: dict[str, float] = {}
+    for name, group in by_type.items():
+        started = time.process_time()
+        for _ in range(repeat):
+            for ev in group:
+                serialize(ev)
+        cpu[name] = (time.process_time() - started) / (repeat * len(group))
+    return cpu
+
+
+def log_size(
+    serialize: Callable[[Any], bytes], events: list[Any]
+) -> tuple[int, int | None]:
+    log = b"".join(serialize(ev) for ev in events)
+    zstd = compressor("zstd")
+    if zstd is None:
+        return len(log), None
+    return len(log), len(zstd.compress(log) + zstd.flush())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--turns", type=int, default=20, help="user turns in the scripted call"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=200, help="times to serialize each event"
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    events = call_events(args.turns)
+    cpu_before = cpu_per_event(before, events, args.repeat)
+    cpu_after = cpu_per_event(after, events, args.repeat)
+    total_before = sum(cpu_before[name] * n for name, n in _counts(events).items())
+    total_after = sum(cpu_after[name] * n for name, n in _counts(events).items())
+    bytes_before, zstd_before = log_size(before, events)
+    bytes_after, zstd_after = log_size(after, events)
+
+    encoder = "orjson" if orjson is not None else "json (orjson not installed)"
+    print(f"{len(events)} events in a {args.turns}-turn call, encoder {encoder}\n")
+    print(f"{'event':<32}{'count':>7}{'before':>11}{'after':>11}")
+    for name, count in _counts(events).items():
+        print(
+            f"{name:<32}{count:>7}{cpu_before[name] * 1e6:>9.1f}us{cpu_after[name] * 1e6:>9.1f}us"
+        )
+    print(f"\n{'per call':<32}{'':>7}{'before':>11}{'after':>11}")
+    print(
+        f"{'CPU':<32}{'':>7}{total_before * 1000:>9.2f}ms{total_after * 1000:>9.2f}ms"
+    )
+    print(f"{'bytes':<32}{'':>7}{bytes_before:>11}{bytes_after:>11}")
+    if zstd_after is not None:
+        print(f"{'bytes, zstd':<32}{'':>7}{zstd_before:>11}{zstd_after:>11}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "events": len(events),
+                    "cpu_per_event": {"before": cpu_before, "after": cpu_after},
+                    "cpu_per_call": {"before": total_before, "after": total_after},
+                    "bytes_per_call": {"before": bytes_before, "after": bytes_after},
+                    "zstd_bytes_per_call": {"before": zstd_before, "after": zstd_after},
+                },
+                f,
+                indent=2,
+            )
+
+
+def _counts(events: list[Any]) -> dict[str, int]:
+    counts: dict[str, int] = defaultdict(int)
+    for ev in events:
+        counts[
+            ev.type if ev.type != "metrics_collected" else f"metrics:{ev.metrics.type}"
+        ] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Profile the cold start of a job process: module imports, then prewarm.
+
+Each run starts a fresh interpreter, imports the worker (or a standalone
+agent module) the way a job process does, and runs its prewarm function. It
+reports the median import and prewarm time over the runs, the slowest
+packages by import time (from ``python -X importtime``) and the time of each
+prewarm step:
+
+    uv run python benchmarks/startup.py
+    uv run python benchmarks/startup.py --personas meragi_inbound --runs 5
+    uv run python benchmarks/startup.py --target meragi_inbound.agent --runs 5
+
+``--personas`` sets the worker's ``PERSONAS`` allow-list, so the worker is
+measured as a deployment serving only those personas would start it.
+
+Without provider keys the plugin clients fail to build and the pool logs a
+warning for each, so the plugin_pool step then only covers the imports. Run
+it with the production `.env.local` to include client construction.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+TARGETS = (
+    "worker",
+    "agent",
+    "livspace.agent",
+    "dra_homes_inbound.agent",
+    "master_agent.agent",
+    "meragi_inbound.agent",
+)
+
+
+def child(target: str) -> None:
+    """Runs in the fresh interpreter: import the target, prewarm it, print the timings"""
+    import importlib
+
+    started = time.perf_counter()
+    module = importlib.import_module(target)
+    imported = time.perf_counter() - started
+
+    from livekit.agents import JobExecutorType, JobProcess
+
+    from shared.plugin_pool import IMPORT_TIMES
+    from shared.startup import prewarm_profile
+
+    proc = JobProcess(
+        executor_type=JobExecutorType.PROCESS, user_arguments=None, http_proxy=None
+    )
+    module.prewarm(proc)
+    profile = prewarm_profile(proc)
+    print(
+        json.dumps(
+            {"import": imported, "plugins": IMPORT_TIMES, "prewarm": profile.steps}
+        )
+    )
+
+
+def run_once(
+    target: str, importtime: bool = False, personas: str | None = None
+) -> tuple[dict, str]:
+    cmd = [
+        sys.executable,
+        *(["-X", "importtime"] if importtime else []),
+        os.path.abspath(__file__),
+        "--child",
+        target,
+    ]
+    env = {**os.environ, "PYTHONPATH": SRC}
+    if personas is not None:
+        env["PERSONAS"] = personas
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--target",
+        choices=TARGETS,
+        default="worker",
+        help="module whose job processes to profile",
+    )
+    parser.add_argument(
+        "--personas",
+        help="comma-separated personas the worker serves (default: PERSONAS or all)",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="fresh interpreters to time"
+    )
+    parser.add_argument("--top", type=int, default=15, help="slowest packages to list")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    from shared.startup import import_time_by_package, parse_importtime
+
+    runs = [run_once(args.target, personas=args.personas)[0] for _ in range(args.runs)]
+    profiled, stderr = run_once(args.target, importtime=True, personas=args.personas)
+    packages = import_time_by_package(parse_importtime(stderr))
+
+    import_median = statistics.median(r["import"] for r in runs)
+    prewarm_median = statistics.median(sum(s for _, s in r["prewarm"]) for r in runs)
+    target = args.target + (f" ({args.personas})" if args.personas else "")
+    print(
+        f"{target}: import {import_median:.2f}s, prewarm {prewarm_median:.2f}s (median of {args.runs} runs)"
+    )
+
+    print(f"\n{'package':<48}{'import':>10}")
+    for package, seconds in list(packages.items())[: args.top]:
+        print(f"{package:<48}{seconds * 1000:>8.0f}ms")
+
+    print(f"\n{'prewarm step':<48}{'median':>10}")
+    for i, (name, _) in enumerate(runs[0]["prewarm"]):
+        seconds = statistics.median(r["prewarm"][i][1] for r in runs)
+        print(f"{name:<48}{seconds * 1000:>8.0f}ms")
+
+    print(f"\n{'plugin module':<48}{'import':>10}")
+    for module, seconds in profiled["plugins"].items():
+        print(f"{module:<48}{seconds * 1000:>8.0f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "target": args.target,
+                    "personas": args.personas,
+                    "runs": runs,
+                    "packages": packages,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ import os
 from typing import Optional, Any
 import asyncio
 
-import boto3
 from dotenv import load_dotenv
 import json
 from livekit.agents import (
@@ -34,64 +33,115 @@ from livekit.agents import (
 from livekit import api, rtc
 
 from livekit.agents.llm import function_tool
-from livekit.plugins import deepgram, noise_cancellation, openai, silero, elevenlabs, google
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from livekit.plugins import noise_cancellation, silero
 from constants import MASTER_INSTRUCTIONS
-from projectagent import ProjectAgent
-from newprojectagent import NewProjectAgent
+import projectagent
+import newprojectagent
+from shared.capacity import CapacityGuard, LoopLagReporting
+from shared.context_window import BoundedContext, ContextPolicy
+from shared.egress import LazyEgress
+from shared.event_sink import EventSink, jsonl_file_writer
+from shared.handoff import Role, RoleAgent
+from shared.latency import LatencyTracker
+from shared.opener import Opener
+from shared.phrase_cache import say_phrase
+from shared.plugin_pool import PipelineSpec, PluginKey, borrow_plugins, create_plugin_pool, import_plugins
+from shared.serialization import project_event
+from shared.shutdown import ShutdownPipeline
+from shared.startup import log_prewarm, prewarm_profile
+from shared.storage import get_s3_client
 
 logger = logging.getLogger("livspace-agent")
 
 load_dotenv(".env.local")
 
+PIPELINE = PipelineSpec(
+    stt=PluginKey.create("stt", "deepgram"),
+    llm=PluginKey.create("llm", "google", model="gemini-2.5-flash-lite"),
+    tts=PluginKey.create("tts", "elevenlabs", voice="H8bdWZHK2OgZwTN7ponr"),
+    turn_detection=PluginKey.create("turn_detection", "multilingual"),
+)
+import_plugins(PIPELINE)
+
+PERSONA = "livspace_demo"
+GOODBYE = "Thank you for calling. Goodbye!"
+# The scripted first line of MASTER_INSTRUCTIONS, played from the phrase cache
+OPENER = Opener(phrase=(
+    "Welcome to Livspace, India's most trusted home interiors brand. My name is Deepika. To connect you with the "
+    "right expert, could you please tell me if you're calling about a new home interior project or an existing "
+    "project with us?",
+))
+
+
+@function_tool
+async def get_customer_project_details(context: RunContext, customer_name: str = "Subham"):
+    """Use this tool to lookup the project details for the customer."""
+    logger.info(f"Looking up project details for {customer_name}")
+    return f"Thank you, {customer_name}. I have your project details. I am now connecting you to our Project Support team who can best assist you with your query. Please stay on the line."
+
+
+@function_tool
+async def transfer_to_project_support(context: RunContext):
+    """Transfer the call to the Project Support team."""
+    logger.info("Transferring call to Project Support team")
+    return await context.session.current_agent.switch_role(projectagent.ROLE.name)
+
+
+@function_tool
+async def transfer_to_new_project_team(context: RunContext):
+    """Transfer the call to the New Project team."""
+    logger.info("Transferring call to New Project team")
+    return await context.session.current_agent.switch_role(newprojectagent.ROLE.name)
+
+
+# The teams are roles of one agent: a transfer swaps instructions, tools and
+# voice in place instead of rebuilding the pipeline
+ROLES = {
+    role.name: role
+    for role in (
+        Role(
+            name="main",
+            instructions=MASTER_INSTRUCTIONS,
+            tools=(get_customer_project_details, transfer_to_project_support, transfer_to_new_project_team),
+            voice=PIPELINE.tts.voice,
+            intro="Welcome the caller back and ask what else you can help them with.",
+        ),
+        projectagent.ROLE,
+        newprojectagent.ROLE,
+    )
+}
+
+
+class LivspaceAgent(BoundedContext, RoleAgent):
+    # history sent with each LLM turn; older turns are folded into a summary
+    context_policy = ContextPolicy(keep_turns=6, history_tokens=2000)
 
-class LivspaceAgent(Agent):
     def __init__(self,
                  chat_ctx=None,
                  dial_info=dict[str, Any]) -> None:
         self.__name__ = "livspace-agent"
         super().__init__(
-            instructions=MASTER_INSTRUCTIONS,
-            stt=deepgram.STT(),
-            llm=google.LLM(model="gemini-2.5-flash-lite"),
-            tts=elevenlabs.TTS(voice_id="H8bdWZHK2OgZwTN7ponr"),
-            turn_detection=MultilingualModel(),
+            ROLES,
+            "main",
             chat_ctx=chat_ctx,
+            **borrow_plugins(PIPELINE),
         )
 
         self.dial_info = dial_info
         self.participant: rtc.RemoteParticipant | None = None
 
     async def on_enter(self) -> None:
-        self.session.generate_reply(instructions=MASTER_INSTRUCTIONS)
-
-    # all functions annotated with @function_tool will be passed to the LLM when this
-    # agent is active
-    
-    @function_tool
-    async def get_customer_project_details(self, context: RunContext, customer_name: str = "Subham"):
-        """Use this tool to lookup the project details for the customer."""
-        logger.info(f"Looking up project details for {customer_name}")
-        return f"Thank you, {customer_name}. I have your project details. I am now connecting you to our Project Support team who can best assist you with your query. Please stay on the line."
-
-    @function_tool
-    async def transfer_to_project_support(self, context: RunContext):
-        """Transfer the call to the Project Support team."""
-        logger.info("Transferring call to Project Support team")
-        return ProjectAgent(chat_ctx=self.chat_ctx)
+        OPENER.start(self)
 
-    @function_tool
-    async def transfer_to_new_project_team(self, context: RunContext):
-        """Transfer the call to the New Project team."""
-        logger.info("Transferring call to New Project team")
-        return NewProjectAgent(chat_ctx=self.chat_ctx)
+    # function tools defined on the class are available in every role; each
+    # role's own tools are in ROLES
         
     @function_tool
     async def end_call(self, context: RunContext):
         """When you decide to end the call after the end of conversation, use this tool."""
 
         logger.info("Ending call")
-        await context.session.generate_reply(instructions="Thank you for calling. Goodbye!")
+        await say_phrase(self, GOODBYE)
         current_speech = context.session.current_speech
         if current_speech is not None:
             await current_speech.wait_for_playout()
@@ -109,7 +159,14 @@ class LivspaceAgent(Agent):
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    profile = prewarm_profile(proc)
+    with profile.step("vad"):
+        proc.userdata["vad"] = silero.VAD.load()
+    with profile.step("plugin_pool"):
+        proc.userdata["plugin_pool"] = create_plugin_pool(PIPELINE)
+    with profile.step("s3_client"):
+        get_s3_client()
+    log_prewarm(proc)
 
 
 async def entrypoint(ctx: JobContext):
@@ -126,15 +183,17 @@ async def entrypoint(ctx: JobContext):
     participant_identity = phone_number = dial_info.get("phone_number")
     logger.info(f"dial_info: {dial_info}")
 
-    # Helper to write event-specific JSON files in the room folder
+    # Events are buffered in memory and appended to disk by a background writer
+    events = EventSink(jsonl_file_writer())
+    events.start()
+
+    # Helper to queue event-specific JSON lines for the room's files
     def write_event_json(data: dict, filename: str = None):
         if filename is None:
             filename = os.path.join(f"session_events_{ctx.room.name}.jsonl")
         else:
             filename = os.path.join(f"{filename}_{ctx.room.name}.jsonl")
-        with open(filename, "a") as f:  # "a" mode for append
-            json.dump(data, f)
-            f.write("\n")  # Add newline after each JSON object
+        events.emit(data, filename)
 
         return filename
 
@@ -171,108 +230,89 @@ async def entrypoint(ctx: JobContext):
     def _on_agent_false_interruption(ev: AgentFalseInterruptionEvent):
         logger.info("false positive interruption, resuming")
         session.generate_reply(instructions=ev.extra_instructions or NOT_GIVEN)
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Agent false interruption: {filename}")
 
     # Metrics collection, to measure pipeline performance
     # For more information, see https://docs.livekit.io/agents/build/metrics/
     usage_collector = metrics.UsageCollector()
+    latency = LatencyTracker(PERSONA)
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
-        filename = write_event_json(ev.model_dump())
+        latency.collect(ev.metrics)
+        filename = write_event_json(project_event(ev))
         logger.info(f"Metrics collected: {filename}")
 
     @session.on("speech_created")
     def _on_speech_created(ev: SpeechCreatedEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Speech created: {filename}")
 
     @session.on("user_state_changed")
     def _on_user_state_changed(ev: UserStateChangedEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"User state changed: {filename}")
 
     @session.on("user_input_transcribed")
     def _on_user_input_transcribed(ev: UserInputTranscribedEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"User input transcribed: {filename}")
 
     @session.on("conversation_item_added")
     def _on_conversation_item_added(ev: ConversationItemAddedEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Conversation item added: {filename}")
 
     @session.on("function_tools_executed")
     def _on_function_tools_executed(ev: FunctionToolsExecutedEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Function tools executed: {filename}")
 
     @session.on("agent_state_changed")
     def _on_agent_state_changed(ev: AgentStateChangedEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Agent state changed: {filename}")
     
     @session.on("error")
     def _on_error(ev: ErrorEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Error: {filename}")
     
     @session.on("close")
     def _on_close(ev: CloseEvent):
-        filename = write_event_json(ev.model_dump())
+        filename = write_event_json(project_event(ev))
         logger.info(f"Close: {filename}")
     
 
 
     async def write_room_events():
-        s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-        s3_region = os.getenv("S3_RECORDING_REGION")
-        s3_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-        s3_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+        # Make sure every queued event is on disk before uploading the log
+        await events.aclose()
 
-        try:
-            s3_client = boto3.client(
-                "s3",
-                region_name=s3_region,
-                aws_access_key_id=s3_access_key,
-                aws_secret_access_key=s3_secret_key,
-            )
-            
-            # Write final transcript and usage data to the single JSONL file
-            transcript_filename = write_event_json(session.history.to_dict(), "transcript")
-            summary = usage_collector.get_summary()
-            summary_filename = write_event_json(summary.__dict__, "summary")
-            
-            # Upload the single JSONL file to the same S3 folder as egress
-            jsonl_filename = f"session_events_{ctx.room.name}.jsonl"
-            s3_key = f"{ctx.room.name}/{jsonl_filename}"
-            
-            if os.path.exists(jsonl_filename):
-                s3_client.upload_file(jsonl_filename, s3_bucket, s3_key)
-                s3_client.upload_file(transcript_filename, s3_bucket, f"{ctx.room.name}/{transcript_filename}")
-                s3_client.upload_file(summary_filename, s3_bucket, f"{ctx.room.name}/{summary_filename}")
-                logger.info(f"Uploaded events to s3://{s3_bucket}/{s3_key}")
-                
-                # Delete the local JSONL file after successful upload
-                os.remove(jsonl_filename)
-                os.remove(transcript_filename)
-                os.remove(summary_filename)
-                logger.info(f"Deleted local file: {jsonl_filename}")
-            else:
-                logger.warning(f"JSONL file {jsonl_filename} not found for upload")
-                
-        except Exception as e:
-            logger.error(f"Failed to upload events to S3: {e}")
+        # Upload the JSONL log, transcript and usage summary to the same S3 folder as egress
+        jsonl_filename = f"session_events_{ctx.room.name}.jsonl"
+        if os.path.exists(jsonl_filename):
+            artifacts.upload_file(jsonl_filename, f"{ctx.room.name}/{jsonl_filename}")
+        else:
+            logger.warning(f"JSONL file {jsonl_filename} not found for upload")
+        artifacts.upload_json(session.history.to_dict(), f"{ctx.room.name}/transcript_{ctx.room.name}.json")
+        artifacts.upload_json(usage_collector.get_summary().__dict__, f"{ctx.room.name}/summary_{ctx.room.name}.json")
+
+        await artifacts.run()
 
 
     ctx.add_shutdown_callback(write_room_events)
 
 
-    lkapi = api.LiveKitAPI()
-    res = await lkapi.egress.start_room_composite_egress(req)
+    # End-of-call uploads share one deadline; stragglers are spooled and retried by a later job
+    artifacts = ShutdownPipeline()
+
+    # Recording starts when the callee answers, so failed dials never start an egress
+    egress = LazyEgress(ctx.api, req)
+    ctx.add_shutdown_callback(egress.aclose)
 
     agent = LivspaceAgent(dial_info=dial_info)
 
@@ -300,20 +340,31 @@ async def entrypoint(ctx: JobContext):
             )
         )
 
+        # Answered: start recording alongside the greeting
+        egress.start()
+
         await session_started
         participant = await ctx.wait_for_participant(identity=participant_identity)
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
-        await lkapi.aclose()
         
     except Exception as e:
         logger.error(f"Failed to create SIP participant: {e}")
+        egress.cancel("dial failed")
         ctx.shutdown()
-        await lkapi.aclose()
         return
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, agent_name="livspace-agent"))
+    capacity = CapacityGuard.single(PERSONA, PIPELINE)
+    capacity.drain_on_signal()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=LoopLagReporting(entrypoint),
+            prewarm_fnc=prewarm,
+            agent_name="livspace-agent",
+            **capacity.worker_options(),
+        )
+    )
     # cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
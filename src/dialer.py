@@ -0,0 +1,123 @@
+"""Outbound campaign dialer.
+
+Queues the leads from a CSV and dispatches one agent job per call, paced to
+``DIALER_CPS`` calls per second and at most ``DIALER_TRUNK_CAPACITY`` calls in
+flight per SIP trunk. Jobs report their outcome back to this process on
+``/campaign/outcome``; busy and unanswered numbers are redialed later.
+
+    uv run python src/dialer.py leads.csv --campaign diwali-followup
+
+The CSV needs ``id``, ``phone_number`` and ``trunk_id`` columns, optionally
+``priority``; every other column is passed to the job in its metadata
+(``persona``, ``bridge_id``, ...). The queue lives in ``DIALER_DB``, so a
+restarted dialer picks up where it stopped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import logging
+import os
+
+from aiohttp import web
+from dotenv import load_dotenv
+from livekit import api
+
+from shared.campaign import AgentDispatcher, CampaignDialer, Lead, LeadStore
+
+logger = logging.getLogger("dialer")
+load_dotenv(".env.local")
+
+
+def load_leads(path: str, campaign: str) -> list[Lead]:
+    leads = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            lead_id = row.pop("id")
+            phone_number = row.pop("phone_number")
+            trunk_id = row.pop("trunk_id")
+            priority = int(row.pop("priority", None) or 0)
+            leads.append(
+                Lead(
+                    id=lead_id,
+                    campaign=campaign,
+                    phone_number=phone_number,
+                    trunk_id=trunk_id,
+                    metadata={k: v for k, v in row.items() if v},
+                    priority=priority,
+                )
+            )
+    return leads
+
+
+def parse_capacity(value: str) -> dict[str, int]:
+    """``"ST_abc=5,ST_def=20"`` -> ``{"ST_abc": 5, "ST_def": 20}``"""
+    capacity = {}
+    for item in filter(None, value.split(",")):
+        trunk, _, limit = item.partition("=")
+        capacity[trunk.strip()] = int(limit)
+    return capacity
+
+
+def outcome_app(dialer: CampaignDialer) -> web.Application:
+    async def outcome(request: web.Request) -> web.Response:
+        data = await request.json()
+        dialer.report_outcome(data["lead_id"], data["status"], data.get("attempt"))
+        return web.json_response({"ok": True})
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(dialer.stats())
+
+    app = web.Application()
+    app.router.add_post("/campaign/outcome", outcome)
+    app.router.add_get("/campaign/stats", stats)
+    return app
+
+
+async def main(args: argparse.Namespace) -> None:
+    store = LeadStore(os.getenv("DIALER_DB", "campaigns.sqlite3"))
+    if args.leads:
+        added = store.add(load_leads(args.leads, args.campaign))
+        logger.info(f"Queued {added} new leads for campaign {args.campaign}")
+
+    port = int(os.getenv("DIALER_PORT", "8089"))
+    callback_url = (
+        os.getenv("DIALER_CALLBACK_URL", f"http://localhost:{port}")
+        + "/campaign/outcome"
+    )
+
+    lkapi = api.LiveKitAPI()
+    dialer = CampaignDialer(
+        store,
+        AgentDispatcher(lkapi, os.getenv("AGENT_NAME", "revspot-voice-agent")),
+        callback_url=callback_url,
+        calls_per_second=float(os.getenv("DIALER_CPS", "1")),
+        trunk_capacity=parse_capacity(os.getenv("DIALER_TRUNK_CAPACITY", "")),
+        default_trunk_capacity=int(os.getenv("DIALER_DEFAULT_TRUNK_CAPACITY", "10")),
+    )
+
+    runner = web.AppRunner(outcome_app(dialer))
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    try:
+        await dialer.run(until_idle=not args.forever)
+    finally:
+        logger.info(f"Dialer stopped: {dialer.stats()}")
+        await runner.cleanup()
+        await lkapi.aclose()
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("leads", nargs="?", help="CSV of leads to queue before dialing")
+    parser.add_argument("--campaign", default="default")
+    parser.add_argument(
+        "--forever",
+        action="store_true",
+        help="keep polling for new leads once the queue is empty",
+    )
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -7,7 +7,6 @@ import asyncio
 import aiohttp
 import re
 
-import boto3
 import datetime
 from dotenv import load_dotenv
 import json
@@ -38,13 +37,54 @@ from livekit.agents import (
 from livekit import api, rtc
 
 from livekit.agents.llm import function_tool
-from livekit.plugins import openai, deepgram, google, elevenlabs, silero, noise_cancellation
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from livekit.plugins import noise_cancellation, silero
 from dra_homes_inbound.constants import INSTRUCTIONS
+from shared.campaign import CampaignCall
+from shared.capacity import CapacityGuard, LoopLagReporting
+from shared.context_window import BoundedContext, ContextPolicy
+from shared.egress import LazyEgress
+from shared.latency import LatencyTracker
+from shared.opener import Opener
+from shared.phrase_cache import Live, say_phrase, warm_phrases
+from shared.plugin_pool import PipelineSpec, PluginKey, borrow_plugins, create_plugin_pool, import_plugins
+from shared.prompts import PromptTemplate, dynamic_vars
+from shared.shutdown import ShutdownPipeline
+from shared.startup import log_prewarm, prewarm_profile
+from shared.storage import get_s3_client
+from shared.voicemail import VoicemailDetector
+from shared.webhooks import post_webhook
 
 logger = logging.getLogger("dra-homes-inbound-agent")
 load_dotenv(".env.local")
 
+PIPELINE = PipelineSpec(
+    stt=PluginKey.create("stt", "elevenlabs"),
+    llm=PluginKey.create("llm", "google", model="gemini-2.5-flash-lite"),
+    tts=PluginKey.create(
+        "tts",
+        "elevenlabs",
+        model="eleven_flash_v2_5",
+        voice="90ipbRoKi4CpHXvKVtl0",
+        voice_settings={"stability": 0.5, "similarity_boost": 0.7, "speed": 1.12},
+        streaming_latency=4,
+    ),
+    turn_detection=PluginKey.create("turn_detection", "multilingual"),
+)
+import_plugins(PIPELINE)
+
+PERSONA = "dra_homes_inbound"
+
+# Parsed once; the {{placeholders}} stay in a prefix that is the same for every call
+PROMPT = PromptTemplate(INSTRUCTIONS, name=PERSONA)
+
+# Where this persona's recordings and logs go, and where call webhooks are sent
+STORAGE_PREFIX = "dra_homes_inbound"
+WEBHOOK_BASE_URL = "https://qualif.revspot.ai/livekit"
+GOODBYE = "Thank you for calling. Goodbye!"
+GREETING_TIMES = ("morning", "afternoon", "evening")
+# Plays from the phrase cache; only the name is synthesized live
+OPENER = Opener(phrase=("Good {greeting_time}, am I speaking with {salutation}", Live("{customer_name}?")))
+
 def extract_sip_status_from_error(error: Exception) -> dict:
     """
     Extract SIP status information from TwirpError or other SIP-related exceptions.
@@ -117,7 +157,10 @@ def identify_call_status(error: Exception) -> str:
     # All other status codes
     return "other"
 
-class DraHomesInboundAgent(Agent):
+class DraHomesInboundAgent(BoundedContext):
+    # history sent with each LLM turn; older turns are folded into a summary
+    context_policy = ContextPolicy(keep_turns=8, history_tokens=2000)
+
     def __init__(self,
                  customer_name: str,
                  lead_honorific: str,
@@ -126,23 +169,11 @@ class DraHomesInboundAgent(Agent):
                  chat_ctx=None,
                  dial_info=dict[str, Any]):
         self.__name__ = "livekit_dra_homes_inbound"
-        instructions = INSTRUCTIONS.replace("{{lead_honorific}}", lead_honorific)
+        instructions = PROMPT.render(dynamic_vars(dial_info), lead_honorific=lead_honorific)
         super().__init__(
             instructions=instructions,
-            stt=elevenlabs.STT(),
-            llm=google.LLM(model="gemini-2.5-flash-lite"),
-            tts=elevenlabs.TTS(
-                model="eleven_flash_v2_5", 
-                voice_id="90ipbRoKi4CpHXvKVtl0",
-                voice_settings=elevenlabs.VoiceSettings(
-                    stability=0.5,
-                    similarity_boost=0.7,
-                    speed=1.12,
-                ),
-                streaming_latency=4
-                ),
-            turn_detection=MultilingualModel(),
             chat_ctx=chat_ctx,
+            **borrow_plugins(PIPELINE),
         )
         self.dial_info = dial_info
         self.customer_name = customer_name
@@ -152,7 +183,12 @@ class DraHomesInboundAgent(Agent):
         self.participant: rtc.RemoteParticipant | None = None
 
     async def on_enter(self) -> None:
-        await self.session.generate_reply(instructions=f"""Good {self.greeting_time}, am I speaking with {self.salutation} {self.customer_name}?""")
+        handle = OPENER.start(self, greeting_time=self.greeting_time, salutation=self.salutation, customer_name=self.customer_name)
+        self._warm_task = warm_phrases(self, [
+            *(OPENER.phrase[0].format(greeting_time=t, salutation=self.salutation) for t in GREETING_TIMES if t != self.greeting_time),
+            GOODBYE,
+        ])
+        await handle
 
     @function_tool
     async def voice_mail_detection(self, context: RunContext):
@@ -237,7 +273,7 @@ class DraHomesInboundAgent(Agent):
             [end_call function called]"""
 
         logger.info("end_call function called")
-        await context.session.generate_reply(instructions="Thank you for calling. Goodbye!", allow_interruptions=True)
+        await say_phrase(self, GOODBYE, allow_interruptions=True)
         current_speech = context.session.current_speech
         if current_speech is not None:
             await current_speech.wait_for_playout()
@@ -254,94 +290,14 @@ class DraHomesInboundAgent(Agent):
         self.participant = participant
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
-
-async def send_webhook_to_qualif(data: dict, url: str):
-    """Send webhook to Qualif"""
-    logger.info(f"Sending webhook to {url}")
-    async with aiohttp.ClientSession() as http_session:
-        async with http_session.post(url, json=data) as response:
-            if response.status == 200 or response.status == 201:
-                logger.info(f"Webhook sent successfully to {url}, Response: {response.status}")
-            else:
-                logger.error(f"Failed to send webhook: {response.status}")
-                error_message = await response.text()
-                logger.error(f"Error message: {error_message}")
-                raise Exception(f"Webhook failed with status {response.status}: {error_message}")
-
-def get_s3_client():
-    """Get S3 client with credentials from environment variables"""
-    s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-    s3_region = os.getenv("S3_RECORDING_REGION")
-    s3_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    s3_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    
-    return boto3.client(
-        "s3",
-        region_name=s3_region,
-        aws_access_key_id=s3_access_key,
-        aws_secret_access_key=s3_secret_key,
-    )
-
-def upload_json_to_s3(data: dict, s3_key: str, s3_client=None) -> str:
-    """Upload JSON data directly to S3 without writing to disk"""
-    if s3_client is None:
-        s3_client = get_s3_client()
-    
-    s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-    
-    # Convert data to JSON string
-    json_str = json.dumps(data, indent=2)
-    json_bytes = json_str.encode('utf-8')
-    
-    # Upload to S3
-    s3_client.put_object(
-        Bucket=s3_bucket,
-        Key=s3_key,
-        Body=json_bytes,
-        ContentType='application/json'
-    )
-    
-    logger.info(f"Uploaded JSON to s3://{s3_bucket}/{s3_key}")
-    return s3_key
-
-def upload_jsonl_to_s3(data: dict, s3_key: str, s3_client=None) -> str:
-    """Upload JSONL data directly to S3 without writing to disk"""
-    if s3_client is None:
-        s3_client = get_s3_client()
-    
-    s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-    
-    # Convert data to JSONL string
-    jsonl_str = json.dumps(data) + "\n"
-    jsonl_bytes = jsonl_str.encode('utf-8')
-    
-    # Upload to S3 (append mode by checking if object exists)
-    try:
-        # Check if object exists
-        s3_client.head_object(Bucket=s3_bucket, Key=s3_key)
-        # If exists, get current content and append
-        response = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-        existing_content = response['Body'].read()
-        new_content = existing_content + jsonl_bytes
-    except s3_client.exceptions.NoSuchKey:
-        # If doesn't exist, create new
-        new_content = jsonl_bytes
-    except Exception as e:
-        # Handle any other S3 errors (like 404) by creating new file
-        logger.warning(f"Could not check existing object {s3_key}, creating new: {e}")
-        new_content = jsonl_bytes
-    
-    s3_client.put_object(
-        Bucket=s3_bucket,
-        Key=s3_key,
-        Body=new_content,
-        ContentType='application/x-ndjson'
-    )
-    
-    logger.info(f"Uploaded JSONL to s3://{s3_bucket}/{s3_key}")
-    return s3_key
-
+    profile = prewarm_profile(proc)
+    with profile.step("vad"):
+        proc.userdata["vad"] = silero.VAD.load()
+    with profile.step("plugin_pool"):
+        proc.userdata["plugin_pool"] = create_plugin_pool(PIPELINE)
+    with profile.step("s3_client"):
+        get_s3_client()
+    log_prewarm(proc)
 
 async def entrypoint(ctx: JobContext):
     """Entrypoint for the agent"""
@@ -406,7 +362,7 @@ async def entrypoint(ctx: JobContext):
         file_outputs=[
             api.EncodedFileOutput(
                 file_type=api.EncodedFileType.MP4,
-                filepath=f"dra_homes_inbound/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
+                filepath=f"{STORAGE_PREFIX}/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
                 s3=api.S3Upload(
                     access_key=os.getenv("AWS_ACCESS_KEY_ID"),
                     secret=os.getenv("AWS_SECRET_ACCESS_KEY"),
@@ -442,11 +398,13 @@ async def entrypoint(ctx: JobContext):
     # Metrics collection, to measure pipeline performance
     # For more information, see https://docs.livekit.io/agents/build/metrics/
     usage_collector = metrics.UsageCollector()
+    latency = LatencyTracker(PERSONA)
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        latency.collect(ev.metrics)
         # filename = write_event_jsonl(ev.model_dump())
         # logger.info(f"Metrics collected: {filename}")
 
@@ -476,8 +434,8 @@ async def entrypoint(ctx: JobContext):
         data = ev.model_dump()
         data["event"] = "function_tools_executed"
         data["room"] = {"sid": room_id}
-        url = f"https://qualif.revspot.ai/livekit/events"
-        asyncio.create_task(send_webhook_to_qualif(data, url))
+        url = f"{WEBHOOK_BASE_URL}/events"
+        post_webhook(data, url)
         logger.info(f"Function tools executed")
         # logger.info(f"Function tools executed: {filename}")
 
@@ -499,8 +457,8 @@ async def entrypoint(ctx: JobContext):
         data = ev.model_dump()
         data["event"] = "session_closed"
         data["room"] = {"sid": room_id}
-        url = f"https://qualif.revspot.ai/livekit/events"
-        asyncio.create_task(send_webhook_to_qualif(data, url))
+        url = f"{WEBHOOK_BASE_URL}/events"
+        post_webhook(data, url)
         ctx.delete_room()
         # await job_ctx.api.room.delete_room(api.DeleteRoomRequest(room=job_ctx.room.name))
     
@@ -530,25 +488,46 @@ async def entrypoint(ctx: JobContext):
                 "status": "completed",
                 "room_id": room_id,
                 # "call_started_ts": call_started_ts,
-                "recording_url": f"https://{os.getenv('S3_RECORDING_BUCKET')}.s3.{os.getenv('S3_RECORDING_REGION')}.amazonaws.com/dra_homes_inbound/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
+                "recording_url": f"https://{os.getenv('S3_RECORDING_BUCKET')}.s3.{os.getenv('S3_RECORDING_REGION')}.amazonaws.com/{STORAGE_PREFIX}/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
                 "transcript": session.history.to_dict(),
-                "summary": summary.__dict__ if summary else {}
+                "summary": summary.__dict__ if summary else {},
+                "latency": {"turns": latency.waterfall(), "summary": latency.summary()},
+                "voicemail": voicemail.reason,
             }
 
-            url = f"https://qualif.revspot.ai/livekit/webhook_listener/{bridge_id}"
+            url = f"{WEBHOOK_BASE_URL}/webhook_listener/{bridge_id}"
             logger.info(f"Sending webhook to {url}")
             
-            await send_webhook_to_qualif(data, url)
+            artifacts.webhook(data, url)
                 
         except Exception as e:
             logger.error(f"Failed to send webhook: {e}")
 
+        # Deliver the completion and any queued event webhooks within the shutdown deadline; the rest are spooled
+        await artifacts.run()
+
 
     ctx.add_shutdown_callback(write_room_events)
 
 
-    lkapi = api.LiveKitAPI()
-    res = await lkapi.egress.start_room_composite_egress(req)
+    # End-of-call uploads and the completion webhook share one deadline
+    artifacts = ShutdownPipeline()
+
+    # Recording starts when the callee answers, so failed dials never start an egress
+    egress = LazyEgress(ctx.api, req)
+    ctx.add_shutdown_callback(egress.aclose)
+
+    # Campaign dials report the call's outcome back to the dialer that placed them
+    campaign_call = CampaignCall(dial_info)
+    ctx.add_shutdown_callback(campaign_call.aclose)
+
+    # Answering machines are caught from the callee's first seconds of audio, before the LLM hears them
+    async def _hang_up_on_voicemail(reason: str) -> None:
+        campaign_call.voicemail()
+        await session.aclose()
+
+    voicemail = VoicemailDetector(session, ctx.proc.userdata["vad"], _hang_up_on_voicemail)
+    ctx.add_shutdown_callback(voicemail.aclose)
 
     agent = DraHomesInboundAgent(customer_name=customer_name, lead_honorific=lead_honorific, greeting_time=greeting_time, salutation=salutation, dial_info=dial_info)
 
@@ -577,12 +556,16 @@ async def entrypoint(ctx: JobContext):
             )
         )
 
+        # Answered: start recording alongside the greeting
+        egress.start()
+        campaign_call.answered()
+
         await session_started
         participant = await ctx.wait_for_participant(identity=participant_identity)
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
-        await lkapi.aclose()
+        voicemail.start(participant)
         
     except Exception as e:
         # Identify the call status (busy, no_answer, other, unknown)
@@ -595,7 +578,7 @@ async def entrypoint(ctx: JobContext):
         logger.error(f"Failed to create SIP participant: {e}")
         logger.error(f"Call Status: {call_status}")
 
-        url = f"https://qualif.revspot.ai/livekit/webhook_listener/{bridge_id}"
+        url = f"{WEBHOOK_BASE_URL}/webhook_listener/{bridge_id}"
         logger.info(f"Sending webhook to {url}")
 
         status_mapping = {
@@ -617,7 +600,11 @@ async def entrypoint(ctx: JobContext):
             "call_status": call_status,
             "error": str(e),
         }
-        await send_webhook_to_qualif(data, url)
+        # record the outcome first so the redial policy sees the real status; the
+        # webhook is queued and drained with the rest at shutdown
+        campaign_call.failed(call_status)
+        egress.cancel(call_status)
+        post_webhook(data, url)
 
         # logger.error(f"SIP Status Code: {sip_info.get('sip_status_code', 'Unknown')}")
         # logger.error(f"SIP Status Message: {sip_info.get('sip_status_message', 'Unknown')}")
@@ -631,10 +618,18 @@ async def entrypoint(ctx: JobContext):
         # logger.error(f"Raw error details: {sip_info.get('raw_error', str(e))}")
         
         ctx.shutdown()
-        await lkapi.aclose()
         return
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, agent_name="livekit_dra_homes_inbound"))
+    capacity = CapacityGuard.single(PERSONA, PIPELINE)
+    capacity.drain_on_signal()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=LoopLagReporting(entrypoint),
+            prewarm_fnc=prewarm,
+            agent_name="livekit_dra_homes_inbound",
+            **capacity.worker_options(),
+        )
+    )
     # cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -1,51 +1,95 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
-from typing import Any
-import asyncio
-import aiohttp
 import re
+from typing import Any
 
-import boto3
-import datetime
 from dotenv import load_dotenv
-import json
+from livekit import api, rtc
 from livekit.agents import (
     NOT_GIVEN,
-    Agent,
     AgentFalseInterruptionEvent,
     AgentSession,
+    CloseEvent,
+    FunctionToolsExecutedEvent,
     JobContext,
     JobProcess,
     MetricsCollectedEvent,
-    SpeechCreatedEvent,
-    UserStateChangedEvent,
-    UserInputTranscribedEvent,
-    ConversationItemAddedEvent,
-    FunctionToolsExecutedEvent,
-    AgentStateChangedEvent,
-    ErrorEvent,
-    CloseEvent,
     RoomInputOptions,
     RunContext,
     WorkerOptions,
     cli,
     metrics,
-    get_job_context,
 )
-
-from livekit import api, rtc
-
 from livekit.agents.llm import function_tool
-from livekit.plugins import openai, deepgram, google, elevenlabs, silero, noise_cancellation
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
-from livspace import project_details
-from livspace.constants import INSTRUCTIONS
+from livekit.plugins import noise_cancellation, silero
+
+from livspace import knowledge_base, pincodes, projects
+from livspace.constants import RESIDENT_INSTRUCTIONS
+from shared.campaign import CampaignCall
+from shared.capacity import CapacityGuard, LoopLagReporting
+from shared.context_window import BoundedContext, ContextPolicy
+from shared.egress import LazyEgress
+from shared.event_sink import EventSink
+from shared.latency import LatencyTracker
+from shared.opener import Opener
+from shared.phrase_cache import say_phrase, warm_phrases
+from shared.plugin_pool import (
+    PipelineSpec,
+    PluginKey,
+    borrow_plugins,
+    create_plugin_pool,
+    import_plugins,
+)
+from shared.s3_log import S3LogWriter
+from shared.shutdown import ShutdownPipeline
+from shared.startup import log_prewarm, prewarm_profile
+from shared.storage import get_s3_client, put_json
+from shared.tool_budget import FILLERS, ToolBudget, budgeted
+from shared.voicemail import VoicemailDetector
+from shared.webhooks import post_webhook
 
 logger = logging.getLogger("livspace-inbound-agent")
 load_dotenv(".env.local")
 
+# CRM and project lookups play a filler after a second and give up after a few, with a result the LLM can explain
+LOOKUP_BUDGET = ToolBudget(
+    timeout=4.0,
+    fallback={"projects": [], "error": "The project system is not responding right now. Offer to call back with the details."},
+)
+CRM_BUDGET = ToolBudget(
+    timeout=6.0,
+    fallback={"success": False, "error": "The CRM did not confirm in time. Tell the customer the team will confirm by SMS."},
+)
+
+PIPELINE = PipelineSpec(
+    stt=PluginKey.create("stt", "elevenlabs"),
+    llm=PluginKey.create("llm", "google", model="gemini-2.5-flash-lite"),
+    tts=PluginKey.create(
+        "tts",
+        "elevenlabs",
+        model="eleven_flash_v2_5",
+        voice="H8bdWZHK2OgZwTN7ponr",
+        voice_settings={"stability": 0.5, "similarity_boost": 0.7, "speed": 1.10},
+        streaming_latency=4,
+    ),
+    turn_detection=PluginKey.create("turn_detection", "multilingual"),
+)
+import_plugins(PIPELINE)
+
+PERSONA = "livspace_inbound"
+
+# Where this persona's recordings and logs go, and where call webhooks are sent
+STORAGE_PREFIX = "livspace_inbound"
+WEBHOOK_BASE_URL = "https://qualif.revspot.ai/livekit"
+GOODBYE = "Thank you for calling. Goodbye!"
+GREETING = "Hi! Liv this side from Livspace, how may I help you?"
+# Fixed Phase 1 greeting, played from the phrase cache
+OPENER = Opener(phrase=(GREETING,))
+
 def extract_sip_status_from_error(error: Exception) -> dict:
     """
     Extract SIP status information from TwirpError or other SIP-related exceptions.
@@ -118,7 +162,10 @@ def identify_call_status(error: Exception) -> str:
     # All other status codes
     return "other"
 
-class LivspaceInboundAgent(Agent):
+class LivspaceInboundAgent(BoundedContext):
+    # history sent with each LLM turn; older turns are folded into a summary
+    context_policy = ContextPolicy(keep_turns=6, history_tokens=2500, tool_output_tokens=150)
+
     def __init__(self,
                 #  customer_name: str,
                 #  lead_honorific: str,
@@ -127,31 +174,37 @@ class LivspaceInboundAgent(Agent):
                  chat_ctx=None,
                  dial_info=dict[str, Any]):
         self.__name__ = "livekit_livspace_inbound"
-        instructions = INSTRUCTIONS
+        # The knowledge base is served by search_knowledge_base, not resident
+        instructions = RESIDENT_INSTRUCTIONS
         super().__init__(
             instructions=instructions,
-            stt=elevenlabs.STT(),
-            llm=google.LLM(model="gemini-2.5-flash-lite"),
-            tts=elevenlabs.TTS(
-                model="eleven_flash_v2_5", 
-                voice_id="H8bdWZHK2OgZwTN7ponr",
-                voice_settings=elevenlabs.VoiceSettings(
-                    stability=0.5,
-                    similarity_boost=0.7,
-                    speed=1.10,
-                ),
-                streaming_latency=4
-                ),
-            turn_detection=MultilingualModel(),
             chat_ctx=chat_ctx,
+            **borrow_plugins(PIPELINE),
         )
         self.dial_info = dial_info
         self.participant: rtc.RemoteParticipant | None = None
 
     async def on_enter(self) -> None:
-        await self.session.generate_reply(instructions=INSTRUCTIONS)
+        handle = OPENER.start(self)
+        self._warm_task = warm_phrases(self, [GOODBYE, *FILLERS])
+        await handle
 
     @function_tool
+    async def search_knowledge_base(self, context: RunContext, query: str):
+        """
+        Searches the Livspace knowledge base for company information, services, pricing tiers, policies (cancellation, refund, returns, warranty), processes and internal systems.
+
+        Args:
+            query: A short search query describing what the caller wants to know (e.g. "site visit charge", "cancellation policy").
+
+        Returns:
+            A list of the most relevant knowledge base passages, each with its section title and content. An empty list means nothing relevant was found.
+        """
+        logger.info(f"Searching knowledge base for {query}")
+        return knowledge_base.search(query)
+
+    @function_tool
+    @budgeted(LOOKUP_BUDGET)
     async def get_project_details(self, context: RunContext, identifier: str, identifier_type: str):
         """ Retrieves details for an existing customer's project using either their Project ID or registered mobile number (phone number).
         
@@ -160,18 +213,12 @@ class LivspaceInboundAgent(Agent):
             identifier_type: Must be either 'project_id' or 'phone_number'.
 
         Returns:
-            A dictionary with the details of the project.
+            A dictionary with the following keys:
+            - projects: The customer's projects, each with its stage, city, property_name and created_at.
+            - error: The error message if no projects were found or the lookup failed, None otherwise.
         """
         logger.info(f"Getting project details for {identifier} with type {identifier_type}")
-
-        if identifier == "BLR98765" or identifier == "9876543210":
-            return project_details.project_details_2
-
-        if identifier == "BLR12345" or identifier == "0123456789":
-            return project_details.project_details_1
-        
-        else:
-            return project_details.project_details_0
+        return await projects.get_lookup().get(identifier, identifier_type)
 
     @function_tool
     async def check_serviceability(self, context: RunContext, pincode: str):
@@ -184,18 +231,13 @@ class LivspaceInboundAgent(Agent):
         Returns:
             A dictionary with the following keys:
             - serviceable: True if Livspace provides services for the given pin code, False otherwise.
-            - city: The city that Livspace provides services for the given pin code.
-            - error: The error message if the pin code is invalid.
+            - city: The city the pin code belongs to, None if it is unknown.
+            - tier: The city tier (1 or 2), None if it is unknown.
+            - experience_centre: The nearest Livspace Experience Centre, None if there is none nearby.
+            - error: The error message if the pin code is invalid, None otherwise.
         """
         logger.info(f"Checking serviceability for {pincode}")
-        if len(pincode) != 6:
-            return {'serviceable': False, 'error': 'Invalid pin code. Please enter a valid 6-digit pin code.'}
-
-        serviceable_pincodes = ["560001", "560103", "560037", "560078"]
-        if pincode in serviceable_pincodes:
-            return {'serviceable': True, 'city': 'Bangalore'}
-        else:
-            return {'servicevable': False}
+        return pincodes.get_service().lookup(pincode)
         
     @function_tool
     async def get_minimum_budget(self, context: RunContext, city: str, project_type: str):
@@ -215,6 +257,7 @@ class LivspaceInboundAgent(Agent):
         return {'minimum_budget': 100000, 'error': None}
 
     @function_tool
+    @budgeted(CRM_BUDGET)
     async def create_lead_ticket(self, context: RunContext, name: str, phone: str, email: str, city: str, pincode: str, project_type: str, scope_summary: str, budget: int):
         """
         Creates a new lead ticket in the CRM for a qualified potential customer.
@@ -239,6 +282,7 @@ class LivspaceInboundAgent(Agent):
         return {'success': True, 'lead_id': '123456', 'error': None}
 
     @function_tool
+    @budgeted(CRM_BUDGET)
     async def schedule_appointment(self, context: RunContext, lead_id: str, appointment_type: str, datetime: str, notes: str):
         """
         Schedules an appointment (briefing call or site visit) for a new lead.
@@ -259,6 +303,7 @@ class LivspaceInboundAgent(Agent):
         return {'success': True, 'appointment_id': '123456', 'error': None}
 
     @function_tool
+    @budgeted(CRM_BUDGET)
     async def create_support_ticket(self, context: RunContext, project_id: str, issue_category: str, summary: str, callback_requested: bool, preferred_time: str):
         """
         Creates a standard support ticket for an existing project query.
@@ -280,6 +325,7 @@ class LivspaceInboundAgent(Agent):
         return {'success': True, 'support_ticket_id': '123456', 'error': None}
 
     @function_tool
+    @budgeted(CRM_BUDGET)
     async def create_escalation_ticket(self, context: RunContext, project_id: str, summary: str, customer_sentiment: str):
         """
         Creates a high-priority escalation ticket for a serious customer complaint.
@@ -355,7 +401,7 @@ class LivspaceInboundAgent(Agent):
             You must provide a specific reason for detecting voicemail. Never call this tool without a valid reason.
             The reason must include a specific reference to the wording in the user message that indicates voicemail."""
 
-        logger.info(f"voice mail detection function called")
+        logger.info("voice mail detection function called")
 
         self._closing_task = asyncio.create_task(self.session.aclose())
         # try:
@@ -400,7 +446,7 @@ class LivspaceInboundAgent(Agent):
             [end_call function called]"""
 
         logger.info("end_call function called")
-        await context.session.generate_reply(instructions="Thank you for calling. Goodbye!", allow_interruptions=True)
+        await say_phrase(self, GOODBYE, allow_interruptions=True)
         current_speech = context.session.current_speech
         if current_speech is not None:
             await current_speech.wait_for_playout()
@@ -417,94 +463,20 @@ class LivspaceInboundAgent(Agent):
         self.participant = participant
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
-
-async def send_webhook_to_qualif(data: dict, url: str):
-    """Send webhook to Qualif"""
-    logger.info(f"Sending webhook to {url}")
-    async with aiohttp.ClientSession() as http_session:
-        async with http_session.post(url, json=data) as response:
-            if response.status == 200 or response.status == 201:
-                logger.info(f"Webhook sent successfully to {url}, Response: {response.status}")
-            else:
-                logger.error(f"Failed to send webhook: {response.status}")
-                error_message = await response.text()
-                logger.error(f"Error message: {error_message}")
-                raise Exception(f"Webhook failed with status {response.status}: {error_message}")
-
-def get_s3_client():
-    """Get S3 client with credentials from environment variables"""
-    s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-    s3_region = os.getenv("S3_RECORDING_REGION")
-    s3_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    s3_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    
-    return boto3.client(
-        "s3",
-        region_name=s3_region,
-        aws_access_key_id=s3_access_key,
-        aws_secret_access_key=s3_secret_key,
-    )
-
-def upload_json_to_s3(data: dict, s3_key: str, s3_client=None) -> str:
-    """Upload JSON data directly to S3 without writing to disk"""
-    if s3_client is None:
-        s3_client = get_s3_client()
-    
-    s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-    
-    # Convert data to JSON string
-    json_str = json.dumps(data, indent=2)
-    json_bytes = json_str.encode('utf-8')
-    
-    # Upload to S3
-    s3_client.put_object(
-        Bucket=s3_bucket,
-        Key=s3_key,
-        Body=json_bytes,
-        ContentType='application/json'
-    )
-    
-    logger.info(f"Uploaded JSON to s3://{s3_bucket}/{s3_key}")
-    return s3_key
-
-def upload_jsonl_to_s3(data: dict, s3_key: str, s3_client=None) -> str:
-    """Upload JSONL data directly to S3 without writing to disk"""
-    if s3_client is None:
-        s3_client = get_s3_client()
-    
-    s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-    
-    # Convert data to JSONL string
-    jsonl_str = json.dumps(data) + "\n"
-    jsonl_bytes = jsonl_str.encode('utf-8')
-    
-    # Upload to S3 (append mode by checking if object exists)
-    try:
-        # Check if object exists
-        s3_client.head_object(Bucket=s3_bucket, Key=s3_key)
-        # If exists, get current content and append
-        response = s3_client.get_object(Bucket=s3_bucket, Key=s3_key)
-        existing_content = response['Body'].read()
-        new_content = existing_content + jsonl_bytes
-    except s3_client.exceptions.NoSuchKey:
-        # If doesn't exist, create new
-        new_content = jsonl_bytes
-    except Exception as e:
-        # Handle any other S3 errors (like 404) by creating new file
-        logger.warning(f"Could not check existing object {s3_key}, creating new: {e}")
-        new_content = jsonl_bytes
-    
-    s3_client.put_object(
-        Bucket=s3_bucket,
-        Key=s3_key,
-        Body=new_content,
-        ContentType='application/x-ndjson'
-    )
-    
-    logger.info(f"Uploaded JSONL to s3://{s3_bucket}/{s3_key}")
-    return s3_key
-
+    profile = prewarm_profile(proc)
+    with profile.step("vad"):
+        proc.userdata["vad"] = silero.VAD.load()
+    with profile.step("plugin_pool"):
+        proc.userdata["plugin_pool"] = create_plugin_pool(PIPELINE)
+    with profile.step("kb_index"):
+        proc.userdata["kb_index"] = knowledge_base.build_index()
+    with profile.step("pincodes"):
+        proc.userdata["pincodes"] = pincodes.PincodeService()
+    with profile.step("projects"):
+        proc.userdata["projects"] = projects.ProjectLookup(projects.FixtureBackend())
+    with profile.step("s3_client"):
+        get_s3_client()
+    log_prewarm(proc)
 
 async def entrypoint(ctx: JobContext):
     """Entrypoint for the agent"""
@@ -518,6 +490,9 @@ async def entrypoint(ctx: JobContext):
     room_id = await ctx.room.sid
     logger.info(f"connected to room {ctx.room.name}, room_id: {room_id}")
 
+    # Pick up an updated pincode file without delaying the call
+    pincodes.get_service().refresh_in_background()
+
     dial_info = json.loads(ctx.job.metadata)
     bridge_id = dial_info.get("bridge_id")
     trunk_id = dial_info.get("trunk_id")
@@ -526,29 +501,32 @@ async def entrypoint(ctx: JobContext):
     logger.info(f"sip_trunk_id : {trunk_id}")
     logger.info(f"Phone number: {phone_number}")
 
-    # Helper to write event-specific JSONL files directly to S3 (one JSON object per line)
+    # Existing customers are asked for their number or project ID first; look
+    # the caller's number up while the greeting plays so that answer is cached
+    projects.get_lookup().prefetch(phone_number)
+
+    # Events are streamed to S3 as multipart uploads and finalized at shutdown
+    events = EventSink(S3LogWriter(get_s3_client(), os.getenv("S3_RECORDING_BUCKET")))
+    events.start()
+
+    # Helper to queue event-specific JSONL lines for S3 (one JSON object per line)
     def write_event_jsonl(data: dict, filename: str = None):
-        """Write event to JSONL file directly to S3"""
+        """Queue event for the session's JSONL log in S3"""
         if filename is None:
-            s3_key = f"livspace_inbound/{ctx.room.name}/session_events_{ctx.room.name}.jsonl"
+            s3_key = f"{STORAGE_PREFIX}/{ctx.room.name}/session_events_{ctx.room.name}.jsonl"
         else:
-            s3_key = f"livspace_inbound/{ctx.room.name}/{filename}_{ctx.room.name}.jsonl"
-        
-        try:
-            upload_jsonl_to_s3(data, s3_key)
-            return s3_key
-        except Exception as e:
-            logger.error(f"Failed to upload JSONL to S3: {e}")
-            return None
+            s3_key = f"{STORAGE_PREFIX}/{ctx.room.name}/{filename}_{ctx.room.name}.jsonl"
+
+        events.emit(data, s3_key)
+        return s3_key
 
     # Helper to write single JSON files directly to S3 (complete JSON object)
-    def write_event_json(data: dict, filename: str):
+    async def write_event_json(data: dict, filename: str):
         """Write event to JSON file directly to S3"""
-        s3_key = f"livspace_inbound/{ctx.room.name}/{filename}_{ctx.room.name}.json"
+        s3_key = f"{STORAGE_PREFIX}/{ctx.room.name}/{filename}_{ctx.room.name}.json"
         
         try:
-            upload_json_to_s3(data, s3_key)
-            return s3_key
+            return await put_json(data, s3_key)
         except Exception as e:
             logger.error(f"Failed to upload JSON to S3: {e}")
             return None
@@ -560,7 +538,7 @@ async def entrypoint(ctx: JobContext):
         file_outputs=[
             api.EncodedFileOutput(
                 file_type=api.EncodedFileType.MP4,
-                filepath=f"livspace_inbound/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
+                filepath=f"{STORAGE_PREFIX}/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
                 s3=api.S3Upload(
                     access_key=os.getenv("AWS_ACCESS_KEY_ID"),
                     secret=os.getenv("AWS_SECRET_ACCESS_KEY"),
@@ -596,11 +574,13 @@ async def entrypoint(ctx: JobContext):
     # Metrics collection, to measure pipeline performance
     # For more information, see https://docs.livekit.io/agents/build/metrics/
     usage_collector = metrics.UsageCollector()
+    latency = LatencyTracker(PERSONA)
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        latency.collect(ev.metrics)
         # filename = asyncio.create_task(write_event_jsonl(ev.model_dump()))
         # logger.info(f"Metrics collected: {filename}")
 
@@ -630,9 +610,9 @@ async def entrypoint(ctx: JobContext):
         data = ev.model_dump()
         data["event"] = "function_tools_executed"
         data["room"] = {"sid": room_id}
-        url = f"https://qualif.revspot.ai/livekit/events"
-        asyncio.create_task(send_webhook_to_qualif(data, url))
-        logger.info(f"Function tools executed")
+        url = f"{WEBHOOK_BASE_URL}/events"
+        post_webhook(data, url)
+        logger.info("Function tools executed")
         # logger.info(f"Function tools executed: {filename}")
 
     # @session.on("agent_state_changed")
@@ -649,24 +629,25 @@ async def entrypoint(ctx: JobContext):
     def _on_close(ev: CloseEvent):
     #     filename = write_event_jsonl(ev.model_dump())
         # logger.info(f"Close: {filename}")
-        logger.info(f"Session closed")
+        logger.info("Session closed")
         data = ev.model_dump()
         data["event"] = "session_closed"
         data["room"] = {"sid": room_id}
-        url = f"https://qualif.revspot.ai/livekit/events"
-        asyncio.create_task(send_webhook_to_qualif(data, url))
+        url = f"{WEBHOOK_BASE_URL}/events"
+        post_webhook(data, url)
         ctx.delete_room()
         # await job_ctx.api.room.delete_room(api.DeleteRoomRequest(room=job_ctx.room.name))
     
 
     async def write_room_events():
+        # Finalize the streamed event logs
+        await events.aclose()
+
         # try:
-        #     s3_client = get_s3_client()
-            
         #     # Write final transcript and usage data directly to S3
-        #     transcript_s3_key = asyncio.create_task(write_event_json(session.history.to_dict(), "transcript"))
+        #     transcript_s3_key = await write_event_json(session.history.to_dict(), "transcript")
         #     summary = usage_collector.get_summary()
-        #     summary_s3_key = asyncio.create_task(write_event_json(summary.__dict__, "summary")) 
+        #     summary_s3_key = await write_event_json(summary.__dict__, "summary")
             
         #     logger.info(f"Uploaded transcript to S3: {transcript_s3_key}")
         #     logger.info(f"Uploaded summary to S3: {summary_s3_key}")
@@ -684,25 +665,46 @@ async def entrypoint(ctx: JobContext):
                 "status": "completed",
                 "room_id": room_id,
                 # "call_started_ts": call_started_ts,
-                "recording_url": f"https://{os.getenv('S3_RECORDING_BUCKET')}.s3.{os.getenv('S3_RECORDING_REGION')}.amazonaws.com/livspace_inbound/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
+                "recording_url": f"https://{os.getenv('S3_RECORDING_BUCKET')}.s3.{os.getenv('S3_RECORDING_REGION')}.amazonaws.com/{STORAGE_PREFIX}/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
                 "transcript": session.history.to_dict(),
-                "summary": summary.__dict__ if summary else {}
+                "summary": summary.__dict__ if summary else {},
+                "latency": {"turns": latency.waterfall(), "summary": latency.summary()},
+                "voicemail": voicemail.reason,
             }
 
-            url = f"https://qualif.revspot.ai/livekit/webhook_listener/{bridge_id}"
+            url = f"{WEBHOOK_BASE_URL}/webhook_listener/{bridge_id}"
             logger.info(f"Sending webhook to {url}")
             
-            await send_webhook_to_qualif(data, url)
+            artifacts.webhook(data, url)
                 
         except Exception as e:
             logger.error(f"Failed to send webhook: {e}")
 
+        # Deliver the completion and any queued event webhooks within the shutdown deadline; the rest are spooled
+        await artifacts.run()
+
 
     ctx.add_shutdown_callback(write_room_events)
 
 
-    lkapi = api.LiveKitAPI()
-    res = await lkapi.egress.start_room_composite_egress(req)
+    # End-of-call uploads and the completion webhook share one deadline
+    artifacts = ShutdownPipeline()
+
+    # Recording starts when the callee answers, so failed dials never start an egress
+    egress = LazyEgress(ctx.api, req)
+    ctx.add_shutdown_callback(egress.aclose)
+
+    # Campaign dials report the call's outcome back to the dialer that placed them
+    campaign_call = CampaignCall(dial_info)
+    ctx.add_shutdown_callback(campaign_call.aclose)
+
+    # Answering machines are caught from the callee's first seconds of audio, before the LLM hears them
+    async def _hang_up_on_voicemail(reason: str) -> None:
+        campaign_call.voicemail()
+        await session.aclose()
+
+    voicemail = VoicemailDetector(session, ctx.proc.userdata["vad"], _hang_up_on_voicemail)
+    ctx.add_shutdown_callback(voicemail.aclose)
 
     agent = LivspaceInboundAgent(dial_info=dial_info)
 
@@ -731,12 +733,16 @@ async def entrypoint(ctx: JobContext):
             )
         )
 
+        # Answered: start recording alongside the greeting
+        egress.start()
+        campaign_call.answered()
+
         await session_started
         participant = await ctx.wait_for_participant(identity=participant_identity)
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
-        await lkapi.aclose()
+        voicemail.start(participant)
         
     except Exception as e:
         # Identify the call status (busy, no_answer, other, unknown)
@@ -749,7 +755,7 @@ async def entrypoint(ctx: JobContext):
         logger.error(f"Failed to create SIP participant: {e}")
         logger.error(f"Call Status: {call_status}")
 
-        url = f"https://qualif.revspot.ai/livekit/webhook_listener/{bridge_id}"
+        url = f"{WEBHOOK_BASE_URL}/webhook_listener/{bridge_id}"
         logger.info(f"Sending webhook to {url}")
 
         status_mapping = {
@@ -771,7 +777,11 @@ async def entrypoint(ctx: JobContext):
             "call_status": call_status,
             "error": str(e),
         }
-        await send_webhook_to_qualif(data, url)
+        # record the outcome first so the redial policy sees the real status; the
+        # webhook is queued and drained with the rest at shutdown
+        campaign_call.failed(call_status)
+        egress.cancel(call_status)
+        post_webhook(data, url)
 
         # logger.error(f"SIP Status Code: {sip_info.get('sip_status_code', 'Unknown')}")
         # logger.error(f"SIP Status Message: {sip_info.get('sip_status_message', 'Unknown')}")
@@ -785,10 +795,18 @@ async def entrypoint(ctx: JobContext):
         # logger.error(f"Raw error details: {sip_info.get('raw_error', str(e))}")
         
         ctx.shutdown()
-        await lkapi.aclose()
         return
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, agent_name="livekit_livspace_inbound"))
+    capacity = CapacityGuard.single(PERSONA, PIPELINE)
+    capacity.drain_on_signal()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=LoopLagReporting(entrypoint),
+            prewarm_fnc=prewarm,
+            agent_name="livekit_livspace_inbound",
+            **capacity.worker_options(),
+        )
+    )
     # cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import functools
+import logging
+
+from livekit.agents import get_job_context
+
+from livspace.constants import KNOWLEDGE_BASE
+from shared.retrieval import BM25Index, chunk_sections
+
+logger = logging.getLogger("livspace-knowledge-base")
+
+
+def build_index() -> BM25Index:
+    """Chunk the Livspace knowledge base (sections 1-8) into a BM25 index"""
+    index = BM25Index(chunk_sections(KNOWLEDGE_BASE))
+    logger.info(f"Built knowledge base index with {len(index)} chunks")
+    return index
+
+
+@functools.lru_cache(maxsize=1)
+def _fallback_index() -> BM25Index:
+    return build_index()
+
+
+def get_index() -> BM25Index:
+    """Return the index built in prewarm, or build one outside of a job"""
+    try:
+        index = get_job_context().proc.userdata.get("kb_index")
+    except RuntimeError:
+        index = None
+    return index if index is not None else _fallback_index()
+
+
+def search(query: str, k: int = 3) -> list[dict[str, str]]:
+    """Top-k knowledge base passages for a caller question, ready for the LLM"""
+    return [
+        {"section": result.chunk.title, "content": result.chunk.text}
+        for result in get_index().search(query, k=k)
+    ]
@@ -0,0 +1,198 @@
+"""Pincode serviceability lookups for the Livspace persona.
+
+The source of truth is a CSV (``PINCODE_FILE``, default the sample
+``pincodes.csv`` next to this module) with the columns::
+
+    pincode,city,tier,serviceable,experience_centre
+
+It is compiled once into a flat index file, one 32-bit slot per possible
+pincode, which every job process memory-maps read-only. Lookups are a single
+array read, and the pages are shared by all processes on the host through the
+page cache instead of each job holding its own copy of ~19k rows.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import functools
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any
+
+from livekit.agents import get_job_context
+
+logger = logging.getLogger("livspace-pincodes")
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(__file__), "pincodes.csv")
+
+_MAGIC = b"PIN1"
+_FIRST = 100000
+_SLOTS = 900000
+_SLOT = struct.Struct("<I")
+
+# slot layout: present | serviceable | tier (2 bits) | city (14 bits) | centre + 1 (14 bits)
+_PRESENT = 1 << 31
+_SERVICEABLE = 1 << 30
+_TIER_SHIFT = 28
+_CITY_SHIFT = 14
+_FIELD_MASK = (1 << 14) - 1
+
+
+def compile_index(source: str, path: str) -> None:
+    """Compile the pincode CSV into an index file, replacing ``path`` atomically"""
+    cities: dict[str, int] = {}
+    centres: dict[str, int] = {}
+    slots = bytearray(_SLOTS * _SLOT.size)
+    count = 0
+    with open(source, newline="") as f:
+        for row in csv.DictReader(f):
+            pincode = int(row["pincode"])
+            if not _FIRST <= pincode < _FIRST + _SLOTS:
+                raise ValueError(f"invalid pincode {row['pincode']!r} in {source}")
+            city = cities.setdefault(row["city"].strip(), len(cities))
+            centre_name = row.get("experience_centre", "").strip()
+            centre = (
+                centres.setdefault(centre_name, len(centres)) + 1 if centre_name else 0
+            )
+            slot = (
+                _PRESENT
+                | (int(row["tier"] or 0) & 3) << _TIER_SHIFT
+                | city << _CITY_SHIFT
+                | centre
+            )
+            if row["serviceable"].strip().lower() in ("1", "true", "yes", "y"):
+                slot |= _SERVICEABLE
+            _SLOT.pack_into(slots, (pincode - _FIRST) * _SLOT.size, slot)
+            count += 1
+
+    if len(cities) > _FIELD_MASK or len(centres) >= _FIELD_MASK:
+        raise ValueError(f"too many cities or experience centres in {source}")
+
+    header = json.dumps(
+        {"count": count, "cities": list(cities), "centres": list(centres)}
+    ).encode()
+    header += b" " * (-len(header) % _SLOT.size)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(slots)
+    os.replace(tmp, path)
+    logger.info(f"Compiled {count} pincodes from {source} into {path}")
+
+
+class PincodeDirectory:
+    """A memory-mapped, read-only view of a compiled pincode index"""
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != _MAGIC:
+            raise ValueError(f"{path} is not a pincode index")
+        (header_len,) = struct.unpack_from("<I", self._mmap, 4)
+        header = json.loads(self._mmap[8 : 8 + header_len])
+        self._offset = 8 + header_len
+        self._cities: list[str] = header["cities"]
+        self._centres: list[str] = header["centres"]
+        self.count: int = header["count"]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lookup(self, pincode: str) -> dict[str, Any]:
+        """Serviceability of a pincode; always returns the same keys"""
+        result: dict[str, Any] = {
+            "pincode": pincode,
+            "serviceable": False,
+            "city": None,
+            "tier": None,
+            "experience_centre": None,
+            "error": None,
+        }
+        pincode = pincode.strip()
+        if len(pincode) != 6 or not pincode.isdigit() or pincode[0] == "0":
+            result["error"] = "Invalid pin code. Please enter a valid 6-digit pin code."
+            return result
+
+        (slot,) = _SLOT.unpack_from(
+            self._mmap, self._offset + (int(pincode) - _FIRST) * _SLOT.size
+        )
+        if not slot & _PRESENT:
+            return result
+
+        centre = slot & _FIELD_MASK
+        result.update(
+            serviceable=bool(slot & _SERVICEABLE),
+            city=self._cities[slot >> _CITY_SHIFT & _FIELD_MASK],
+            tier=slot >> _TIER_SHIFT & 3 or None,
+            experience_centre=self._centres[centre - 1] if centre else None,
+        )
+        return result
+
+
+class PincodeService:
+    """Keeps an up-to-date ``PincodeDirectory`` for a source CSV.
+
+    The index is rebuilt when the CSV is newer than it, and a rebuilt index
+    is swapped in whole, so lookups never see a half-loaded directory.
+    """
+
+    def __init__(self, source: str | None = None, index_dir: str | None = None) -> None:
+        self._source = source or os.getenv("PINCODE_FILE", DEFAULT_SOURCE)
+        index_dir = index_dir or os.getenv("PINCODE_INDEX_DIR", "pincode_index")
+        name = os.path.splitext(os.path.basename(self._source))[0]
+        self._index = os.path.join(index_dir, f"{name}.idx")
+        self._refreshing: asyncio.Task | None = None
+        self.directory = self._load()
+
+    def lookup(self, pincode: str) -> dict[str, Any]:
+        return self.directory.lookup(pincode)
+
+    def refresh_in_background(self) -> None:
+        """Pick up a changed CSV without blocking the caller"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self.refresh())
+
+    async def refresh(self) -> bool:
+        if not self._stale():
+            return False
+        try:
+            self.directory = await asyncio.to_thread(self._load)
+        except Exception as e:
+            logger.error(
+                f"Failed to refresh pincodes from {self._source}, keeping the current set: {e}"
+            )
+            return False
+        return True
+
+    def _stale(self) -> bool:
+        try:
+            return os.path.getmtime(self._source) > os.path.getmtime(self._index)
+        except FileNotFoundError:
+            return True
+
+    def _load(self) -> PincodeDirectory:
+        if self._stale():
+            compile_index(self._source, self._index)
+        directory = PincodeDirectory(self._index)
+        logger.info(f"Loaded {len(directory)} pincodes from {self._index}")
+        return directory
+
+
+@functools.lru_cache(maxsize=1)
+def _fallback_service() -> PincodeService:
+    return PincodeService()
+
+
+def get_service() -> PincodeService:
+    """Return the service loaded in prewarm, or load one outside of a job"""
+    try:
+        service = get_job_context().proc.userdata.get("pincodes")
+    except RuntimeError:
+        service = None
+    return service if service is not None else _fallback_service()
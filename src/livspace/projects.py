@@ -0,0 +1,176 @@
+"""Project lookups for get_project_details.
+
+The CRM answers with a large ``view_data`` payload (a full city object per
+project and a stage histogram the agent never uses). ``ProjectLookup``
+projects it down to what the agent talks about, caches the result per
+project ID / phone number, and collapses concurrent identical lookups into
+one backend request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, ClassVar, Protocol
+
+from livekit.agents import get_job_context
+
+from livspace import project_details
+
+logger = logging.getLogger("livspace-projects")
+
+IDENTIFIER_TYPES = ("project_id", "phone_number")
+
+
+class ProjectBackend(Protocol):
+    async def fetch(self, identifier: str, identifier_type: str) -> dict[str, Any]:
+        """Return the raw CRM response for a project ID or phone number"""
+        ...
+
+
+class FixtureBackend:
+    """Local stand-in for the CRM, serving the recorded responses in project_details"""
+
+    _RESPONSES: ClassVar[dict[str, dict[str, Any]]] = {
+        "BLR98765": project_details.project_details_2,
+        "9876543210": project_details.project_details_2,
+        "BLR12345": project_details.project_details_1,
+        "0123456789": project_details.project_details_1,
+    }
+
+    async def fetch(self, identifier: str, identifier_type: str) -> dict[str, Any]:
+        return self._RESPONSES.get(identifier, project_details.project_details_0)
+
+
+def normalize(identifier: str, identifier_type: str) -> str:
+    if identifier_type == "phone_number":
+        # +91 98765 43210, 098765-43210 and 9876543210 are the same caller
+        return re.sub(r"\D", "", identifier)[-10:]
+    return identifier.strip().upper()
+
+
+def slim(response: dict[str, Any]) -> dict[str, Any]:
+    """Keep only the fields the agent uses from a CRM response"""
+    items = (
+        response.get("response", {})
+        .get("view_data", {})
+        .get("page", {})
+        .get("items", [])
+    )
+    return {
+        "projects": [
+            {
+                "stage": (item.get("stage") or {}).get("display_name"),
+                "city": (item.get("city") or {}).get("display_name"),
+                "property_name": item.get("property_name"),
+                "created_at": item.get("created_at"),
+            }
+            for item in items
+        ],
+        "error": response.get("error") or None,
+    }
+
+
+class ProjectLookup:
+    """TTL/LRU-cached, request-coalescing client for project lookups"""
+
+    def __init__(
+        self, backend: ProjectBackend, *, ttl: float = 300.0, max_entries: int = 2048
+    ) -> None:
+        self._backend = backend
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._cache: OrderedDict[tuple[str, str], tuple[float, dict[str, Any]]] = (
+            OrderedDict()
+        )
+        self._pending: dict[tuple[str, str], asyncio.Future[dict[str, Any]]] = {}
+        self._prefetches: set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.prefetches = 0
+
+    async def get(self, identifier: str, identifier_type: str) -> dict[str, Any]:
+        if identifier_type not in IDENTIFIER_TYPES:
+            return {
+                "projects": [],
+                "error": f"identifier_type must be one of {', '.join(IDENTIFIER_TYPES)}",
+            }
+        key = (identifier_type, normalize(identifier, identifier_type))
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            result = slim(await self._backend.fetch(key[1], identifier_type))
+        except Exception as e:
+            logger.error(f"Project lookup for {identifier_type} {key[1]} failed: {e}")
+            result = {
+                "projects": [],
+                "error": "Project details are unavailable right now.",
+            }
+            future.set_result(result)
+            return result  # not cached, so the next caller retries
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+        self._store(key, result)
+        future.set_result(result)
+        return result
+
+    def prefetch(self, identifier: str, identifier_type: str = "phone_number") -> None:
+        """Start a lookup in the background so the tool call finds it cached or in flight"""
+        if not identifier:
+            return
+        task = asyncio.create_task(self.get(identifier, identifier_type))
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+        self.prefetches += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "prefetches": self.prefetches,
+            "entries": len(self._cache),
+        }
+
+    def _store(self, key: tuple[str, str], result: dict[str, Any]) -> None:
+        self._cache[key] = (time.monotonic() + self._ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=1)
+def _fallback_lookup() -> ProjectLookup:
+    return ProjectLookup(FixtureBackend())
+
+
+def get_lookup() -> ProjectLookup:
+    """Return the lookup created in prewarm, or one shared by this process outside of a job"""
+    try:
+        lookup = get_job_context().proc.userdata.get("projects")
+    except RuntimeError:
+        lookup = None
+    return lookup if lookup is not None else _fallback_lookup()
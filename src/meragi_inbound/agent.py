@@ -1,57 +1,102 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
 from typing import Any
-import asyncio
-import aiohttp
 
-import boto3
-import datetime
 from dotenv import load_dotenv
-import json
+from livekit import api, rtc
 from livekit.agents import (
     NOT_GIVEN,
     Agent,
     AgentFalseInterruptionEvent,
     AgentSession,
+    AgentStateChangedEvent,
+    CloseEvent,
+    ConversationItemAddedEvent,
+    ErrorEvent,
+    FunctionToolsExecutedEvent,
     JobContext,
     JobProcess,
     MetricsCollectedEvent,
-    SpeechCreatedEvent,
-    UserStateChangedEvent,
-    UserInputTranscribedEvent,
-    ConversationItemAddedEvent,
-    FunctionToolsExecutedEvent,
-    AgentStateChangedEvent,
-    ErrorEvent,
-    CloseEvent,
     RoomInputOptions,
     RunContext,
+    SpeechCreatedEvent,
+    UserInputTranscribedEvent,
+    UserStateChangedEvent,
     WorkerOptions,
     cli,
-    metrics,
     get_job_context,
+    metrics,
 )
-
-from livekit import api, rtc
-
 from livekit.agents.llm import function_tool
-from livekit.plugins import openai, deepgram, google, elevenlabs, silero, noise_cancellation
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
+from livekit.plugins import noise_cancellation, silero
+
 from meragi_inbound.constants import INSTRUCTIONS
-from openai.types.beta.realtime.session import TurnDetection as OpenAITurnDetection
+from shared.campaign import CampaignCall
+from shared.capacity import CapacityGuard, LoopLagReporting
+from shared.egress import LazyEgress
+from shared.event_sink import EventSink, jsonl_file_writer
+from shared.latency import LatencyTracker
+from shared.opener import Opener
+from shared.plugin_pool import (
+    PipelineSpec,
+    PluginKey,
+    borrow_plugins,
+    create_plugin_pool,
+    import_plugins,
+)
+from shared.prompts import PromptTemplate, dynamic_vars
+from shared.serialization import dumps, project_event
+from shared.shutdown import ShutdownPipeline
+from shared.startup import log_prewarm, prewarm_profile
+from shared.storage import get_s3_client
+from shared.voicemail import VoicemailDetector
+from shared.webhooks import post_webhook
 
 logger = logging.getLogger("meragi-inbound-agent")
 load_dotenv(".env.local")
 
+PIPELINE = PipelineSpec(
+    llm=PluginKey.create(
+        "llm",
+        "openai_realtime",
+        model="gpt-4o-mini-realtime-preview",
+        voice="marin",
+        temperature=0.8,
+        turn_detection={
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 500,
+            "create_response": True,
+            "interrupt_response": True,
+        },
+    ),
+)
+import_plugins(PIPELINE)
+
+PERSONA = "meragi_inbound"
+
+# Parsed once; the {{placeholders}} stay in a prefix that is the same for every call
+PROMPT = PromptTemplate(INSTRUCTIONS, name=PERSONA)
+# The realtime model opens from SECTION 1 of the session prompt; reply
+# instructions would replace that prompt for the first turn
+OPENER = Opener()
+
+# Where this persona's recordings and logs go, and where call webhooks are sent
+STORAGE_PREFIX = "meragi_inbound"
+WEBHOOK_BASE_URL = "http://localhost:8001/livekit"
+
 class MeragiInboundAgent(Agent):
     def __init__(self,
                  customer_name: str,
                  chat_ctx=None,
                  dial_info=dict[str, Any]):
         self.__name__ = "meragi-inbound-agent"
-        instructions = INSTRUCTIONS.replace("{{customer_name}}", customer_name)
+        instructions = PROMPT.render(dynamic_vars(dial_info), customer_name=customer_name)
         super().__init__(
             instructions=instructions,
             # stt=deepgram.STT(),
@@ -59,26 +104,14 @@ class MeragiInboundAgent(Agent):
             # tts=elevenlabs.TTS(voice_id="H8bdWZHK2OgZwTN7ponr"),
             # turn_detection=MultilingualModel(),
             chat_ctx=chat_ctx,
-            llm=openai.realtime.RealtimeModel(
-                model="gpt-4o-mini-realtime-preview",
-                voice="marin",
-                temperature=0.8,
-                turn_detection=OpenAITurnDetection(
-                        type="server_vad",
-                        threshold=0.5,
-                        prefix_padding_ms=300,
-                        silence_duration_ms=500,
-                        create_response=True,
-                        interrupt_response=True,
-                    )
-                )
+            **borrow_plugins(PIPELINE),
         )
         self.dial_info = dial_info
         self.customer_name = customer_name
         self.participant: rtc.RemoteParticipant | None = None
 
     async def on_enter(self) -> None:
-        self.session.generate_reply(instructions=INSTRUCTIONS.replace("{{customer_name}}", self.customer_name))
+        OPENER.start(self)
 
     @function_tool
     async def voice_mail_detection(self, context: RunContext):
@@ -118,7 +151,7 @@ class MeragiInboundAgent(Agent):
             You must provide a specific reason for detecting voicemail. Never call this tool without a valid reason.
             The reason must include a specific reference to the wording in the user message that indicates voicemail."""
 
-        logger.info(f"voice mail detection function called")
+        logger.info("voice mail detection function called")
         try:
             job_ctx = get_job_context()
             if job_ctx is not None:
@@ -196,21 +229,14 @@ class MeragiInboundAgent(Agent):
         self.participant = participant
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
-
-async def send_webhook_to_qualif(data: dict, url: str):
-    """Send webhook to Qualif"""
-    logger.info(f"Sending webhook to {url}")
-    async with aiohttp.ClientSession() as http_session:
-        async with http_session.post(url, json=data) as response:
-            if response.status == 200 or response.status == 201:
-                logger.info(f"Webhook sent successfully to {url}, Response: {response.status}")
-            else:
-                logger.error(f"Failed to send webhook: {response.status}")
-                error_message = await response.text()
-                logger.error(f"Error message: {error_message}")
-                raise Exception(f"Webhook failed with status {response.status}: {error_message}")
-
+    profile = prewarm_profile(proc)
+    with profile.step("vad"):
+        proc.userdata["vad"] = silero.VAD.load()
+    with profile.step("plugin_pool"):
+        proc.userdata["plugin_pool"] = create_plugin_pool(PIPELINE)
+    with profile.step("s3_client"):
+        get_s3_client()
+    log_prewarm(proc)
 
 async def entrypoint(ctx: JobContext):
     """Entrypoint for the agent"""
@@ -231,24 +257,26 @@ async def entrypoint(ctx: JobContext):
     customer_name = dial_info.get("customer_name")
     logger.info(f"Phone number: {phone_number}, Customer name: {customer_name}")
 
-    # Helper to write event-specific JSONL files (one JSON object per line)
+    # Events are buffered in memory and appended to disk by a background writer
+    events = EventSink(jsonl_file_writer())
+    events.start()
+
+    # Helper to queue event-specific JSONL lines (one JSON object per line)
     def write_event_jsonl(data: dict, filename: str = None):
-        """Write event to JSONL file"""
+        """Queue event for the session's JSONL file"""
         if filename is None:
             filename = os.path.join(f"session_events_{ctx.room.name}.jsonl")
         else:
             filename = os.path.join(f"{filename}_{ctx.room.name}.jsonl")
-        with open(filename, "a") as f:  # "a" mode for append
-            json.dump(data, f)
-            f.write("\n")  # Add newline after each JSON object
+        events.emit(data, filename)
         return filename
 
     # Helper to write single JSON files (complete JSON object)
     def write_event_json(data: dict, filename: str):
         """Write event to JSON file"""
         filename = os.path.join(f"{filename}_{ctx.room.name}.json")
-        with open(filename, "w") as f:  # "w" mode to overwrite
-            json.dump(data, f, indent=2)  # Pretty print for readability
+        with open(filename, "wb") as f:  # "w" mode to overwrite
+            f.write(dumps(data))
         return filename
 
     req = api.RoomCompositeEgressRequest(
@@ -258,7 +286,7 @@ async def entrypoint(ctx: JobContext):
         file_outputs=[
             api.EncodedFileOutput(
                 file_type=api.EncodedFileType.MP4,
-                filepath=f"meragi_inbound/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
+                filepath=f"{STORAGE_PREFIX}/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
                 s3=api.S3Upload(
                     access_key=os.getenv("AWS_ACCESS_KEY_ID"),
                     secret=os.getenv("AWS_SECRET_ACCESS_KEY"),
@@ -309,146 +337,131 @@ async def entrypoint(ctx: JobContext):
     def _on_agent_false_interruption(ev: AgentFalseInterruptionEvent):
         logger.info("false positive interruption, resuming")
         session.generate_reply(instructions=ev.extra_instructions or NOT_GIVEN)
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Agent false interruption: {filename}")
 
     # Metrics collection, to measure pipeline performance
     # For more information, see https://docs.livekit.io/agents/build/metrics/
     usage_collector = metrics.UsageCollector()
+    latency = LatencyTracker(PERSONA)
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
-        filename = write_event_jsonl(ev.model_dump())
+        latency.collect(ev.metrics)
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Metrics collected: {filename}")
 
     @session.on("speech_created")
     def _on_speech_created(ev: SpeechCreatedEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Speech created: {filename}")
 
     @session.on("user_state_changed")
     def _on_user_state_changed(ev: UserStateChangedEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"User state changed: {filename}")
 
     @session.on("user_input_transcribed")
     def _on_user_input_transcribed(ev: UserInputTranscribedEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"User input transcribed: {filename}")
 
     @session.on("conversation_item_added")
     def _on_conversation_item_added(ev: ConversationItemAddedEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Conversation item added: {filename}")
 
     @session.on("function_tools_executed")
     def _on_function_tools_executed(ev: FunctionToolsExecutedEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         data = ev.model_dump()
         data["event"] = "function_tools_executed"
         data["room"] = {"sid": room_id}
-        url = f"http://localhost:8001/livekit/events"
-        asyncio.create_task(send_webhook_to_qualif(data, url))
+        url = f"{WEBHOOK_BASE_URL}/events"
+        post_webhook(data, url)
         logger.info(f"Function tools executed: {filename}")
 
     @session.on("agent_state_changed")
     def _on_agent_state_changed(ev: AgentStateChangedEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Agent state changed: {filename}")
     
     @session.on("error")
     def _on_error(ev: ErrorEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Error: {filename}")
     
     @session.on("close")
     def _on_close(ev: CloseEvent):
-        filename = write_event_jsonl(ev.model_dump())
+        filename = write_event_jsonl(project_event(ev))
         logger.info(f"Close: {filename}")
         data = ev.model_dump()
         data["event"] = "session_closed"
         data["room"] = {"sid": room_id}
-        url = f"http://localhost:8001/livekit/events"
-        asyncio.create_task(send_webhook_to_qualif(data, url))
+        url = f"{WEBHOOK_BASE_URL}/events"
+        post_webhook(data, url)
         ctx.delete_room()
         # await job_ctx.api.room.delete_room(api.DeleteRoomRequest(room=job_ctx.room.name))
     
 
 
     async def write_room_events():
-        s3_bucket = os.getenv("S3_RECORDING_BUCKET")
-        s3_region = os.getenv("S3_RECORDING_REGION")
-        s3_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-        s3_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
+        # Make sure every queued event is on disk before uploading the log
+        await events.aclose()
 
-        try:
-            s3_client = boto3.client(
-                "s3",
-                region_name=s3_region,
-                aws_access_key_id=s3_access_key,
-                aws_secret_access_key=s3_secret_key,
-            )
-            
-            # Write final transcript and usage data to the single JSON file
-            transcript_filename = write_event_json(session.history.to_dict(), "transcript")
-            summary = usage_collector.get_summary()
-            summary_filename = write_event_json(summary.__dict__, "summary")
-            
-            # Upload the single JSONL file to the same S3 folder as egress
-            jsonl_filename = f"session_events_{ctx.room.name}.jsonl"
-            s3_key = f"meragi_inbound/{ctx.room.name}/{jsonl_filename}"
-
-            # with open(f'room_events_{ctx.room.name}.json', 'r') as file:
-            #     remote_participant_data = json.load(file)
-            #     call_started_ts = remote_participant_data.get("joined_at")
-            #     s3_client.upload_file(f'room_events_{ctx.room.name}.json', s3_bucket, f"meragi_inbound/{ctx.room.name}/room_events_{ctx.room.name}.json")
-            #     os.remove(f'room_events_{ctx.room.name}.json')
-            
-            if os.path.exists(jsonl_filename):
-                s3_client.upload_file(jsonl_filename, s3_bucket, s3_key)
-                s3_client.upload_file(transcript_filename, s3_bucket, f"meragi_inbound/{ctx.room.name}/{transcript_filename}")
-                s3_client.upload_file(summary_filename, s3_bucket, f"meragi_inbound/{ctx.room.name}/{summary_filename}")
-                logger.info(f"Uploaded events to s3://{s3_bucket}/{s3_key}")
-                
-                # Delete the local JSONL file after successful upload
-                os.remove(jsonl_filename)
-                os.remove(transcript_filename)
-                os.remove(summary_filename)
-                logger.info(f"Deleted local file: {jsonl_filename}")
-            else:
-                logger.warning(f"JSONL file {jsonl_filename} not found for upload")
-        except Exception as e:
-            logger.error(f"Failed to upload events to S3: {e}")
+        transcript = session.history.to_dict()
+        summary = usage_collector.get_summary()
 
-            
-        try:
-            data = {
-                "conversation_id": ctx.room.name,
-                "status": "completed",
-                "room_id": room_id,
-                # "call_started_ts": call_started_ts,
-                "recording_url": f"https://{os.getenv('S3_RECORDING_BUCKET')}.s3.{os.getenv('S3_RECORDING_REGION')}.amazonaws.com/meragi_inbound/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
-                "transcript": session.history.to_dict(),
-                "summary": summary.__dict__
-            }
-
-            # url = f"https://qualif.revspot.ai/livekit/webhook_listener/{bridge_id}"
-            url = f"http://localhost:8001/livekit/webhook_listener/{bridge_id}"
-            logger.info(f"Sending webhook to {url}")
-            
-            await send_webhook_to_qualif(data, url)
-                
-        except Exception as e:
-            logger.error(f"Failed to send webhook: {e}")
+        # Upload the JSONL log, transcript and summary to the same S3 folder as egress
+        jsonl_filename = f"session_events_{ctx.room.name}.jsonl"
+        if os.path.exists(jsonl_filename):
+            artifacts.upload_file(jsonl_filename, f"{STORAGE_PREFIX}/{ctx.room.name}/{jsonl_filename}")
+        else:
+            logger.warning(f"JSONL file {jsonl_filename} not found for upload")
+        artifacts.upload_json(transcript, f"{STORAGE_PREFIX}/{ctx.room.name}/transcript_{ctx.room.name}.json")
+        artifacts.upload_json(summary.__dict__, f"{STORAGE_PREFIX}/{ctx.room.name}/summary_{ctx.room.name}.json")
+
+        data = {
+            "conversation_id": ctx.room.name,
+            "status": "completed",
+            "room_id": room_id,
+            "recording_url": f"https://{os.getenv('S3_RECORDING_BUCKET')}.s3.{os.getenv('S3_RECORDING_REGION')}.amazonaws.com/{STORAGE_PREFIX}/{ctx.room.name}/call_recording_{ctx.room.name}.mp4",
+            "transcript": transcript,
+            "summary": summary.__dict__,
+            "latency": {"turns": latency.waterfall(), "summary": latency.summary()},
+            "voicemail": voicemail.reason,
+        }
+        url = f"{WEBHOOK_BASE_URL}/webhook_listener/{bridge_id}"
+        logger.info(f"Sending webhook to {url}")
+        artifacts.webhook(data, url)
+
+        # Uploads and webhooks (including queued event webhooks) run together; stragglers are spooled
+        await artifacts.run()
 
 
     ctx.add_shutdown_callback(write_room_events)
 
 
-    lkapi = api.LiveKitAPI()
-    res = await lkapi.egress.start_room_composite_egress(req)
+    # End-of-call uploads and the completion webhook share one deadline
+    artifacts = ShutdownPipeline()
+
+    # Recording starts when the callee answers, so failed dials never start an egress
+    egress = LazyEgress(ctx.api, req)
+    ctx.add_shutdown_callback(egress.aclose)
+
+    # Campaign dials report the call's outcome back to the dialer that placed them
+    campaign_call = CampaignCall(dial_info)
+    ctx.add_shutdown_callback(campaign_call.aclose)
+
+    # Answering machines are caught from the callee's first seconds of audio, before the LLM hears them
+    async def _hang_up_on_voicemail(reason: str) -> None:
+        campaign_call.voicemail()
+        await session.aclose()
+
+    voicemail = VoicemailDetector(session, ctx.proc.userdata["vad"], _hang_up_on_voicemail)
+    ctx.add_shutdown_callback(voicemail.aclose)
 
     agent = MeragiInboundAgent(customer_name=customer_name, dial_info=dial_info)
 
@@ -476,21 +489,35 @@ async def entrypoint(ctx: JobContext):
             )
         )
 
+        # Answered: start recording alongside the greeting
+        egress.start()
+        campaign_call.answered()
+
         await session_started
         participant = await ctx.wait_for_participant(identity=participant_identity)
         logger.info(f"participant joined: {participant.identity}")
 
         agent.set_participant(participant)
-        await lkapi.aclose()
+        voicemail.start(participant)
         
     except Exception as e:
         logger.error(f"Failed to create SIP participant: {e}")
 
+        campaign_call.failed("other")
+        egress.cancel("dial failed")
         ctx.shutdown()
-        await lkapi.aclose()
         return
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, agent_name="meragi-inbound-agent"))
+    capacity = CapacityGuard.single(PERSONA, PIPELINE)
+    capacity.drain_on_signal()
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=LoopLagReporting(entrypoint),
+            prewarm_fnc=prewarm,
+            agent_name="meragi-inbound-agent",
+            **capacity.worker_options(),
+        )
+    )
     # cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
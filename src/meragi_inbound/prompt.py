@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-def get_meragi_inbound_prompt(customer_name: str | None):
-    meragi_inbound_prompt = f"""
+from shared.prompts import PromptTemplate
+
+MERAGI_INBOUND_PROMPT = PromptTemplate(
+    """
     SYSTEM PROMPT — Meragi Weddings Inbound Bot (Name: Deepika)
         Target Audience: Inbound leads from Meta forms filled by users planning weddings in Bangalore or Hyderabad.
         Speak in a North Indian accent.
@@ -15,7 +17,7 @@ def get_meragi_inbound_prompt(customer_name: str | None):
             5.	If eligible, offer to book a free consultation with a senior expert on Google Meet
     ⸻
     SECTION 1: OPENING
-        Hi {customer_name}, this is Deepika from Meragi Celebrations.”
+        Hi {{customer_name}}, this is Deepika from Meragi Celebrations.”
         “We're a wedding services platform operating across major Indian cities.”
         “I saw your recent enquiry about planning an event in Bangalore — is that right?”
         → If city is serviceable (Bangalore, Hyderabad, Delhi, Goa, Rajasthan) → proceed
@@ -116,5 +118,10 @@ def get_meragi_inbound_prompt(customer_name: str | None):
     4. Meragi -> Me-rah-gee
     5. Delhi -> Dell-he
     6. Hyderabad -> Hi-dhera-baad
-    """
-    return meragi_inbound_prompt
\ No newline at end of file
+    """,
+    name="meragi_inbound",
+)
+
+
+def get_meragi_inbound_prompt(customer_name: str) -> str:
+    return MERAGI_INBOUND_PROMPT.render(customer_name=customer_name)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import importlib
+import json
+import logging
+import os
+from collections.abc import Awaitable
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Callable
+
+from livekit.agents import JobContext, JobProcess
+
+from shared.capacity import SessionProfile, parse_caps, session_cost
+from shared.plugin_pool import PipelineSpec
+
+logger = logging.getLogger("personas")
+
+
+@dataclass(frozen=True)
+class Persona:
+    """Routes jobs to one tenant's agent module and says what to warm for it.
+
+    The module (imported only by workers that serve the persona) provides
+    ``entrypoint`` and ``PIPELINE``. The call flow itself (prompt, tools,
+    storage prefix, webhook URL, session events) lives in that entrypoint.
+    """
+
+    name: str
+    module: str
+    # the agent_name the persona's standalone worker registers with
+    legacy_agent_name: str | None = None
+    # extra per-process state on top of the shared VAD and plugin pool
+    prewarm: Callable[[JobProcess], None] | None = field(default=None, compare=False)
+    # concurrent sessions one worker may run, overridable with PERSONA_SESSION_CAPS
+    max_sessions: int | None = None
+
+    def load(self) -> ModuleType:
+        return importlib.import_module(self.module)
+
+    @property
+    def entrypoint(self) -> Callable[[JobContext], Awaitable[None]]:
+        return self.load().entrypoint
+
+    @property
+    def pipelines(self) -> tuple[PipelineSpec, ...]:
+        """Voice, STT and LLM (or realtime model) configuration"""
+        return (self.load().PIPELINE,)
+
+
+def _prewarm_livspace(proc: JobProcess) -> None:
+    from livspace import knowledge_base, pincodes, projects
+
+    proc.userdata["kb_index"] = knowledge_base.build_index()
+    proc.userdata["pincodes"] = pincodes.PincodeService()
+    proc.userdata["projects"] = projects.ProjectLookup(projects.FixtureBackend())
+
+
+PERSONAS: dict[str, Persona] = {
+    persona.name: persona
+    for persona in (
+        Persona(
+            name="livspace_inbound",
+            module="livspace.agent",
+            legacy_agent_name="livekit_livspace_inbound",
+            prewarm=_prewarm_livspace,
+        ),
+        Persona(
+            name="dra_homes_inbound",
+            module="dra_homes_inbound.agent",
+            legacy_agent_name="livekit_dra_homes_inbound",
+        ),
+        Persona(
+            name="master_outbound",
+            module="master_agent.agent",
+            legacy_agent_name="livekit_master_outbound_agent",
+        ),
+        Persona(
+            name="meragi_inbound",
+            module="meragi_inbound.agent",
+            legacy_agent_name="meragi-inbound-agent",
+        ),
+        Persona(
+            name="livspace_demo",
+            module="agent",
+            legacy_agent_name="livspace-agent",
+        ),
+    )
+}
+
+_ALIASES = {p.legacy_agent_name: p for p in PERSONAS.values() if p.legacy_agent_name}
+
+
+def get_persona(name: str) -> Persona:
+    persona = PERSONAS.get(name) or _ALIASES.get(name)
+    if persona is None:
+        raise ValueError(
+            f"Unknown persona {name!r}, expected one of {sorted(PERSONAS)}"
+        )
+    return persona
+
+
+def served_personas() -> dict[str, Persona]:
+    """The personas this worker runs.
+
+    ``PERSONAS`` (comma-separated names) picks them explicitly. Otherwise a
+    worker registered under a persona's old ``agent_name`` serves just that
+    persona, and any other worker serves all of them.
+    """
+    names = [
+        name.strip() for name in os.getenv("PERSONAS", "").split(",") if name.strip()
+    ]
+    if names:
+        personas = [get_persona(name) for name in names]
+    elif os.getenv("AGENT_NAME") in _ALIASES:
+        personas = [_ALIASES[os.environ["AGENT_NAME"]]]
+    else:
+        personas = list(PERSONAS.values())
+    return {persona.name: persona for persona in personas}
+
+
+def load_personas() -> dict[str, Persona]:
+    """Import the served personas' modules, which also imports their plugins.
+
+    Call at module level: plugins only register on the main thread, and
+    ``download-files`` fetches models for the plugins imported by then.
+    """
+    served = served_personas()
+    for persona in served.values():
+        persona.load()
+    return served
+
+
+def served_pipelines() -> list[PipelineSpec]:
+    return [
+        spec for persona in served_personas().values() for spec in persona.pipelines
+    ]
+
+
+def default_persona() -> Persona | None:
+    """The persona for jobs whose metadata names none.
+
+    ``DEFAULT_PERSONA`` if set, else the persona whose old ``agent_name`` the
+    worker registers as (``AGENT_NAME``), else the only persona served.
+    """
+    name = os.getenv("DEFAULT_PERSONA")
+    if name:
+        return get_persona(name)
+    persona = _ALIASES.get(os.getenv("AGENT_NAME", ""))
+    if persona is not None:
+        return persona
+    served = served_personas()
+    if len(served) == 1:
+        return next(iter(served.values()))
+    return None
+
+
+def resolve_persona(metadata: str | None, agent_name: str | None = None) -> Persona:
+    """Pick the persona for a job.
+
+    Dispatchers may set ``"persona"`` (or the old per-tenant ``"agent_name"``)
+    in the job metadata. Jobs without one, such as those sent by SIP dispatch
+    rules to a legacy agent name, go to the persona that ``agent_name`` (the
+    job's) stands for, or else to ``default_persona()``.
+    """
+    try:
+        dial_info = json.loads(metadata) if metadata else {}
+    except json.JSONDecodeError:
+        dial_info = {}
+    if not isinstance(dial_info, dict):
+        dial_info = {}
+
+    name = dial_info.get("persona") or dial_info.get("agent_name")
+    if name:
+        persona = get_persona(name)
+    else:
+        persona = _ALIASES.get(agent_name or "") or default_persona()
+        if persona is None:
+            raise ValueError(
+                "Job metadata does not name a persona and DEFAULT_PERSONA is not set"
+            )
+
+    served = served_personas()
+    if persona.name not in served:
+        raise ValueError(
+            f"Persona {persona.name!r} is not served by this worker, it serves {sorted(served)}"
+        )
+    return persona
+
+
+def session_profile(metadata: str | None) -> SessionProfile:
+    """What a job costs the worker that runs it, for admission control"""
+    persona = resolve_persona(metadata)
+    caps = parse_caps(os.getenv("PERSONA_SESSION_CAPS", ""))
+    return SessionProfile(
+        persona.name,
+        session_cost(*persona.pipelines),
+        caps.get(persona.name, persona.max_sessions),
+    )
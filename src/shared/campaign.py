@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from shared.webhooks import send_webhook
+
+logger = logging.getLogger("campaign")
+
+# Call outcomes reported back by the jobs. The dial failures are the values
+# identify_call_status() returns.
+ANSWERED = "completed"
+VOICEMAIL = "voicemail"
+RETRYABLE_DEFAULTS = {
+    "busy": (5 * 60, 20 * 60, 60 * 60),
+    "no_answer": (30 * 60, 2 * 60 * 60, 6 * 60 * 60),
+    # the job never reported back (crashed, or the callback was lost)
+    "lost": (10 * 60,),
+    "dispatch_failed": (30, 2 * 60, 10 * 60),
+    # an answering machine picked up; try again later in the day
+    "voicemail": (2 * 60 * 60, 6 * 60 * 60),
+}
+
+
+@dataclass(frozen=True)
+class Lead:
+    id: str
+    campaign: str
+    phone_number: str
+    trunk_id: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+    priority: int = 0
+    attempts: int = 0
+
+
+@dataclass(frozen=True)
+class RedialPolicy:
+    """How long to wait before redialing a lead after each failed attempt.
+
+    ``delays[status][n]`` is the wait after the (n+1)-th failure with that
+    status; once they run out the lead is given up on.
+    """
+
+    delays: dict[str, tuple[float, ...]] = field(
+        default_factory=lambda: dict(RETRYABLE_DEFAULTS)
+    )
+
+    def next_delay(self, status: str, failures: int) -> float | None:
+        delays = self.delays.get(status, ())
+        if failures >= len(delays):
+            return None
+        return delays[failures]
+
+
+class LeadStore:
+    """Persistent priority queue of leads, backed by SQLite.
+
+    A lead is ``queued`` until it is due and claimed, ``dialing`` while its
+    job runs, and ends up ``done`` (answered) or ``failed``. Leads left in
+    ``dialing`` by a crashed dialer are requeued by ``recover()``. Queries
+    are indexed and sub-millisecond, so they run inline on the event loop.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(
+            """
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS leads (
+                id TEXT PRIMARY KEY,
+                campaign TEXT NOT NULL,
+                phone_number TEXT NOT NULL,
+                trunk_id TEXT NOT NULL,
+                metadata TEXT NOT NULL DEFAULT '{}',
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                failures TEXT NOT NULL DEFAULT '{}',
+                last_status TEXT,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS leads_due ON leads (state, priority DESC, next_attempt_at);
+            """
+        )
+
+    def add(self, leads: list[Lead], *, at: float | None = None) -> int:
+        """Queue new leads; leads that are already known are left untouched"""
+        now = time.time() if at is None else at
+        before = self._db.total_changes
+        self._db.executemany(
+            "INSERT OR IGNORE INTO leads (id, campaign, phone_number, trunk_id, metadata, priority, next_attempt_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    lead.id,
+                    lead.campaign,
+                    lead.phone_number,
+                    lead.trunk_id,
+                    json.dumps(lead.metadata),
+                    lead.priority,
+                    now,
+                    now,
+                )
+                for lead in leads
+            ],
+        )
+        return self._db.total_changes - before
+
+    def next_due(
+        self, now: float, *, exclude_trunks: set[str] = frozenset()
+    ) -> Lead | None:
+        """The highest-priority queued lead that is due on a trunk with room"""
+        placeholders = ",".join("?" * len(exclude_trunks))
+        row = self._db.execute(
+            "SELECT * FROM leads WHERE state = 'queued' AND next_attempt_at <= ? "
+            f"AND trunk_id NOT IN ({placeholders}) "
+            "ORDER BY priority DESC, next_attempt_at LIMIT 1",
+            (now, *exclude_trunks),
+        ).fetchone()
+        return None if row is None else self._lead(row)
+
+    def next_wakeup(self) -> float | None:
+        row = self._db.execute(
+            "SELECT MIN(next_attempt_at) FROM leads WHERE state = 'queued'"
+        ).fetchone()
+        return row[0]
+
+    def mark_dialing(self, lead_id: str) -> Lead:
+        self._db.execute(
+            "UPDATE leads SET state = 'dialing', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (time.time(), lead_id),
+        )
+        return self.get(lead_id)
+
+    def record_outcome(
+        self,
+        lead_id: str,
+        status: str,
+        policy: RedialPolicy,
+        attempt: int | None = None,
+    ) -> str | None:
+        """Requeue or close a dialed lead; returns its new state.
+
+        An outcome for an earlier ``attempt`` than the one being dialed (a
+        late callback from a call already written off as lost) is ignored.
+        """
+        row = self._db.execute(
+            "SELECT * FROM leads WHERE id = ?", (lead_id,)
+        ).fetchone()
+        if row is None or row["state"] != "dialing":
+            return None
+        if attempt is not None and attempt != row["attempts"]:
+            return None
+
+        now = time.time()
+        failures = json.loads(row["failures"])
+        if status == ANSWERED:
+            state, next_attempt_at = "done", row["next_attempt_at"]
+        else:
+            delay = policy.next_delay(status, failures.get(status, 0))
+            failures[status] = failures.get(status, 0) + 1
+            if delay is None:
+                state, next_attempt_at = "failed", row["next_attempt_at"]
+            else:
+                state, next_attempt_at = "queued", now + delay
+
+        self._db.execute(
+            "UPDATE leads SET state = ?, last_status = ?, failures = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (state, status, json.dumps(failures), next_attempt_at, now, lead_id),
+        )
+        return state
+
+    def recover(self) -> int:
+        """Requeue leads a previous dialer left mid-call"""
+        cursor = self._db.execute(
+            "UPDATE leads SET state = 'queued', last_status = 'interrupted', updated_at = ? WHERE state = 'dialing'",
+            (time.time(),),
+        )
+        return cursor.rowcount
+
+    def get(self, lead_id: str) -> Lead:
+        row = self._db.execute(
+            "SELECT * FROM leads WHERE id = ?", (lead_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(lead_id)
+        return self._lead(row)
+
+    def state(self, lead_id: str) -> tuple[str, str | None]:
+        row = self._db.execute(
+            "SELECT state, last_status FROM leads WHERE id = ?", (lead_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(lead_id)
+        return row["state"], row["last_status"]
+
+    def counts(self) -> dict[str, int]:
+        return dict(
+            self._db.execute(
+                "SELECT state, COUNT(*) FROM leads GROUP BY state"
+            ).fetchall()
+        )
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def _lead(row: sqlite3.Row) -> Lead:
+        return Lead(
+            id=row["id"],
+            campaign=row["campaign"],
+            phone_number=row["phone_number"],
+            trunk_id=row["trunk_id"],
+            metadata=json.loads(row["metadata"]),
+            priority=row["priority"],
+            attempts=row["attempts"],
+        )
+
+
+class TokenBucket:
+    """Paces dial attempts to ``rate`` per second with bursts of up to ``burst``"""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class Dispatcher(Protocol):
+    async def dispatch(
+        self, lead: Lead, room_name: str, metadata: dict[str, Any]
+    ) -> None: ...
+
+
+class AgentDispatcher:
+    """Starts one agent job per call through LiveKit's agent dispatch API"""
+
+    def __init__(self, lkapi: Any, agent_name: str) -> None:
+        self._lkapi = lkapi
+        self._agent_name = agent_name
+
+    async def dispatch(
+        self, lead: Lead, room_name: str, metadata: dict[str, Any]
+    ) -> None:
+        from livekit import api
+
+        await self._lkapi.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(
+                agent_name=self._agent_name,
+                room=room_name,
+                metadata=json.dumps(metadata),
+            )
+        )
+
+
+class CampaignDialer:
+    """Dials queued leads as fast as the trunks and the CPS budget allow.
+
+    Every dial is a dispatched agent job. The lead holds a slot on its SIP
+    trunk from dispatch until the job reports the outcome (see
+    ``CampaignCall``), so a trunk never has more than its capacity of calls
+    in flight. Busy and unanswered numbers go back into the queue according
+    to the ``RedialPolicy``, and calls that never report back are released
+    after ``call_timeout``.
+    """
+
+    def __init__(
+        self,
+        store: LeadStore,
+        dispatcher: Dispatcher,
+        *,
+        callback_url: str,
+        calls_per_second: float = 1.0,
+        burst: int = 1,
+        trunk_capacity: dict[str, int] | None = None,
+        default_trunk_capacity: int = 10,
+        policy: RedialPolicy | None = None,
+        call_timeout: float = 30 * 60,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self._store = store
+        self._dispatcher = dispatcher
+        self._callback_url = callback_url
+        self._bucket = TokenBucket(calls_per_second, burst)
+        self._trunk_capacity = trunk_capacity or {}
+        self._default_trunk_capacity = default_trunk_capacity
+        self._policy = policy or RedialPolicy()
+        self._call_timeout = call_timeout
+        self._poll_interval = poll_interval
+
+        # lead id -> (trunk, dispatched at)
+        # lead id -> (trunk, dialed at, attempt)
+        self._in_flight: dict[str, tuple[str, float, int]] = {}
+        self._trunk_load: Counter[str] = Counter()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self.peak_trunk_load: Counter[str] = Counter()
+        self.outcomes: Counter[str] = Counter()
+        self.dialed = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, *, until_idle: bool = False) -> None:
+        """Dial until closed, or with ``until_idle`` until every lead is settled"""
+        recovered = self._store.recover()
+        if recovered:
+            logger.info(f"Requeued {recovered} leads left mid-call by a previous run")
+
+        while not self._closed:
+            self._expire_lost_calls()
+            lead = self._store.next_due(time.time(), exclude_trunks=self._full_trunks())
+            if lead is None:
+                if (
+                    until_idle
+                    and not self._in_flight
+                    and self._store.next_wakeup() is None
+                ):
+                    return
+                await self._sleep()
+                continue
+
+            await self._bucket.acquire()
+            await self._dial(lead)
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+
+    def report_outcome(
+        self, lead_id: str, status: str, attempt: int | None = None
+    ) -> None:
+        """Record what happened to a dialed lead and free its trunk slot"""
+        call = self._in_flight.get(lead_id)
+        if call is not None and attempt in (None, call[2]):
+            del self._in_flight[lead_id]
+            self._trunk_load[call[0]] -= 1
+        state = self._store.record_outcome(lead_id, status, self._policy, attempt)
+        if state is None:
+            logger.warning(
+                f"Ignoring outcome {status} for lead {lead_id} attempt {attempt}, "
+                "which is not being dialed"
+            )
+            return
+        self.outcomes[status] += 1
+        logger.info(f"Lead {lead_id} {status}: {state}")
+        self._wakeup.set()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "dialed": self.dialed,
+            "in_flight": self.in_flight,
+            "outcomes": dict(self.outcomes),
+            "leads": self._store.counts(),
+            "peak_trunk_load": dict(self.peak_trunk_load),
+        }
+
+    async def _dial(self, lead: Lead) -> None:
+        lead = self._store.mark_dialing(lead.id)
+        self._in_flight[lead.id] = (lead.trunk_id, time.monotonic(), lead.attempts)
+        self._trunk_load[lead.trunk_id] += 1
+        self.peak_trunk_load[lead.trunk_id] = max(
+            self.peak_trunk_load[lead.trunk_id], self._trunk_load[lead.trunk_id]
+        )
+        self.dialed += 1
+
+        room_name = f"{lead.campaign}-{lead.id}-{lead.attempts}"
+        metadata = {
+            **lead.metadata,
+            "phone_number": lead.phone_number,
+            "trunk_id": lead.trunk_id,
+            "campaign": {
+                "id": lead.campaign,
+                "lead_id": lead.id,
+                "attempt": lead.attempts,
+                "callback_url": self._callback_url,
+            },
+        }
+        try:
+            await self._dispatcher.dispatch(lead, room_name, metadata)
+        except Exception as e:
+            logger.error(f"Failed to dispatch lead {lead.id}: {e}")
+            self.report_outcome(lead.id, "dispatch_failed", lead.attempts)
+
+    def _full_trunks(self) -> set[str]:
+        return {
+            trunk
+            for trunk, load in self._trunk_load.items()
+            if load >= self._trunk_capacity.get(trunk, self._default_trunk_capacity)
+        }
+
+    def _expire_lost_calls(self) -> None:
+        deadline = time.monotonic() - self._call_timeout
+        for lead_id, (_, started_at, attempt) in list(self._in_flight.items()):
+            if started_at < deadline:
+                logger.warning(
+                    f"Lead {lead_id} did not report back within {self._call_timeout}s"
+                )
+                self.report_outcome(lead_id, "lost", attempt)
+
+    async def _sleep(self) -> None:
+        timeout = self._poll_interval
+        next_due = self._store.next_wakeup()
+        if next_due is not None:
+            timeout = min(timeout, max(next_due - time.time(), 0.0))
+        self._wakeup.clear()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+
+
+class CampaignCall:
+    """The job side of a campaign dial: reports the call's outcome back.
+
+    Create it from the job's dial info next to the egress, call
+    ``answered()`` or ``failed(status)`` once the SIP dial settles, and add
+    ``aclose`` as a shutdown callback. Jobs that were not dispatched by a
+    campaign have no callback and report nothing.
+    """
+
+    def __init__(self, dial_info: dict[str, Any]) -> None:
+        campaign = dial_info.get("campaign") or {}
+        self._callback_url: str | None = campaign.get("callback_url")
+        self._payload = {
+            "campaign_id": campaign.get("id"),
+            "lead_id": campaign.get("lead_id"),
+            "attempt": campaign.get("attempt"),
+        }
+        self._status: str | None = None
+        self._reported = False
+
+    def answered(self) -> None:
+        self._status = self._status or ANSWERED
+
+    def failed(self, status: str) -> None:
+        self._status = self._status or status
+
+    def voicemail(self) -> None:
+        # answered, but by a machine: the lead still has to be reached
+        self._status = VOICEMAIL
+
+    async def aclose(self) -> None:
+        if self._callback_url is None or self._reported:
+            return
+        self._reported = True
+        try:
+            await send_webhook(
+                {**self._payload, "status": self._status or "lost"}, self._callback_url
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to report campaign outcome for lead {self._payload['lead_id']}: {e}"
+            )
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import signal
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from livekit.agents import JobContext, JobRequest
+from livekit.agents.utils.hw import get_cpu_monitor
+
+from shared.plugin_pool import PipelineSpec
+
+logger = logging.getLogger("capacity")
+
+# Local inference per session, in units of one full pipeline call. Every call
+# runs Silero VAD and BVCTelephony on the caller's audio; the multilingual
+# turn detector adds a transformer pass at each end of turn.
+BASE_SESSION_COST = 0.5
+COMPONENT_COSTS = {("turn_detection", "multilingual"): 0.5}
+
+
+def session_cost(*pipelines: PipelineSpec) -> float:
+    keys = {key for spec in pipelines for key in spec.keys().values()}
+    return BASE_SESSION_COST + sum(
+        COMPONENT_COSTS.get((key.kind, key.provider), 0.0) for key in keys
+    )
+
+
+def parse_caps(value: str) -> dict[str, int]:
+    """``"livspace_inbound=8,meragi_inbound=20"`` -> ``{"livspace_inbound": 8, "meragi_inbound": 20}``"""
+    caps = {}
+    for item in filter(None, value.split(",")):
+        name, _, limit = item.partition("=")
+        caps[name.strip()] = int(limit)
+    return caps
+
+
+@dataclass(frozen=True)
+class SessionProfile:
+    persona: str
+    cost: float = 1.0
+    max_sessions: int | None = None
+
+
+class _CPUSampler:
+    """Average CPU utilisation (0-1) over the last few seconds, sampled on a daemon thread"""
+
+    def __init__(self, window: int = 5) -> None:
+        self._monitor = get_cpu_monitor()
+        self._samples: deque[float] = deque(maxlen=window)
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="capacity_cpu_sampler"
+        )
+        self._thread.start()
+
+    def __call__(self) -> float:
+        samples = list(self._samples)
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def _run(self) -> None:
+        while True:
+            self._samples.append(self._monitor.cpu_percent(interval=0.5))
+
+
+class CapacityGuard:
+    """Worker load reporting and job admission for one worker process.
+
+    The load reported to LiveKit is the highest of three pressures, each
+    scaled so 1.0 means "at the limit":
+
+    - CPU utilisation of the host (or container),
+    - the worst event-loop lag any job process reported, against ``lag_slo``,
+    - the summed inference cost of the running sessions, against ``budget``.
+
+    At ``threshold`` LiveKit stops offering jobs to the worker. Offers that
+    arrive anyway are rejected when the persona is at its session cap, the
+    worker is draining, or the job would push the session load over the
+    threshold, so the dispatcher tries another worker.
+    """
+
+    def __init__(
+        self,
+        classify: Callable[[str | None], SessionProfile],
+        *,
+        budget: float | None = None,
+        lag_slo: float | None = None,
+        threshold: float | None = None,
+        reports_dir: str | None = None,
+        cpu: Callable[[], float] | None = None,
+    ) -> None:
+        self._classify = classify
+        self.budget = budget or float(
+            os.getenv(
+                "WORKER_SESSION_BUDGET",
+                get_cpu_monitor().cpu_count()
+                * float(os.getenv("SESSIONS_PER_CORE", "2")),
+            )
+        )
+        self.lag_slo = lag_slo or float(os.getenv("LOOP_LAG_SLO", "0.1"))
+        self.threshold = threshold or float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75"))
+        self.reports_dir = reports_dir or lag_reports_dir()
+        self._cpu = cpu
+        self._lock = threading.Lock()
+        self._active: dict[str, SessionProfile] = {}
+        # accepted jobs that are not in the worker's active_jobs yet
+        self._admitted: dict[str, tuple[SessionProfile, float]] = {}
+        self.draining = False
+        self.rejected = 0
+        self.last_load: dict[str, float] = {}
+
+    @classmethod
+    def single(
+        cls, persona: str, *pipelines: PipelineSpec, **kwargs: Any
+    ) -> CapacityGuard:
+        """A guard for a standalone worker that runs one persona"""
+        profile = SessionProfile(
+            persona,
+            session_cost(*pipelines),
+            parse_caps(os.getenv("PERSONA_SESSION_CAPS", "")).get(persona),
+        )
+        return cls(lambda metadata: profile, **kwargs)
+
+    def worker_options(self) -> dict[str, Any]:
+        return {
+            "load_fnc": self.load,
+            "load_threshold": self.threshold,
+            "request_fnc": self.request,
+        }
+
+    def drain(self, draining: bool = True) -> None:
+        """Stop taking new calls (load reports as full) while running calls finish"""
+        self.draining = draining
+        logger.warning(f"Worker {'draining' if draining else 'accepting calls again'}")
+
+    def drain_on_signal(self, signum: int = signal.SIGUSR1) -> None:
+        """Toggle drain mode with ``kill -USR1 <worker pid>``, e.g. before a deploy"""
+        signal.signal(signum, lambda *_: self.drain(not self.draining))
+
+    def load(self, worker: Any) -> float:
+        """``WorkerOptions.load_fnc``; runs on a thread every half second"""
+        active = {}
+        for info in worker.active_jobs:
+            active[info.job.id] = self._active.get(info.job.id) or self._profile(
+                info.job.metadata
+            )
+        with self._lock:
+            self._active = active
+            now = time.monotonic()
+            self._admitted = {
+                job_id: (profile, at)
+                for job_id, (profile, at) in self._admitted.items()
+                if job_id not in active and now - at < 10
+            }
+
+        cpu = self._cpu() if self._cpu is not None else self._default_cpu()
+        lag = read_lag_reports(self.reports_dir)
+        self.last_load = {
+            "cpu": cpu,
+            "loop_lag": lag / self.lag_slo,
+            "sessions": self._session_load(),
+        }
+        if self.draining:
+            return 1.0
+        return min(max(self.last_load.values()), 1.0)
+
+    async def request(self, req: JobRequest) -> None:
+        """``WorkerOptions.request_fnc``: admission control for each job offer"""
+        reason = self.admit(req.job.id, req.job.metadata)
+        if reason is not None:
+            self.rejected += 1
+            logger.warning(f"Rejecting job {req.job.id}: {reason}")
+            await req.reject()
+            return
+        await req.accept()
+
+    def admit(self, job_id: str, metadata: str | None) -> str | None:
+        """Reserve capacity for a job; returns why it cannot run here, or None"""
+        if self.draining:
+            return "worker is draining"
+        profile = self._profile(metadata)
+        with self._lock:
+            sessions = list(self._active.values()) + [
+                p for p, _ in self._admitted.values()
+            ]
+            running = sum(1 for p in sessions if p.persona == profile.persona)
+            if profile.max_sessions is not None and running >= profile.max_sessions:
+                return f"{profile.persona} is at its cap of {profile.max_sessions} sessions"
+            if (
+                sessions
+                and (sum(p.cost for p in sessions) + profile.cost) / self.budget
+                > self.threshold
+            ):
+                return f"session load would exceed {self.threshold:.0%} of the worker's budget"
+            if (
+                max(self.last_load.get("cpu", 0.0), self.last_load.get("loop_lag", 0.0))
+                >= self.threshold
+            ):
+                return "worker is saturated"
+            self._admitted[job_id] = (profile, time.monotonic())
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "draining": self.draining,
+            "sessions": len(self._active),
+            "admitted": len(self._admitted),
+            "rejected": self.rejected,
+            "load": dict(self.last_load),
+        }
+
+    def _profile(self, metadata: str | None) -> SessionProfile:
+        try:
+            return self._classify(metadata)
+        except ValueError:
+            return SessionProfile("unknown")
+
+    def _session_load(self) -> float:
+        with self._lock:
+            cost = sum(p.cost for p in self._active.values()) + sum(
+                p.cost for p, _ in self._admitted.values()
+            )
+        return cost / self.budget
+
+    def _default_cpu(self) -> float:
+        if self._cpu is None:
+            self._cpu = _CPUSampler()
+        return self._cpu()
+
+
+def lag_reports_dir() -> str:
+    # job processes inherit the worker's environment, so they find the same directory
+    path = os.getenv("LOAD_REPORT_DIR")
+    if not path:
+        path = os.environ["LOAD_REPORT_DIR"] = os.path.join(
+            tempfile.gettempdir(), f"voice-agent-load-{os.getpid()}"
+        )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def read_lag_reports(reports_dir: str, max_age: float = 5.0) -> float:
+    """The worst recent event-loop lag (p95, seconds) reported by any job process"""
+    worst = 0.0
+    now = time.time()
+    try:
+        names = os.listdir(reports_dir)
+    except FileNotFoundError:
+        return 0.0
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(reports_dir, name)) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if now - report["at"] <= max_age:
+            worst = max(worst, report["lag_p95"])
+    return worst
+
+
+class LagReporter:
+    """Measures a job process's event-loop lag and publishes it for the worker's CapacityGuard"""
+
+    def __init__(
+        self,
+        reports_dir: str | None = None,
+        *,
+        interval: float = 0.05,
+        publish_every: float = 1.0,
+    ) -> None:
+        self._path = os.path.join(
+            reports_dir or lag_reports_dir(), f"{os.getpid()}.json"
+        )
+        self._interval = interval
+        self._publish_every = publish_every
+        self._samples: deque[float] = deque(maxlen=int(2 / interval))
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path)
+
+    @property
+    def lag_p95(self) -> float:
+        samples = sorted(self._samples)
+        return samples[int(0.95 * (len(samples) - 1))] if samples else 0.0
+
+    async def _run(self) -> None:
+        published = time.monotonic()
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self._interval)
+            now = time.monotonic()
+            self._samples.append(max(0.0, now - started - self._interval))
+            if now - published >= self._publish_every:
+                published = now
+                self._publish()
+
+    def _publish(self) -> None:
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"lag_p95": self.lag_p95, "at": time.time()}, f)
+        os.replace(tmp, self._path)
+
+
+class LoopLagReporting:
+    """Wrap a job entrypoint so its process publishes event-loop lag while it runs.
+
+    A class rather than a closure: the entrypoint is pickled into each job
+    process.
+    """
+
+    def __init__(self, entrypoint: Callable[[JobContext], Awaitable[None]]) -> None:
+        self._entrypoint = entrypoint
+
+    async def __call__(self, ctx: JobContext) -> None:
+        reporter = LagReporter()
+        reporter.start()
+        ctx.add_shutdown_callback(reporter.aclose)
+        await self._entrypoint(ctx)
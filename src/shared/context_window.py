@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from livekit.agents import Agent, llm
+
+from shared.tokens import estimate_tokens
+
+logger = logging.getLogger("context-window")
+
+SUMMARY_PROMPT = (
+    "You keep the running notes of a phone call between a customer and a voice agent. "
+    "Merge the earlier notes with the new part of the conversation into one short "
+    "paragraph. Keep names, phone numbers, project IDs, pin codes, budgets, dates, "
+    "what the customer asked for and anything the agent promised. Leave out greetings "
+    "and small talk."
+)
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    """How much conversation history a persona sends with each LLM turn.
+
+    The last ``keep_turns`` user turns are sent verbatim; older ones are
+    folded into a running summary. ``history_tokens`` caps the estimated size
+    of everything after the instructions, and tool outputs from earlier turns
+    are cut to ``tool_output_tokens``.
+    """
+
+    keep_turns: int = 6
+    history_tokens: int = 3000
+    tool_output_tokens: int = 150
+
+
+def _item_tokens(item: llm.ChatItem) -> int:
+    if item.type == "message":
+        return estimate_tokens(item.text_content or "")
+    if item.type == "function_call":
+        return estimate_tokens(item.name + item.arguments)
+    return estimate_tokens(item.output)
+
+
+def _transcript(items: list[llm.ChatItem]) -> str:
+    lines = []
+    for item in items:
+        if item.type == "message" and item.text_content:
+            lines.append(f"{item.role}: {item.text_content}")
+        elif item.type == "function_call":
+            lines.append(f"tool call: {item.name}({item.arguments})")
+        elif item.type == "function_call_output":
+            lines.append(f"tool result ({item.name}): {item.output}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """Applies a ContextPolicy to one call's chat context.
+
+    ``apply()`` runs before every LLM request and never waits on the
+    summarizer: turns that have left the window but are not folded into the
+    summary yet are still sent verbatim (within the token cap), and a
+    background task folds them in so the next turn is smaller.
+    """
+
+    def __init__(
+        self, policy: ContextPolicy, summarizer: llm.LLM | None = None
+    ) -> None:
+        self._policy = policy
+        self._summarizer = summarizer
+        self._summary = ""
+        self._folded: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+        self.summaries = 0
+        self.last_history_tokens = 0
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    def apply(self, chat_ctx: llm.ChatContext) -> llm.ChatContext:
+        instructions = [
+            i
+            for i in chat_ctx.items
+            if i.type == "message" and i.role in ("system", "developer")
+        ]
+        turns = self._turns(
+            [
+                i
+                for i in chat_ctx.items
+                if not (i.type == "message" and i.role in ("system", "developer"))
+            ]
+        )
+
+        kept = turns[-self._policy.keep_turns :] if self._policy.keep_turns else []
+        pending = [
+            unfolded
+            for turn in turns[: len(turns) - len(kept)]
+            if (unfolded := [item for item in turn if item.id not in self._folded])
+        ]
+        if pending:
+            self._fold_later([item for turn in pending for item in turn])
+
+        # newest turn last; everything but the turn being answered gets compacted tool outputs
+        window = pending + kept
+        window = [
+            [self._compact(item) for item in turn] for turn in window[:-1]
+        ] + window[-1:]
+
+        summary_tokens = estimate_tokens(self._summary)
+        while (
+            len(window) > 1
+            and summary_tokens + sum(_item_tokens(i) for t in window for i in t)
+            > self._policy.history_tokens
+        ):
+            window.pop(0)
+
+        items = list(instructions)
+        if self._summary:
+            items.append(
+                llm.ChatMessage(
+                    role="system",
+                    content=[
+                        f"Notes on the earlier part of this call: {self._summary}"
+                    ],
+                )
+            )
+        items.extend(item for turn in window for item in turn)
+        self.last_history_tokens = summary_tokens + sum(
+            _item_tokens(i) for t in window for i in t
+        )
+        return llm.ChatContext(items)
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @staticmethod
+    def _turns(items: list[llm.ChatItem]) -> list[list[llm.ChatItem]]:
+        # a turn starts at each user message; tool calls stay with their turn
+        turns: list[list[llm.ChatItem]] = []
+        for item in items:
+            if not turns or (item.type == "message" and item.role == "user"):
+                turns.append([])
+            turns[-1].append(item)
+        return turns
+
+    def _compact(self, item: llm.ChatItem) -> llm.ChatItem:
+        limit = self._policy.tool_output_tokens
+        if item.type != "function_call_output" or estimate_tokens(item.output) <= limit:
+            return item
+        chars = int(limit * 4)
+        return item.model_copy(
+            update={"output": item.output[:chars] + " ...(truncated)"}
+        )
+
+    def _fold_later(self, items: list[llm.ChatItem]) -> None:
+        if self._summarizer is None or (
+            self._task is not None and not self._task.done()
+        ):
+            return
+        self._task = asyncio.create_task(self._fold(items))
+
+    async def _fold(self, items: list[llm.ChatItem]) -> None:
+        ctx = llm.ChatContext.empty()
+        ctx.add_message(role="system", content=SUMMARY_PROMPT)
+        ctx.add_message(
+            role="user",
+            content=f"Earlier notes:\n{self._summary or '(none)'}\n\nNew part of the conversation:\n{_transcript(items)}",
+        )
+        try:
+            parts = []
+            async with self._summarizer.chat(chat_ctx=ctx) as stream:
+                async for chunk in stream:
+                    if chunk.delta and chunk.delta.content:
+                        parts.append(chunk.delta.content)
+        except Exception as e:
+            # the turns stay verbatim (within the token cap) and are retried next turn
+            logger.warning(f"Could not summarize earlier turns: {e}")
+            return
+
+        summary = "".join(parts).strip()
+        if summary:
+            self._summary = summary
+            self._folded.update(item.id for item in items)
+            self.summaries += 1
+            logger.info(
+                f"Folded {len(items)} items into the call summary ({estimate_tokens(summary)} tokens)"
+            )
+
+
+class BoundedContext(Agent):
+    """Agent base that sends its LLM requests through a ContextWindow.
+
+    Set ``context_policy`` on the subclass. The window is created per agent,
+    so per call, and summarizes with the agent's own LLM.
+    """
+
+    context_policy = ContextPolicy()
+    _context_window: ContextWindow | None = None
+
+    @property
+    def context_window(self) -> ContextWindow:
+        if self._context_window is None:
+            summarizer = self.llm if isinstance(self.llm, llm.LLM) else None
+            if (
+                summarizer is None
+                and self._activity is not None
+                and isinstance(self.session.llm, llm.LLM)
+            ):
+                summarizer = self.session.llm
+            self._context_window = ContextWindow(self.context_policy, summarizer)
+        return self._context_window
+
+    def llm_node(self, chat_ctx, tools, model_settings):
+        return Agent.default.llm_node(
+            self, self.context_window.apply(chat_ctx), tools, model_settings
+        )
+
+    async def on_exit(self) -> None:
+        if self._context_window is not None:
+            await self._context_window.aclose()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+
+from livekit import api
+
+logger = logging.getLogger("egress")
+
+# Process-wide totals, reported by egress_stats()
+_totals = {"started": 0, "skipped": 0, "failed": 0, "seconds_saved": 0.0}
+
+
+class LazyEgress:
+    """Room composite egress that only starts once the SIP leg is answered.
+
+    Create it where the egress used to be started, call ``start()`` when the
+    callee picks up and ``cancel()`` when the dial fails. ``start()`` returns
+    immediately so the egress request runs alongside the greeting instead of
+    in front of it. The time between creation and start (ringing, or the
+    whole failed dial) is egress time the old eager start would have billed,
+    and is logged and added to ``egress_stats()``.
+    """
+
+    def __init__(
+        self, lkapi: api.LiveKitAPI, request: api.RoomCompositeEgressRequest
+    ) -> None:
+        self._lkapi = lkapi
+        self._request = request
+        self._created_at = time.monotonic()
+        self._task: asyncio.Task | None = None
+        self._done = False
+        self.egress_id: str | None = None
+        self.seconds_saved = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._done or self._task is not None:
+            return
+        self._record_saved()
+        self._task = asyncio.create_task(self._start())
+
+    def cancel(self, reason: str) -> None:
+        """The call never connected, so the egress is skipped entirely"""
+        if self._done or self._task is not None:
+            return
+        self._done = True
+        self._record_saved()
+        _totals["skipped"] += 1
+        logger.info(
+            f"Skipped egress for {self._request.room_name} ({reason}), saved {self.seconds_saved:.1f} egress-seconds"
+        )
+
+    async def aclose(self) -> None:
+        """Let an in-flight start request finish before the job tears down"""
+        self._done = True
+        if self._task is not None:
+            with contextlib.suppress(Exception):
+                await self._task
+
+    async def _start(self) -> None:
+        try:
+            info = await self._lkapi.egress.start_room_composite_egress(self._request)
+        except Exception as e:
+            _totals["failed"] += 1
+            logger.error(f"Failed to start egress for {self._request.room_name}: {e}")
+            raise
+        self.egress_id = info.egress_id
+        _totals["started"] += 1
+        logger.info(
+            f"Started egress {self.egress_id} for {self._request.room_name} after {self.seconds_saved:.1f}s of ringing"
+        )
+
+    def _record_saved(self) -> None:
+        self.seconds_saved = time.monotonic() - self._created_at
+        _totals["seconds_saved"] += self.seconds_saved
+
+
+def egress_stats() -> dict[str, float]:
+    return {**_totals, "seconds_saved": round(_totals["seconds_saved"], 1)}
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections import defaultdict, deque
+from collections.abc import Awaitable
+from typing import Any, Callable
+
+from shared.serialization import dumps_line
+
+logger = logging.getLogger("event-sink")
+
+# A batch is a list of (destination, event) pairs, in the order they were emitted
+Batch = list[tuple[str, dict[str, Any]]]
+BatchWriter = Callable[[Batch], Awaitable[None]]
+
+
+class EventSink:
+    """Per-session event buffer drained by a background writer task.
+
+    Event handlers call ``emit()``, which only appends to an in-memory ring
+    buffer. The writer task flushes whenever ``batch_size`` events are waiting
+    or ``flush_interval`` seconds have passed, so file or network I/O never
+    runs on the handler's call stack. When the buffer is full the oldest event
+    is dropped and counted rather than blocking the event loop.
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        *,
+        max_events: int = 4096,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._writer = writer
+        self._buffer: deque[tuple[str, dict[str, Any]]] = deque(maxlen=max_events)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        # backpressure counters
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.high_watermark = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def emit(self, data: dict[str, Any], destination: str) -> None:
+        if self._closed:
+            self.dropped += 1
+            return
+
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((destination, data))
+        self.enqueued += 1
+        self.high_watermark = max(self.high_watermark, len(self._buffer))
+
+        if len(self._buffer) >= self._batch_size:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        while self._buffer:
+            batch = [
+                self._buffer.popleft()
+                for _ in range(min(len(self._buffer), self._batch_size))
+            ]
+            try:
+                await self._writer(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"Failed to write {len(batch)} events: {e}")
+            self.flushes += 1
+
+    async def aclose(self) -> None:
+        """Stop accepting events and write out everything still buffered"""
+        self._closed = True
+        if self._task is not None:
+            # let an in-flight batch finish instead of cancelling it mid-write
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+        # writers that hold open uploads (e.g. S3LogWriter) finalize here
+        writer_close = getattr(self._writer, "aclose", None)
+        if writer_close is not None:
+            await writer_close()
+        logger.info(f"Event sink closed: {self.stats()}")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "depth": len(self._buffer),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+            "high_watermark": self.high_watermark,
+        }
+
+    async def _run(self) -> None:
+        while not self._closed:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            self._wake.clear()
+            await self.flush()
+
+
+def jsonl_file_writer() -> BatchWriter:
+    """Append each event as one JSON line to the file named by its destination.
+
+    Serialization and file writes run in a worker thread, one open/close per
+    file per batch instead of per event.
+    """
+
+    def _write(batch: Batch) -> None:
+        by_file: dict[str, list[bytes]] = defaultdict(list)
+        for filename, data in batch:
+            by_file[filename].append(dumps_line(data))
+        for filename, lines in by_file.items():
+            with open(filename, "ab") as f:  # "a" mode for append
+                f.writelines(lines)
+
+    async def write(batch: Batch) -> None:
+        await asyncio.to_thread(_write, batch)
+
+    return write
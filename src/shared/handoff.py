@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from livekit.agents import Agent, llm
+
+from shared.plugin_pool import set_voice
+
+logger = logging.getLogger("handoff")
+
+
+@dataclass(frozen=True)
+class Role:
+    """One of the parts a ``RoleAgent`` can play on a call.
+
+    ``tools`` are the role's own tools, on top of the ones defined on the
+    agent class that every role shares. ``voice`` is swapped onto the TTS, and
+    ``intro`` tells the LLM how to open once the role has taken over.
+    """
+
+    name: str
+    instructions: str
+    tools: tuple[llm.FunctionTool | llm.RawFunctionTool, ...] = ()
+    voice: str | None = None
+    intro: str | None = None
+
+
+class RoleAgent(Agent):
+    """An agent that hands the call between roles without being replaced.
+
+    Returning a new Agent from a tool tears down the running activity, so the
+    STT stream, the LLM and TTS connections and the turn detector are all set
+    up again and the caller hears a gap. ``switch_role`` instead updates the
+    instructions, tools and voice of the agent that is already running; the
+    chat history simply carries on.
+    """
+
+    def __init__(
+        self,
+        roles: dict[str, Role],
+        role: str,
+        *,
+        tools: list[llm.FunctionTool | llm.RawFunctionTool] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(
+            instructions=roles[role].instructions,
+            tools=[*(tools or []), *roles[role].tools],
+            **kwargs,
+        )
+        self._roles = roles
+        self.role = roles[role]
+        # the agent's own tools (passed in or defined on the class) stay across roles
+        self._own_tools = [t for t in self.tools if t not in self.role.tools]
+        # (from, to, seconds spent switching) for every handoff on this call
+        self.handoffs: list[tuple[str, str, float]] = []
+
+    async def switch_role(self, name: str) -> str:
+        """Hand the call to another role; returns the output for the transfer tool.
+
+        The reply that follows the transfer tool's output is generated with
+        the new role's instructions, tools and voice, so it is the new role
+        that opens.
+        """
+        role = self._roles[name]
+        if role is self.role:
+            return f"You are already {role.name}."
+
+        started = time.perf_counter()
+        await self.update_instructions(role.instructions)
+        await self.update_tools(self._tools_for(role))
+        if role.voice is not None:
+            tts = self.tts if self.tts is not None else self.session.tts
+            if tts is not None:
+                set_voice(tts, role.voice)
+
+        previous, self.role = self.role, role
+        elapsed = time.perf_counter() - started
+        self.handoffs.append((previous.name, role.name, elapsed))
+        logger.info(
+            f"Handed off from {previous.name} to {role.name} in {elapsed * 1000:.1f}ms"
+        )
+        return f"The call is now with {role.name}. {role.intro or ''}".strip()
+
+    def _tools_for(self, role: Role) -> list[llm.FunctionTool | llm.RawFunctionTool]:
+        return self._own_tools + list(role.tools)
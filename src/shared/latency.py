@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from livekit.agents import metrics
+
+logger = logging.getLogger("latency")
+
+# Log-spaced buckets from 10 ms to ~40 s, each 25% wider than the last. Like an
+# HDR histogram this keeps the relative error constant, so p99 of a 300 ms
+# stage is as precise as p50 of a 3 s one.
+LATENCY_BUCKETS = tuple(round(0.01 * 1.25**i, 4) for i in range(38))
+
+# Prompt sizes double per bucket, from a bare system prompt to a very long call
+PROMPT_TOKEN_BUCKETS = tuple(256 * 2**i for i in range(10))
+
+STAGES = (
+    "eou",
+    "transcription",
+    "on_user_turn_completed",
+    "llm_ttft",
+    "tts_ttfb",
+    "stt",
+    "e2e",
+)
+
+_histogram = None
+_prompt_histogram = None
+
+
+def _turn_histogram():
+    global _histogram
+    if _histogram is None:
+        from prometheus_client import Histogram
+
+        _histogram = Histogram(
+            "voice_agent_turn_latency_seconds",
+            "Per-turn latency by pipeline stage",
+            ["persona", "stage", "provider"],
+            buckets=LATENCY_BUCKETS,
+        )
+    return _histogram
+
+
+def _prompt_tokens_histogram():
+    global _prompt_histogram
+    if _prompt_histogram is None:
+        from prometheus_client import Histogram
+
+        _prompt_histogram = Histogram(
+            "voice_agent_prompt_tokens",
+            "Prompt tokens sent per LLM turn",
+            ["persona", "provider"],
+            buckets=PROMPT_TOKEN_BUCKETS,
+        )
+    return _prompt_histogram
+
+
+def _provider(label: str) -> str:
+    # "livekit.plugins.google.llm.LLM" -> "google"
+    parts = label.split(".")
+    if len(parts) > 2 and parts[:2] == ["livekit", "plugins"]:
+        return parts[2]
+    return label or "unknown"
+
+
+@dataclass
+class TurnLatency:
+    """One user turn's latency waterfall, joined by speech_id"""
+
+    speech_id: str
+    eou: float | None = None
+    transcription: float | None = None
+    on_user_turn_completed: float | None = None
+    stt: float | None = None
+    llm_ttft: float | None = None
+    tts_ttfb: float | None = None
+    prompt_tokens: int | None = None
+    prompt_cached_tokens: int | None = None
+    llm_provider: str | None = None
+    tts_provider: str | None = None
+    observed: set[str] = field(default_factory=set, repr=False)
+
+    @property
+    def e2e(self) -> float | None:
+        """User stopped speaking -> first agent audio, summed over the stages.
+
+        With preemptive generation the LLM can start before end of utterance,
+        so this is an upper bound on what the caller actually waited.
+        """
+        if self.eou is None or self.llm_ttft is None or self.tts_ttfb is None:
+            return None
+        return (
+            self.eou
+            + (self.on_user_turn_completed or 0.0)
+            + self.llm_ttft
+            + self.tts_ttfb
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.pop("observed")
+        data["e2e"] = self.e2e
+        return {k: round(v, 4) if isinstance(v, float) else v for k, v in data.items()}
+
+
+class LatencyTracker:
+    """Joins a session's EOU/STT/LLM/TTS metrics into per-turn records.
+
+    Feed it every ``metrics_collected`` event. Each stage is recorded in the
+    process's Prometheus histogram as soon as it arrives (labelled by persona
+    and provider), and ``waterfall()`` returns the call's turns for the
+    end-of-call webhook.
+    """
+
+    def __init__(self, persona: str) -> None:
+        self._persona = persona
+        self._turns: dict[str, TurnLatency] = {}
+        self._pending_stt: float | None = None
+        self._stt_provider = "unknown"
+
+    def collect(self, ev: metrics.AgentMetrics) -> None:
+        try:
+            self._collect(ev)
+        except Exception as e:
+            logger.warning(f"Could not record latency metrics: {e}")
+
+    def waterfall(self) -> list[dict[str, Any]]:
+        return [turn.to_dict() for turn in self._turns.values()]
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """p50/p95/p99 per stage over this call's turns"""
+        result = {}
+        for stage in STAGES:
+            values = sorted(
+                v
+                for v in (getattr(t, stage) for t in self._turns.values())
+                if v is not None
+            )
+            if values:
+                result[stage] = {
+                    "count": len(values),
+                    **{
+                        f"p{p}": round(
+                            values[min(len(values) - 1, int(p / 100 * len(values)))], 4
+                        )
+                        for p in (50, 95, 99)
+                    },
+                }
+        return result
+
+    def _collect(self, ev: metrics.AgentMetrics) -> None:
+        if isinstance(ev, metrics.STTMetrics):
+            # STT metrics carry no speech_id; attach them to the next user turn
+            if not ev.streamed:
+                self._pending_stt = ev.duration
+                self._stt_provider = _provider(ev.label)
+            return
+
+        if not isinstance(
+            ev, (metrics.EOUMetrics, metrics.LLMMetrics, metrics.TTSMetrics)
+        ):
+            return
+        speech_id = ev.speech_id
+        if not speech_id:
+            return
+        turn = self._turns.get(speech_id)
+        if turn is None:
+            turn = self._turns[speech_id] = TurnLatency(speech_id=speech_id)
+
+        if isinstance(ev, metrics.EOUMetrics):
+            self._set(turn, "eou", ev.end_of_utterance_delay, "turn_detector")
+            self._set(turn, "transcription", ev.transcription_delay, self._stt_provider)
+            self._set(
+                turn, "on_user_turn_completed", ev.on_user_turn_completed_delay, "agent"
+            )
+            if self._pending_stt is not None:
+                self._set(turn, "stt", self._pending_stt, self._stt_provider)
+                self._pending_stt = None
+        elif isinstance(ev, metrics.LLMMetrics):
+            turn.llm_provider = _provider(ev.label)
+            turn.prompt_tokens = ev.prompt_tokens
+            turn.prompt_cached_tokens = ev.prompt_cached_tokens
+            if ev.prompt_tokens and "prompt_tokens" not in turn.observed:
+                turn.observed.add("prompt_tokens")
+                _prompt_tokens_histogram().labels(
+                    self._persona, turn.llm_provider
+                ).observe(ev.prompt_tokens)
+            if ev.ttft >= 0:
+                self._set(turn, "llm_ttft", ev.ttft, turn.llm_provider)
+        elif isinstance(ev, metrics.TTSMetrics):
+            turn.tts_provider = _provider(ev.label)
+            if ev.ttfb >= 0:
+                self._set(turn, "tts_ttfb", ev.ttfb, turn.tts_provider)
+
+        if turn.e2e is not None and "e2e" not in turn.observed:
+            turn.observed.add("e2e")
+            _turn_histogram().labels(self._persona, "e2e", "pipeline").observe(turn.e2e)
+
+    def _set(
+        self, turn: TurnLatency, stage: str, value: float | None, provider: str
+    ) -> None:
+        # the first value wins; later metrics for the same speech are retries
+        if value is None or stage in turn.observed:
+            return
+        turn.observed.add(stage)
+        setattr(turn, stage, value)
+        _turn_histogram().labels(self._persona, stage, provider).observe(value)
+
+
+def configure_multiprocess_metrics() -> str:
+    """Point prometheus_client at a shared directory for job processes.
+
+    Every job runs in its own process, so their histograms are written to
+    PROMETHEUS_MULTIPROC_DIR and merged by the exporter. Call this in the main
+    process before the worker starts any job processes.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), f"voice-agent-metrics-{os.getpid()}")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    os.makedirs(path, exist_ok=True)
+    # stale files from a previous run would be merged into the new totals
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def serve_metrics(port: int, addr: str = "0.0.0.0") -> None:
+    """Expose the merged job-process histograms on :port/metrics"""
+    from prometheus_client import CollectorRegistry, start_http_server
+    from prometheus_client.multiprocess import MultiProcessCollector
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    start_http_server(port, addr=addr, registry=registry)
+    logger.info(f"Serving latency histograms on {addr}:{port}/metrics")
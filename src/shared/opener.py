@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from livekit.agents import NOT_GIVEN, Agent
+from livekit.agents.voice import SpeechHandle
+
+from shared.phrase_cache import Live, say_phrase
+
+
+@dataclass(frozen=True)
+class Opener:
+    """How a persona's call opens, kept apart from its system prompt.
+
+    With ``phrase`` the opener plays from the phrase cache and makes no LLM
+    request. Its segments are ``str.format`` templates filled from the values
+    passed to ``start``; ``Live`` segments are synthesized on every call.
+
+    Without it the LLM writes the first turn from the agent's instructions.
+    ``instructions`` are appended to those for that one reply, so they are a
+    line or two, never the prompt itself. Realtime models take reply
+    instructions in place of the session prompt, so leave them unset there.
+    """
+
+    phrase: tuple[str, ...] = ()
+    instructions: str | None = None
+
+    def start(self, agent: Agent, **values: Any) -> SpeechHandle:
+        if self.phrase:
+            segments = [
+                Live(s.format(**values)) if isinstance(s, Live) else s.format(**values)
+                for s in self.phrase
+            ]
+            return say_phrase(agent, *segments)
+        return agent.session.generate_reply(instructions=self.instructions or NOT_GIVEN)
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import wave
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from livekit import rtc
+from livekit.agents import NOT_GIVEN, Agent, NotGivenOr, tts
+from livekit.agents.voice import SpeechHandle
+
+logger = logging.getLogger("phrase-cache")
+
+# Options that change how a phrase sounds. Anything else on the TTS (api key,
+# timeouts, tokenizers) is irrelevant to the rendered audio.
+_VOICE_OPTIONS = (
+    "voice_id",
+    "voice",
+    "model",
+    "voice_settings",
+    "language",
+    "speed",
+    "sample_rate",
+)
+
+FRAME_MS = 20
+
+
+class Live(str):
+    """A phrase segment that is synthesized on every call and never cached.
+
+    Use it for high-cardinality or personal values such as customer names.
+    """
+
+
+def tts_fingerprint(engine: tts.TTS) -> str:
+    """Describe the voice a TTS instance speaks with, for use as a cache key"""
+    opts = getattr(engine, "_opts", None)
+    parts = [engine.label]
+    for name in _VOICE_OPTIONS:
+        if opts is not None and hasattr(opts, name):
+            parts.append(f"{name}={getattr(opts, name)!r}")
+    return "|".join(parts)
+
+
+@dataclass(frozen=True)
+class CachedPhrase:
+    pcm: bytes
+    sample_rate: int
+    num_channels: int
+
+    def frames(self) -> Iterator[rtc.AudioFrame]:
+        samples = self.sample_rate * FRAME_MS // 1000
+        step = samples * self.num_channels * 2
+        for offset in range(0, len(self.pcm), step):
+            chunk = self.pcm[offset : offset + step]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (self.num_channels * 2),
+            )
+
+
+class PhraseCache:
+    """Disk-backed LRU of pre-synthesized phrases.
+
+    Phrases are keyed by the TTS voice configuration and the exact text, kept
+    in memory up to ``max_memory_bytes`` and persisted as WAV files so every
+    job process on the host (and the next deploy with the same volume) shares
+    them. A miss streams from the TTS as usual and stores the result.
+    """
+
+    def __init__(
+        self, cache_dir: str | None = None, *, max_memory_bytes: int = 64 * 1024 * 1024
+    ) -> None:
+        self._dir = cache_dir or os.getenv("PHRASE_CACHE_DIR", "phrase_cache")
+        self._max_memory_bytes = max_memory_bytes
+        self._memory: OrderedDict[str, CachedPhrase] = OrderedDict()
+        self._memory_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, engine: tts.TTS, text: str) -> CachedPhrase | None:
+        key = self._key(engine, text)
+        phrase = self._memory.get(key)
+        if phrase is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return phrase
+
+        phrase = await asyncio.to_thread(self._read, key)
+        if phrase is not None:
+            self._remember(key, phrase)
+            self.disk_hits += 1
+            return phrase
+
+        self.misses += 1
+        return None
+
+    async def put(self, engine: tts.TTS, text: str, phrase: CachedPhrase) -> None:
+        key = self._key(engine, text)
+        self._remember(key, phrase)
+        try:
+            await asyncio.to_thread(self._write, key, phrase)
+        except OSError as e:
+            logger.warning(f"Could not persist phrase {text!r}: {e}")
+
+    async def warm(self, engine: tts.TTS, texts: Iterable[str]) -> None:
+        """Render any of ``texts`` that are not cached yet"""
+        for text in texts:
+            if await self.get(engine, text) is not None:
+                continue
+            try:
+                async for _ in self._synthesize(engine, text):
+                    pass
+            except Exception as e:
+                logger.warning(f"Could not pre-render phrase {text!r}: {e}")
+
+    async def stream(
+        self, engine: tts.TTS, segments: list[str]
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        """Audio for the segments in order, stitched into one utterance.
+
+        Every segment starts loading or synthesizing immediately, so a live
+        segment (e.g. the customer's name) is ready by the time the cached
+        prefix before it has played.
+        """
+        queues = [asyncio.Queue[Any]() for _ in segments]
+        producers = [
+            asyncio.create_task(self._produce(engine, segment, queue))
+            for segment, queue in zip(segments, queues)
+        ]
+        try:
+            for queue in queues:
+                while (frame := await queue.get()) is not None:
+                    if isinstance(frame, BaseException):
+                        raise frame
+                    yield frame
+        finally:
+            for task in producers:
+                task.cancel()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_phrases": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+        }
+
+    async def _produce(
+        self, engine: tts.TTS, segment: str, queue: asyncio.Queue[Any]
+    ) -> None:
+        try:
+            phrase = (
+                None if isinstance(segment, Live) else await self.get(engine, segment)
+            )
+            if phrase is not None:
+                for frame in phrase.frames():
+                    queue.put_nowait(frame)
+            else:
+                async for frame in self._synthesize(
+                    engine, segment, store=not isinstance(segment, Live)
+                ):
+                    queue.put_nowait(frame)
+        except Exception as e:
+            queue.put_nowait(e)
+        queue.put_nowait(None)
+
+    async def _synthesize(
+        self, engine: tts.TTS, text: str, *, store: bool = True
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        pcm = bytearray()
+        sample_rate = engine.sample_rate
+        num_channels = engine.num_channels
+        async with engine.synthesize(text) as stream:
+            async for ev in stream:
+                sample_rate = ev.frame.sample_rate
+                num_channels = ev.frame.num_channels
+                pcm += ev.frame.data.tobytes()
+                yield ev.frame
+
+        # only reached when the whole phrase was synthesized
+        if store and pcm:
+            await self.put(
+                engine, text, CachedPhrase(bytes(pcm), sample_rate, num_channels)
+            )
+
+    def _key(self, engine: tts.TTS, text: str) -> str:
+        return hashlib.sha256(
+            f"{tts_fingerprint(engine)}\0{text}".encode()
+        ).hexdigest()[:32]
+
+    def _remember(self, key: str, phrase: CachedPhrase) -> None:
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous.pcm)
+        self._memory[key] = phrase
+        self._memory_bytes += len(phrase.pcm)
+        while self._memory_bytes > self._max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.pcm)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir, f"{key}.wav")
+
+    def _read(self, key: str) -> CachedPhrase | None:
+        try:
+            with wave.open(self._path(key), "rb") as f:
+                return CachedPhrase(
+                    f.readframes(f.getnframes()), f.getframerate(), f.getnchannels()
+                )
+        except (FileNotFoundError, EOFError, wave.Error):
+            return None
+
+    def _write(self, key: str, phrase: CachedPhrase) -> None:
+        os.makedirs(self._dir, exist_ok=True)
+        path = self._path(key)
+        # write then rename so a concurrent reader never sees a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with wave.open(tmp, "wb") as f:
+            f.setnchannels(phrase.num_channels)
+            f.setsampwidth(2)
+            f.setframerate(phrase.sample_rate)
+            f.writeframes(phrase.pcm)
+        os.replace(tmp, path)
+
+
+@functools.lru_cache(maxsize=1)
+def get_phrase_cache() -> PhraseCache:
+    """The process-wide phrase cache"""
+    return PhraseCache()
+
+
+def say_phrase(
+    agent: Agent,
+    *segments: str,
+    allow_interruptions: NotGivenOr[bool] = NOT_GIVEN,
+    add_to_chat_ctx: bool = True,
+) -> SpeechHandle:
+    """Speak a fixed phrase through the phrase cache instead of the LLM.
+
+    Plain string segments are cached; wrap per-call values in ``Live`` so they
+    are synthesized fresh and stitched in place.
+    """
+    parts = [segment for segment in segments if segment]
+    text = " ".join(parts)
+    if agent.tts is None:
+        return agent.session.say(
+            text,
+            allow_interruptions=allow_interruptions,
+            add_to_chat_ctx=add_to_chat_ctx,
+        )
+
+    audio = get_phrase_cache().stream(agent.tts, parts)
+    return agent.session.say(
+        text,
+        audio=audio,
+        allow_interruptions=allow_interruptions,
+        add_to_chat_ctx=add_to_chat_ctx,
+    )
+
+
+def warm_phrases(agent: Agent, texts: Iterable[str]) -> asyncio.Task | None:
+    """Pre-render phrases in the background with the agent's voice"""
+    if agent.tts is None:
+        return None
+    return asyncio.create_task(get_phrase_cache().warm(agent.tts, list(texts)))
@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, fields
+from typing import Any, Callable
+
+from livekit.agents import get_job_context
+
+logger = logging.getLogger("plugin-pool")
+
+# Plugin kinds that hold no per-call state and can be handed to any number of
+# sessions at once. Everything else is borrowed exclusively and given back.
+# These also bind to the job's inference executor, so they are built on first
+# borrow inside a job rather than in prewarm().
+SHARED_KINDS = {"turn_detection"}
+
+
+@dataclass(frozen=True)
+class PluginKey:
+    """Identifies one interchangeable plugin configuration.
+
+    Two keys compare equal when they would build identical clients, so a warmed
+    instance built for one key can serve any call that asks for an equal key.
+    """
+
+    kind: str
+    provider: str
+    model: str | None = None
+    voice: str | None = None
+    voice_settings: tuple[tuple[str, Any], ...] = ()
+    options: tuple[tuple[str, Any], ...] = ()
+
+    @classmethod
+    def create(
+        cls,
+        kind: str,
+        provider: str,
+        *,
+        model: str | None = None,
+        voice: str | None = None,
+        voice_settings: dict[str, Any] | None = None,
+        **options: Any,
+    ) -> PluginKey:
+        return cls(
+            kind=kind,
+            provider=provider,
+            model=model,
+            voice=voice,
+            voice_settings=tuple(sorted((voice_settings or {}).items())),
+            # nested option dicts are frozen the same way as voice_settings
+            options=tuple(
+                sorted(
+                    (
+                        name,
+                        tuple(sorted(value.items()))
+                        if isinstance(value, dict)
+                        else value,
+                    )
+                    for name, value in options.items()
+                )
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class PipelineSpec:
+    """The STT/LLM/TTS/turn detector combination a persona runs with"""
+
+    stt: PluginKey | None = None
+    llm: PluginKey | None = None
+    tts: PluginKey | None = None
+    turn_detection: PluginKey | None = None
+
+    def keys(self) -> dict[str, PluginKey]:
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if getattr(self, f.name) is not None
+        }
+
+    def build(self) -> dict[str, Any]:
+        """Build fresh, unpooled instances (tests, console mode)"""
+        return {name: build_plugin(key) for name, key in self.keys().items()}
+
+
+PluginFactory = Callable[[PluginKey], Any]
+
+_FACTORIES: dict[tuple[str, str], PluginFactory] = {}
+
+# The module each factory builds from. Plugins are imported only for the
+# pipelines a process actually runs, since the provider SDKs make up most of
+# a job process's start-up time.
+PLUGIN_MODULES: dict[tuple[str, str], str] = {
+    ("stt", "elevenlabs"): "livekit.plugins.elevenlabs",
+    ("stt", "deepgram"): "livekit.plugins.deepgram",
+    ("llm", "google"): "livekit.plugins.google",
+    ("llm", "openai"): "livekit.plugins.openai",
+    ("llm", "openai_realtime"): "livekit.plugins.openai",
+    ("tts", "elevenlabs"): "livekit.plugins.elevenlabs",
+    ("turn_detection", "multilingual"): "livekit.plugins.turn_detector.multilingual",
+}
+
+# seconds spent importing each plugin module in this process
+IMPORT_TIMES: dict[str, float] = {}
+
+
+def import_plugins(*specs: PipelineSpec) -> None:
+    """Import the plugin modules the given pipelines are built from.
+
+    LiveKit plugins register themselves on import and refuse to do so off the
+    main thread, so call this at module level (or in prewarm) rather than
+    leaving the first import to a factory running inside a job. Importing
+    them in the worker's main process also lets ``download-files`` fetch
+    their models and registers the turn detector's inference runner.
+    """
+    for spec in specs:
+        for key in spec.keys().values():
+            module = PLUGIN_MODULES.get((key.kind, key.provider))
+            if module is None or module in IMPORT_TIMES:
+                continue
+            started = time.perf_counter()
+            importlib.import_module(module)
+            IMPORT_TIMES[module] = time.perf_counter() - started
+            logger.debug(f"Imported {module} in {IMPORT_TIMES[module]:.2f}s")
+
+
+def register_factory(kind: str, provider: str):
+    """Register the constructor used for a (kind, provider) pair"""
+
+    def decorator(fnc: PluginFactory) -> PluginFactory:
+        _FACTORIES[(kind, provider)] = fnc
+        return fnc
+
+    return decorator
+
+
+def build_plugin(key: PluginKey) -> Any:
+    factory = _FACTORIES.get((key.kind, key.provider))
+    if factory is None:
+        raise ValueError(f"No plugin factory registered for {key.kind}/{key.provider}")
+    return factory(key)
+
+
+@register_factory("stt", "elevenlabs")
+def _elevenlabs_stt(key: PluginKey):
+    from livekit.plugins import elevenlabs
+
+    return elevenlabs.STT(**dict(key.options))
+
+
+@register_factory("stt", "deepgram")
+def _deepgram_stt(key: PluginKey):
+    from livekit.plugins import deepgram
+
+    if key.model:
+        return deepgram.STT(model=key.model, **dict(key.options))
+    return deepgram.STT(**dict(key.options))
+
+
+@register_factory("llm", "google")
+def _google_llm(key: PluginKey):
+    from livekit.plugins import google
+
+    return google.LLM(model=key.model, **dict(key.options))
+
+
+@register_factory("llm", "openai")
+def _openai_llm(key: PluginKey):
+    from livekit.plugins import openai
+
+    return openai.LLM(model=key.model, **dict(key.options))
+
+
+@register_factory("llm", "openai_realtime")
+def _openai_realtime_llm(key: PluginKey):
+    from livekit.plugins import openai
+    from openai.types.beta.realtime.session import TurnDetection as OpenAITurnDetection
+
+    kwargs: dict[str, Any] = dict(key.options)
+    if "turn_detection" in kwargs:
+        kwargs["turn_detection"] = OpenAITurnDetection(**dict(kwargs["turn_detection"]))
+    return openai.realtime.RealtimeModel(model=key.model, voice=key.voice, **kwargs)
+
+
+@register_factory("tts", "elevenlabs")
+def _elevenlabs_tts(key: PluginKey):
+    from livekit.plugins import elevenlabs
+
+    kwargs: dict[str, Any] = dict(key.options)
+    if key.model:
+        kwargs["model"] = key.model
+    if key.voice:
+        kwargs["voice_id"] = key.voice
+    if key.voice_settings:
+        kwargs["voice_settings"] = elevenlabs.VoiceSettings(**dict(key.voice_settings))
+    return elevenlabs.TTS(**kwargs)
+
+
+@register_factory("turn_detection", "multilingual")
+def _multilingual_turn_detector(key: PluginKey):
+    from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
+    return MultilingualModel(**dict(key.options))
+
+
+def set_voice(tts: Any, voice: str) -> None:
+    """Switch a TTS instance to another voice without rebuilding it"""
+    # checked by module so this does not import a plugin the process never loaded
+    if type(tts).__module__.startswith("livekit.plugins.elevenlabs"):
+        tts.update_options(voice_id=voice)
+    else:
+        tts.update_options(voice=voice)
+
+
+class PluginLease:
+    """A set of plugin instances borrowed from a pool for one call"""
+
+    def __init__(self, pool: PluginPool, borrowed: dict[str, tuple[PluginKey, Any]]):
+        self._pool = pool
+        self._borrowed = borrowed
+        self._released = False
+
+    @property
+    def plugins(self) -> dict[str, Any]:
+        """Keyword arguments ready to pass to ``Agent.__init__``"""
+        return {name: instance for name, (_, instance) in self._borrowed.items()}
+
+    async def arelease(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        for key, instance in self._borrowed.values():
+            await self._pool.recycle(key, instance)
+
+
+class PluginPool:
+    """Process-wide pool of warmed STT/LLM/TTS clients keyed by configuration.
+
+    ``prewarm()`` fills it next to the VAD so a call does not pay client
+    construction on its critical path. With the default process executor each
+    job runs in its own process, so the pool only serves that one job; idle
+    instances are handed to later jobs only when jobs share a process (the
+    thread executor, the load test).
+
+    Borrowed instances pick up the job's http session on first use, which is
+    closed with the job, so ``recycle()`` closes them and warms a replacement
+    instead of handing them on.
+    """
+
+    def __init__(self) -> None:
+        self._idle: dict[PluginKey, deque[Any]] = defaultdict(deque)
+        self._shared: dict[PluginKey, Any] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def prewarm(self, spec: PipelineSpec, count: int = 1) -> None:
+        for key in spec.keys().values():
+            if key.kind in SHARED_KINDS:
+                continue
+            with self._lock:
+                missing = count - len(self._idle[key])
+            for _ in range(max(missing, 0)):
+                try:
+                    instance = self._create(key)
+                except Exception as e:
+                    logger.warning(f"Could not prewarm {key.kind}/{key.provider}: {e}")
+                    break
+                self.release(key, instance)
+
+    def acquire(self, key: PluginKey) -> Any:
+        with self._lock:
+            if key.kind in SHARED_KINDS and key in self._shared:
+                self.reused += 1
+                return self._shared[key]
+            if self._idle[key]:
+                self.reused += 1
+                return self._idle[key].popleft()
+
+        instance = self._create(key)
+        if key.kind in SHARED_KINDS:
+            with self._lock:
+                instance = self._shared.setdefault(key, instance)
+        return instance
+
+    def release(self, key: PluginKey, instance: Any) -> None:
+        """Add an instance that no call has used yet"""
+        with self._lock:
+            if key.kind in SHARED_KINDS:
+                self._shared.setdefault(key, instance)
+            else:
+                self._idle[key].append(instance)
+
+    async def recycle(self, key: PluginKey, instance: Any) -> None:
+        """Take back an instance after its call, replacing it with a fresh one"""
+        if key.kind in SHARED_KINDS:
+            self.release(key, instance)
+            return
+
+        if instance is not None:
+            try:
+                await instance.aclose()
+            except Exception as e:
+                logger.warning(
+                    f"Could not close {key.kind}/{key.provider} instance: {e}"
+                )
+        try:
+            fresh = self._create(key)
+        except Exception as e:
+            # the next acquire() builds one on demand instead
+            logger.warning(f"Could not replace {key.kind}/{key.provider} instance: {e}")
+            return
+        self.release(key, fresh)
+
+    def lease(self, spec: PipelineSpec) -> PluginLease:
+        borrowed = {name: (key, self.acquire(key)) for name, key in spec.keys().items()}
+        return PluginLease(self, borrowed)
+
+    def idle_count(self, key: PluginKey) -> int:
+        with self._lock:
+            if key.kind in SHARED_KINDS:
+                return int(key in self._shared)
+            return len(self._idle[key])
+
+    def _create(self, key: PluginKey) -> Any:
+        instance = build_plugin(key)
+        with self._lock:
+            self.created += 1
+        logger.info(
+            f"Created {key.kind}/{key.provider} instance (model={key.model}, voice={key.voice})"
+        )
+        return instance
+
+
+def create_plugin_pool(*specs: PipelineSpec) -> PluginPool:
+    """Build a pool and warm one instance of every plugin the specs name"""
+    pool = PluginPool()
+    for spec in specs:
+        pool.prewarm(spec)
+    return pool
+
+
+def borrow_plugins(spec: PipelineSpec) -> dict[str, Any]:
+    """Borrow a warmed pipeline for the current job.
+
+    The instances are recycled into the process pool when the job shuts down. Outside
+    of a job (tests, console runs without a prewarmed pool) fresh instances are
+    built instead.
+    """
+    try:
+        job_ctx = get_job_context()
+    except RuntimeError:
+        return spec.build()
+
+    pool: PluginPool | None = job_ctx.proc.userdata.get("plugin_pool")
+    if pool is None:
+        return spec.build()
+
+    lease = pool.lease(spec)
+    job_ctx.add_shutdown_callback(lease.arelease)
+    return lease.plugins
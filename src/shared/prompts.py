@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import functools
+import re
+from collections.abc import Mapping
+from typing import Any
+
+_VARIABLE = re.compile(r"\{\{(\w+)\}\}")
+
+CALL_DETAILS = """
+
+⸻
+
+CALL DETAILS
+Wherever the prompt above has a placeholder in double braces, use this call's value:
+"""
+
+
+def dynamic_vars(dial_info: Any) -> dict[str, Any]:
+    """The per-call prompt values a dispatcher puts in the job metadata"""
+    if not isinstance(dial_info, dict):
+        return {}
+    return dial_info.get("dynamic_vars") or {}
+
+
+class PromptTemplate:
+    """A persona prompt parsed once, at import, into a static prefix and per-call values.
+
+    ``{{var}}`` placeholders stay in the prefix as written, so the prefix is
+    the same for every call and provider-side prompt caching can hit on it.
+    A call's values go into a short suffix, and rendering is a single
+    concatenation, cached per distinct set of values.
+    """
+
+    def __init__(
+        self, text: str, *, name: str = "prompt", cache_size: int = 256
+    ) -> None:
+        self.name = name
+        self.prefix = text
+        self.variables = tuple(dict.fromkeys(_VARIABLE.findall(text)))
+        self._render = functools.lru_cache(maxsize=cache_size)(self._concat)
+
+    def missing(self, values: Mapping[str, Any]) -> list[str]:
+        return [name for name in self.variables if values.get(name) is None]
+
+    def render(self, values: Mapping[str, Any] | None = None, **overrides: Any) -> str:
+        """The full instructions for a call; raises ValueError if a placeholder has no value"""
+        values = {**(values or {}), **overrides}
+        missing = self.missing(values)
+        if missing:
+            raise ValueError(
+                f"The {self.name} prompt has no value for {', '.join(missing)}"
+            )
+        return self._render(tuple(str(values[name]) for name in self.variables))
+
+    def _concat(self, values: tuple[str, ...]) -> str:
+        if not self.variables:
+            return self.prefix
+        return (
+            self.prefix
+            + CALL_DETAILS
+            + "".join(
+                f"{{{{{name}}}}} = {value}\n"
+                for name, value in zip(self.variables, values)
+            )
+        )
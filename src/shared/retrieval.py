@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+_TOKEN_RE = re.compile(r"[a-z0-9₹]+")
+
+_STOPWORDS = frozenset(
+    [
+        "a",
+        "an",
+        "and",
+        "are",
+        "as",
+        "at",
+        "be",
+        "by",
+        "can",
+        "do",
+        "does",
+        "for",
+        "from",
+        "how",
+        "i",
+        "if",
+        "in",
+        "is",
+        "it",
+        "its",
+        "me",
+        "my",
+        "of",
+        "on",
+        "or",
+        "our",
+        "the",
+        "their",
+        "them",
+        "they",
+        "this",
+        "to",
+        "was",
+        "we",
+        "what",
+        "when",
+        "where",
+        "which",
+        "who",
+        "will",
+        "with",
+        "you",
+        "your",
+    ]
+)
+
+# "Mission and Value Proposition" style headings: "1. Title" or "1.2 Title"
+_HEADING_RE = re.compile(r"^(\d+)(?:\.(\d+))?\.?\s+(\S.*)$")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with stopwords removed and plurals folded"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+@dataclass(frozen=True)
+class Chunk:
+    id: str
+    title: str
+    text: str
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    chunk: Chunk
+    score: float
+
+
+def chunk_sections(text: str) -> list[Chunk]:
+    """Split a numbered knowledge base into one chunk per subsection.
+
+    Sections without subsections ("6. Handling Business & Job Inquiries")
+    become a single chunk. Each chunk title carries its parent section so a
+    hit on "Cancellation Policy" still says which product line it belongs to.
+    """
+    chunks: list[Chunk] = []
+    section_title = ""
+    current_id: str | None = None
+    current_title = ""
+    lines: list[str] = []
+
+    def flush() -> None:
+        body = "\n".join(lines).strip()
+        if current_id is not None and body:
+            chunks.append(Chunk(id=current_id, title=current_title, text=body))
+
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line.strip())
+        if match is None:
+            lines.append(line)
+            continue
+
+        flush()
+        lines = []
+        major, minor, title = match.groups()
+        if minor is None:
+            section_title = title
+            current_id, current_title = major, title
+        else:
+            current_id = f"{major}.{minor}"
+            current_title = f"{section_title} > {title}"
+
+    flush()
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over a small, static set of chunks.
+
+    Built once per process (the Livspace knowledge base is ~40 chunks), so a
+    query is a handful of dict lookups and never leaves the process.
+    """
+
+    def __init__(
+        self, chunks: Iterable[Chunk], *, k1: float = 1.5, b: float = 0.75
+    ) -> None:
+        self._chunks = list(chunks)
+        self._k1 = k1
+        self._b = b
+        # titles are weighted twice so a heading match beats a passing mention
+        self._term_freqs = [
+            Counter(tokenize(chunk.title) * 2 + tokenize(chunk.text))
+            for chunk in self._chunks
+        ]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (
+            sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        )
+
+        doc_freqs: Counter[str] = Counter()
+        for tf in self._term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(self._chunks)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    @property
+    def chunks(self) -> list[Chunk]:
+        return list(self._chunks)
+
+    def search(
+        self, query: str, k: int = 3, *, min_score: float = 0.0
+    ) -> list[SearchResult]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        if not terms:
+            return []
+
+        results = []
+        for chunk, tf, length in zip(self._chunks, self._term_freqs, self._lengths):
+            score = 0.0
+            norm = self._k1 * (1 - self._b + self._b * length / self._avg_length)
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self._k1 + 1) / (freq + norm)
+            if score > min_score:
+                results.append(SearchResult(chunk, score))
+
+        results.sort(key=lambda r: r.score, reverse=True)
+        return results[:k]
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from shared.event_sink import Batch
+from shared.serialization import compressor, dumps_line
+from shared.storage import run_io
+
+logger = logging.getLogger("s3-log")
+
+# S3 rejects multipart parts smaller than 5 MiB, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3StreamingLog:
+    """Append-only JSONL object written to S3 as a multipart upload.
+
+    Lines are buffered locally and shipped as a part once ``part_size`` bytes
+    have accumulated, then the upload is completed once when the call ends.
+    Every byte is sent exactly once, so a call with n events costs O(n) upload
+    traffic instead of re-downloading and re-uploading the whole log per event.
+    Short logs that never fill a part are written with a single ``put_object``.
+
+    With ``compression="zstd"`` the whole log is one zstd stream, cut into
+    parts as the compressed bytes accumulate.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        key: str,
+        *,
+        part_size: int = MIN_PART_SIZE,
+        content_type: str = "application/x-ndjson",
+        compression: str | None = None,
+    ) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = max(part_size, MIN_PART_SIZE)
+        self._content_type = content_type
+        self._compressor = compressor(compression)
+        if self._compressor is not None:
+            self._key = f"{key}.zst"
+            self._content_type = "application/zstd"
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self.bytes_written = 0
+        self.bytes_stored = 0
+
+    @property
+    def key(self) -> str:
+        return self._key
+
+    async def write(self, data: bytes) -> None:
+        if self._closed:
+            raise RuntimeError(f"S3 log {self._key} is already closed")
+
+        async with self._lock:
+            self.bytes_written += len(data)
+            if self._compressor is not None:
+                data = self._compressor.compress(data)
+            self._buffer += data
+            self.bytes_stored += len(data)
+            if len(self._buffer) >= self._part_size:
+                await self._upload_part()
+
+    async def write_json(self, data: dict[str, Any]) -> None:
+        await self.write(dumps_line(data))
+
+    async def aclose(self) -> None:
+        """Flush the remaining bytes and finalize the object"""
+        async with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._compressor is not None:
+                tail = self._compressor.flush()
+                self._buffer += tail
+                self.bytes_stored += len(tail)
+
+            try:
+                if self._upload_id is None:
+                    if self._buffer:
+                        await run_io(
+                            self._client.put_object,
+                            Bucket=self._bucket,
+                            Key=self._key,
+                            Body=bytes(self._buffer),
+                            ContentType=self._content_type,
+                        )
+                else:
+                    if self._buffer:
+                        await self._upload_part()
+                    await run_io(
+                        self._client.complete_multipart_upload,
+                        Bucket=self._bucket,
+                        Key=self._key,
+                        UploadId=self._upload_id,
+                        MultipartUpload={"Parts": self._parts},
+                    )
+            except Exception:
+                await self._abort()
+                raise
+
+        logger.info(
+            f"Finalized s3://{self._bucket}/{self._key} ({self.bytes_written} bytes, {self.bytes_stored} stored, {len(self._parts)} parts)"
+        )
+
+    async def _upload_part(self) -> None:
+        if self._upload_id is None:
+            response = await run_io(
+                self._client.create_multipart_upload,
+                Bucket=self._bucket,
+                Key=self._key,
+                ContentType=self._content_type,
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        response = await run_io(
+            self._client.upload_part,
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    async def _abort(self) -> None:
+        if self._upload_id is None:
+            return
+        try:
+            await run_io(
+                self._client.abort_multipart_upload,
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to abort multipart upload for {self._key}: {e}")
+
+
+class S3LogWriter:
+    """EventSink writer that streams each destination key into its own S3 log"""
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        *,
+        part_size: int = MIN_PART_SIZE,
+        compression: str | None = None,
+    ) -> None:
+        self._client = client
+        self._bucket = bucket
+        self._part_size = part_size
+        self._compression = compression
+        self._logs: dict[str, S3StreamingLog] = {}
+
+    async def __call__(self, batch: Batch) -> None:
+        chunks: dict[str, list[bytes]] = {}
+        for key, data in batch:
+            chunks.setdefault(key, []).append(dumps_line(data))
+
+        for key, lines in chunks.items():
+            log = self._logs.get(key)
+            if log is None:
+                log = self._logs[key] = S3StreamingLog(
+                    self._client,
+                    self._bucket,
+                    key,
+                    part_size=self._part_size,
+                    compression=self._compression,
+                )
+            await log.write(b"".join(lines))
+
+    async def aclose(self) -> None:
+        for log in self._logs.values():
+            try:
+                await log.aclose()
+            except Exception as e:
+                logger.error(f"Failed to finalize S3 log {log.key}: {e}")
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+from enum import Enum
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is the fallback
+    orjson = None
+
+logger = logging.getLogger("serialization")
+
+# "zstd" compresses each streamed session log as a whole; needs the zstandard package
+LOG_COMPRESSION = os.getenv("EVENT_LOG_COMPRESSION", "")
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, BaseException):
+        return f"{type(obj).__name__}: {obj}"
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.hex()
+    model_dump = getattr(obj, "model_dump", None)
+    if model_dump is not None:
+        return model_dump(exclude_none=True)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+
+    def dumps(data: Any) -> bytes:
+        """Compact JSON bytes, with no indentation or separator whitespace"""
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+else:
+
+    def dumps(data: Any) -> bytes:
+        """Compact JSON bytes, with no indentation or separator whitespace"""
+        return json.dumps(
+            data, default=_default, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+
+def dumps_line(data: Any) -> bytes:
+    """One JSONL line"""
+    return dumps(data) + b"\n"
+
+
+def compressor(compression: str | None = None) -> Any | None:
+    """A streaming compressor for a whole log, or None to write it as is.
+
+    The returned object has ``compress(data)`` and ``flush()``; everything it
+    returns, concatenated, is one zstd frame.
+    """
+    compression = LOG_COMPRESSION if compression is None else compression
+    if not compression:
+        return None
+    if compression != "zstd":
+        raise ValueError(f"Unknown event log compression: {compression}")
+    try:
+        import zstandard
+    except ImportError:
+        logger.warning(
+            "zstd compression needs the zstandard package, writing uncompressed logs"
+        )
+        return None
+    return zstandard.ZstdCompressor().compressobj()
+
+
+# Session events, projected to the fields worth keeping in the log. model_dump()
+# copies every nested object, including fields that repeat the event's own or are
+# derivable from others, and leaves objects (errors, plugin instances) that the
+# JSON encoder cannot handle.
+
+# metrics fields that repeat the event (timestamp ~ created_at) or are derivable
+_DROPPED_METRICS = frozenset({"timestamp", "total_tokens", "tokens_per_second"})
+
+
+def _fields(obj: Any, names: Any) -> dict[str, Any]:
+    return {
+        name: value for name in names if (value := getattr(obj, name, None)) is not None
+    }
+
+
+@functools.cache
+def _metrics_fields(metrics_type: type) -> tuple[str, ...]:
+    return tuple(
+        name for name in metrics_type.model_fields if name not in _DROPPED_METRICS
+    )
+
+
+def _metrics(metrics: Any) -> dict[str, Any]:
+    return _fields(metrics, _metrics_fields(type(metrics)))
+
+
+def _message(message: Any) -> dict[str, Any] | None:
+    if message is None:
+        return None
+    if getattr(message, "type", None) != "message":
+        return message.model_dump(exclude_none=True)
+    data = _fields(message, ("id", "role", "content", "transcript_confidence"))
+    if message.interrupted:
+        data["interrupted"] = True
+    return data
+
+
+def _error(error: Any) -> dict[str, Any] | None:
+    if error is None:
+        return None
+    return {
+        "type": error.type,
+        "label": error.label,
+        "error": _default(error.error),
+        "recoverable": error.recoverable,
+    }
+
+
+def _tool_calls(ev: Any) -> list[dict[str, Any]]:
+    # the outputs repeat each call's name and call_id, so pair them instead
+    calls = []
+    for call, output in zip(ev.function_calls, ev.function_call_outputs):
+        data = {"name": call.name, "call_id": call.call_id, "arguments": call.arguments}
+        if output is not None:
+            data["output"] = output.output
+            if output.is_error:
+                data["is_error"] = True
+        calls.append(data)
+    return calls
+
+
+_PROJECTIONS: dict[str, Callable[[Any], dict[str, Any]]] = {
+    "metrics_collected": lambda ev: {"metrics": _metrics(ev.metrics)},
+    "user_state_changed": lambda ev: {
+        "old_state": ev.old_state,
+        "new_state": ev.new_state,
+    },
+    "agent_state_changed": lambda ev: {
+        "old_state": ev.old_state,
+        "new_state": ev.new_state,
+    },
+    "speech_created": lambda ev: {
+        "source": ev.source,
+        "user_initiated": ev.user_initiated,
+    },
+    "user_input_transcribed": lambda ev: _fields(
+        ev, ("transcript", "is_final", "speaker_id", "language")
+    ),
+    "conversation_item_added": lambda ev: {"item": _message(ev.item)},
+    "function_tools_executed": lambda ev: {"calls": _tool_calls(ev)},
+    "agent_false_interruption": lambda ev: {
+        "resumed": ev.resumed,
+        **_fields(ev, ("extra_instructions",)),
+        **({"message": _message(ev.message)} if ev.message is not None else {}),
+    },
+    "error": lambda ev: {
+        "error": _error(ev.error),
+        "source": type(ev.source).__module__,
+    },
+    "close": lambda ev: {
+        "reason": _default(ev.reason),
+        **({"error": _error(ev.error)} if ev.error is not None else {}),
+    },
+}
+
+
+def project_event(ev: Any) -> dict[str, Any]:
+    """The compact log record for a session event"""
+    projection = _PROJECTIONS.get(ev.type)
+    if projection is None:
+        return ev.model_dump(exclude_none=True)
+    return {"type": ev.type, "created_at": ev.created_at, **projection(ev)}
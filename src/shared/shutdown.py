@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+from shared.serialization import dumps
+from shared.storage import default_bucket, get_s3_client, run_io
+from shared.webhooks import drain_webhooks, post_webhook
+
+logger = logging.getLogger("shutdown")
+
+
+@dataclass
+class _Upload:
+    key: str
+    bucket: str | None
+    content_type: str
+    body: bytes | None = None
+    filename: str | None = None
+
+
+class ShutdownPipeline:
+    """End-of-call uploads and the completion webhook, run concurrently under one deadline.
+
+    Create it next to the egress so it can replay earlier spooled uploads in
+    the background during the call. In the shutdown callback, queue the
+    artifacts with ``upload_json``/``upload_file``/``webhook`` and await
+    ``run()``. Whatever has not finished by ``deadline`` seconds is written
+    to a local spool (uploads) or the webhook spool and retried by a later
+    job, so the process slot is released on time either way.
+    """
+
+    def __init__(
+        self, *, deadline: float | None = None, spool_dir: str | None = None, s3=None
+    ) -> None:
+        self._deadline = (
+            deadline
+            if deadline is not None
+            else float(os.getenv("SHUTDOWN_DEADLINE", "8"))
+        )
+        self._spool_dir = spool_dir or os.getenv("UPLOAD_SPOOL_DIR", "upload_spool")
+        self._s3 = s3
+        self._uploads: list[_Upload] = []
+        self._webhooks = 0
+
+        self.uploaded = 0
+        self.spooled = 0
+
+        _start_replay(self._spool_dir, self._client)
+
+    def upload_json(self, data: Any, s3_key: str, *, bucket: str | None = None) -> None:
+        body = dumps(data)
+        self._uploads.append(_Upload(s3_key, bucket, "application/json", body=body))
+
+    def upload_file(
+        self, filename: str, s3_key: str, *, bucket: str | None = None
+    ) -> None:
+        """Upload a local file; it is removed once uploaded or moved into the spool"""
+        self._uploads.append(
+            _Upload(s3_key, bucket, "application/octet-stream", filename=filename)
+        )
+
+    def webhook(self, data: dict[str, Any], url: str) -> None:
+        post_webhook(data, url)
+        self._webhooks += 1
+
+    async def run(self) -> None:
+        started = time.monotonic()
+        tasks = {
+            asyncio.create_task(self._upload(upload)): upload
+            for upload in self._uploads
+        }
+        done, pending = (
+            await asyncio.wait(tasks, timeout=self._deadline)
+            if tasks
+            else (set(), set())
+        )
+
+        leftovers = [tasks[task] for task in pending]
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is not None:
+                logger.error(
+                    f"Failed to upload s3://{tasks[task].bucket}/{tasks[task].key}: {task.exception()}"
+                )
+                leftovers.append(tasks[task])
+        self.uploaded = len(tasks) - len(leftovers)
+        if leftovers:
+            # not run_io: its threads may still be busy with the uploads just cancelled
+            await asyncio.to_thread(_spool, self._spool_dir, leftovers)
+            self.spooled = len(leftovers)
+
+        # the completion webhook was queued first, so it has been in flight alongside the uploads
+        await drain_webhooks(max(self._deadline - (time.monotonic() - started), 0.0))
+        logger.info(
+            f"Shutdown pipeline finished in {time.monotonic() - started:.2f}s: "
+            f"{self.uploaded} uploaded, {self.spooled} spooled, {self._webhooks} webhooks"
+        )
+
+    def _client(self):
+        return self._s3 or get_s3_client()
+
+    async def _upload(self, upload: _Upload) -> None:
+        await _put(self._client(), upload)
+        if upload.filename is not None:
+            os.remove(upload.filename)
+
+
+async def _put(client, upload: _Upload) -> None:
+    bucket = upload.bucket or default_bucket()
+    if upload.body is not None:
+        await run_io(
+            client.put_object,
+            Bucket=bucket,
+            Key=upload.key,
+            Body=upload.body,
+            ContentType=upload.content_type,
+        )
+    else:
+        await run_io(
+            client.upload_file,
+            upload.filename,
+            bucket,
+            upload.key,
+            ExtraArgs={"ContentType": upload.content_type},
+        )
+    logger.info(f"Uploaded s3://{bucket}/{upload.key}")
+
+
+def _spool(spool_dir: str, uploads: list[_Upload]) -> None:
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, f"uploads_{os.getpid()}.jsonl")
+    with open(path, "a") as f:
+        for upload in uploads:
+            body_path = os.path.join(spool_dir, f"{uuid.uuid4().hex}.body")
+            if upload.body is not None:
+                with open(body_path, "wb") as body:
+                    body.write(upload.body)
+            elif not os.path.exists(upload.filename):
+                # the upload finished after all, between the deadline and the cancel
+                continue
+            elif os.path.dirname(os.path.abspath(upload.filename)) == os.path.abspath(
+                spool_dir
+            ):
+                body_path = upload.filename
+            else:
+                shutil.move(upload.filename, body_path)
+            record = {
+                "path": body_path,
+                "key": upload.key,
+                "bucket": upload.bucket,
+                "content_type": upload.content_type,
+            }
+            f.write(json.dumps(record) + "\n")
+    logger.warning(f"Spooled {len(uploads)} unfinished uploads to {path}")
+
+
+def _spool_files(spool_dir: str) -> list[str]:
+    if not os.path.isdir(spool_dir):
+        return []
+    return sorted(name for name in os.listdir(spool_dir) if name.endswith(".jsonl"))
+
+
+def _claim(path: str) -> list[dict[str, Any]] | None:
+    """Read and remove a spool file; None if another process claimed it first"""
+    claimed = f"{path}.{os.getpid()}.replay"
+    try:
+        # rename first so two processes never replay the same file
+        os.rename(path, claimed)
+    except OSError:
+        return None
+    with open(claimed) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    os.remove(claimed)
+    return records
+
+
+_replay_task: asyncio.Task | None = None
+
+
+def _start_replay(spool_dir: str, client) -> None:
+    global _replay_task
+    loop = asyncio.get_running_loop()
+    if (
+        _replay_task is not None
+        and _replay_task.get_loop() is loop
+        and not _replay_task.done()
+    ):
+        return
+    _replay_task = loop.create_task(replay_uploads(spool_dir, client))
+
+
+async def replay_uploads(spool_dir: str, client=get_s3_client) -> int:
+    """Upload everything spooled by earlier jobs; returns how many went through"""
+    uploaded = 0
+    for name in await asyncio.to_thread(_spool_files, spool_dir):
+        records = await asyncio.to_thread(_claim, os.path.join(spool_dir, name))
+        if records is None:
+            continue
+
+        pending = [
+            _Upload(r["key"], r["bucket"], r["content_type"], filename=r["path"])
+            for r in records
+        ]
+        failed: list[_Upload] = []
+        try:
+            while pending:
+                upload = pending[0]
+                try:
+                    await _put(client(), upload)
+                    await asyncio.to_thread(os.remove, upload.filename)
+                    uploaded += 1
+                except Exception as e:
+                    logger.warning(f"Spooled upload of {upload.key} failed again: {e}")
+                    failed.append(upload)
+                pending.pop(0)
+        finally:
+            # failures, and anything not reached if the job ends mid-replay, go back in the spool
+            if failed or pending:
+                await asyncio.to_thread(_spool, spool_dir, failed + pending)
+        logger.info(
+            f"Replayed {len(records) - len(failed)} of {len(records)} spooled uploads from {name}"
+        )
+    return uploaded
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from livekit.agents import JobProcess
+
+logger = logging.getLogger("startup")
+
+
+class StartupProfile:
+    """Wall time of each prewarm step in a job process"""
+
+    def __init__(self) -> None:
+        self.steps: list[tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.steps)
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps)
+
+
+def prewarm_profile(proc: JobProcess) -> StartupProfile:
+    """The profile of this process's prewarm, kept next to the warmed models"""
+    return proc.userdata.setdefault("startup_profile", StartupProfile())
+
+
+def log_prewarm(proc: JobProcess) -> None:
+    profile = prewarm_profile(proc)
+    logger.info(f"Prewarmed in {profile.total:.2f}s: {profile.summary()}")
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s?( *)(\S+)")
+
+
+def parse_importtime(output: str) -> list[ImportTime]:
+    """Parse the stderr of ``python -X importtime``, one entry per imported module"""
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, module = match.groups()
+            imports.append(
+                ImportTime(module, int(self_us) / 1e6, int(cumulative_us) / 1e6)
+            )
+    return imports
+
+
+def package_of(module: str) -> str:
+    """``livekit.plugins.google.llm`` -> ``livekit.plugins.google``, ``boto3.session`` -> ``boto3``"""
+    parts = module.split(".")
+    if parts[:2] == ["livekit", "plugins"]:
+        return ".".join(parts[:3])
+    if parts[0] == "livekit":
+        return ".".join(parts[:2])
+    return parts[0]
+
+
+def import_time_by_package(imports: list[ImportTime]) -> dict[str, float]:
+    """Import time per package, counting self time so dependencies show up under their own name"""
+    totals: dict[str, float] = defaultdict(float)
+    for entry in imports:
+        totals[package_of(entry.module)] += entry.self_seconds
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import os
+from collections.abc import AsyncIterable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from shared.serialization import dumps
+
+logger = logging.getLogger("storage")
+
+T = TypeVar("T")
+
+# boto3 is blocking, so every S3 call runs on this bounded pool instead of the
+# event loop that all concurrent calls on the worker share
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STORAGE_IO_WORKERS", "8")),
+    thread_name_prefix="storage-io",
+)
+
+
+@functools.lru_cache(maxsize=1)
+def get_s3_client():
+    """Get the process-wide S3 client with credentials from environment variables.
+
+    Credential resolution and endpoint setup happen once per process; boto3
+    clients are safe to share between threads. boto3 itself is imported here,
+    in prewarm, rather than by every module that touches storage.
+    """
+    import boto3
+
+    return boto3.client(
+        "s3",
+        region_name=os.getenv("S3_RECORDING_REGION"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    )
+
+
+def default_bucket() -> str | None:
+    return os.getenv("S3_RECORDING_BUCKET")
+
+
+async def run_io(fnc: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking storage call on the I/O executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(fnc, *args, **kwargs)
+    )
+
+
+async def put_json(data: Any, s3_key: str, *, bucket: str | None = None) -> str:
+    """Upload JSON data directly to S3 without writing to disk"""
+    bucket = bucket or default_bucket()
+    body = dumps(data)
+    await run_io(
+        get_s3_client().put_object,
+        Bucket=bucket,
+        Key=s3_key,
+        Body=body,
+        ContentType="application/json",
+    )
+    logger.info(f"Uploaded JSON to s3://{bucket}/{s3_key}")
+    return s3_key
+
+
+async def put_file(filename: str, s3_key: str, *, bucket: str | None = None) -> str:
+    """Upload a local file to S3"""
+    bucket = bucket or default_bucket()
+    await run_io(get_s3_client().upload_file, filename, bucket, s3_key)
+    logger.info(f"Uploaded {filename} to s3://{bucket}/{s3_key}")
+    return s3_key
+
+
+async def put_stream(
+    chunks: AsyncIterable[bytes] | Iterable[bytes],
+    s3_key: str,
+    *,
+    bucket: str | None = None,
+    content_type: str = "application/octet-stream",
+) -> str:
+    """Upload a stream of byte chunks as a multipart upload"""
+    from shared.s3_log import S3StreamingLog
+
+    bucket = bucket or default_bucket()
+    log = S3StreamingLog(get_s3_client(), bucket, s3_key, content_type=content_type)
+    if isinstance(chunks, AsyncIterable):
+        async for chunk in chunks:
+            await log.write(chunk)
+    else:
+        for chunk in chunks:
+            await log.write(chunk)
+    await log.aclose()
+    return s3_key
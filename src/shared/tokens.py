@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any
+
+# Rough characters-per-token ratio for English prose on the Gemini/OpenAI
+# tokenizers. Good enough to compare prompt variants, not to bill with.
+CHARS_PER_TOKEN = 4.0
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def estimate_tool_tokens(tools: list[Any]) -> int:
+    """Estimate the tokens taken by the tool schemas sent with every request"""
+    from livekit.agents import llm
+
+    total = 0
+    for tool in tools:
+        if llm.is_function_tool(tool):
+            schema = llm.utils.build_legacy_openai_schema(tool, internally_tagged=True)
+            total += estimate_tokens(json.dumps(schema))
+    return total
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import time
+import weakref
+from collections.abc import Awaitable
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+from livekit.agents import RunContext
+
+from shared.phrase_cache import say_phrase
+
+logger = logging.getLogger("tool-budget")
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+# Short enough to finish before most slow tools return; pre-rendered with warm_phrases
+FILLERS = (
+    "Let me check that for you.",
+    "One moment, please.",
+    "Just a second, I'm looking into it.",
+)
+
+TIMED_OUT = {
+    "error": "The system is taking too long to respond. Apologise and offer to follow up after the call."
+}
+
+
+@dataclass(frozen=True)
+class ToolBudget:
+    """How long a tool may keep the caller waiting.
+
+    A cached filler phrase plays once per turn when a tool is still running
+    after ``filler_after`` seconds. At ``timeout`` the tool is cancelled and
+    the LLM gets ``fallback`` instead, so the silence after a tool call is
+    bounded whatever the backend does.
+    """
+
+    filler_after: float = 1.0
+    timeout: float = 5.0
+    fallback: Any = None
+
+    def result_on_timeout(self) -> Any:
+        return TIMED_OUT if self.fallback is None else self.fallback
+
+
+# turns (speech handles) that already played a filler, shared by the tools of a turn
+_filled: weakref.WeakSet = weakref.WeakSet()
+_filler_count = 0
+
+
+def _play_filler(context: RunContext, name: str) -> None:
+    global _filler_count
+    if context.speech_handle in _filled or context.session.agent_state == "speaking":
+        return
+    _filled.add(context.speech_handle)
+    filler = FILLERS[_filler_count % len(FILLERS)]
+    _filler_count += 1
+    logger.info(f"Tool {name} is slow, playing filler")
+    try:
+        say_phrase(context.session.current_agent, filler, add_to_chat_ctx=False)
+    except Exception as e:
+        logger.warning(f"Could not play filler for tool {name}: {e}")
+
+
+def budgeted(budget: ToolBudget | None = None) -> Callable[[F], F]:
+    """Apply a ToolBudget to a function tool; put it under ``@function_tool``.
+
+    Tools the LLM calls in the same turn already run concurrently, and each
+    keeps its own budget, so a turn waits at most for its slowest tool's
+    ``timeout``.
+    """
+    budget = budget or ToolBudget()
+
+    def decorator(fnc: F) -> F:
+        @functools.wraps(fnc)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            context = next(
+                (a for a in (*args, *kwargs.values()) if isinstance(a, RunContext)),
+                None,
+            )
+            filler = None
+            if context is not None:
+                loop = asyncio.get_running_loop()
+                filler = loop.call_later(
+                    budget.filler_after, _play_filler, context, fnc.__name__
+                )
+            started = time.perf_counter()
+            try:
+                return await asyncio.wait_for(fnc(*args, **kwargs), budget.timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Tool {fnc.__name__} timed out after {budget.timeout}s, returning its fallback"
+                )
+                return budget.result_on_timeout()
+            finally:
+                if filler is not None:
+                    filler.cancel()
+                logger.info(
+                    f"Tool {fnc.__name__} took {time.perf_counter() - started:.2f}s"
+                )
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
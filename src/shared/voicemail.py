@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from collections.abc import AsyncIterable, Awaitable, Callable
+from dataclasses import dataclass
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import AgentSession, UserInputTranscribedEvent
+from livekit.agents import vad as agents_vad
+
+logger = logging.getLogger("voicemail")
+
+SAMPLE_RATE = 16000
+
+# Phrases only an answering machine or a carrier announcement says, in English
+# and Hindi. Anything a person might say on picking up ("he is not available",
+# "busy on another call") is left out: a match hangs up the call.
+KEYWORDS = re.compile(
+    r"(after|at) the (beep|tone)"
+    r"|(please )?record your message"
+    r"|the number you (have )?dial(l)?ed"
+    r"|the (person|subscriber) you are calling"
+    r"|beep ke baad"
+    r"|jis (number|nambar) (par|pe) (aap )?call"
+    r"|बीप के बाद|जिस नंबर पर",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class VoicemailPolicy:
+    """When the first seconds of an answered call count as a machine.
+
+    Only the first ``deadline`` seconds after the callee answers are
+    analysed; a call with no verdict by then is treated as a human. A
+    ``max_greeting`` seconds run of speech without a pause, a steady tone of
+    ``min_beep`` seconds, or a voicemail phrase in the transcript each mark
+    the call as a machine.
+    """
+
+    deadline: float = float(os.getenv("VOICEMAIL_DEADLINE", "8"))
+    max_greeting: float = 4.5
+    min_beep: float = 0.16
+    beep_band: tuple[float, float] = (300.0, 2500.0)
+    beep_purity: float = 0.6
+
+
+class ToneDetector:
+    """Finds a steady single-frequency tone (the voicemail beep) in 16 kHz mono audio."""
+
+    frame_samples = 320  # 20 ms
+
+    def __init__(
+        self, policy: VoicemailPolicy | None = None, sample_rate: int = SAMPLE_RATE
+    ) -> None:
+        policy = policy or VoicemailPolicy()
+        self._policy = policy
+        self._sample_rate = sample_rate
+        self._window = np.hanning(self.frame_samples)
+        self._freqs = np.fft.rfftfreq(self.frame_samples, 1 / sample_rate)
+        self._band = (self._freqs >= policy.beep_band[0]) & (
+            self._freqs <= policy.beep_band[1]
+        )
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._tone_hz: float | None = None
+        self._tone_frames = 0
+
+    def push(self, samples: np.ndarray) -> bool:
+        """Add int16 samples; True once a tone has lasted ``min_beep`` seconds."""
+        self._pending = np.concatenate(
+            (self._pending, samples.astype(np.float32) / 32768.0)
+        )
+        needed = int(
+            np.ceil(self._policy.min_beep * self._sample_rate / self.frame_samples)
+        )
+        while len(self._pending) >= self.frame_samples:
+            frame, self._pending = (
+                self._pending[: self.frame_samples],
+                self._pending[self.frame_samples :],
+            )
+            peak_hz = self._tone(frame)
+            if peak_hz is not None and (
+                self._tone_hz is None
+                or abs(peak_hz - self._tone_hz) <= 2 * self._freqs[1]
+            ):
+                self._tone_hz = self._tone_hz or peak_hz
+                self._tone_frames += 1
+            else:
+                self._tone_hz, self._tone_frames = peak_hz, int(peak_hz is not None)
+            if self._tone_frames >= needed:
+                return True
+        return False
+
+    def _tone(self, frame: np.ndarray) -> float | None:
+        # quieter than about -40 dBFS is line noise, not a beep
+        if np.sqrt(np.mean(frame**2)) < 0.01:
+            return None
+        power = np.abs(np.fft.rfft(frame * self._window)) ** 2
+        peak = int(np.argmax(np.where(self._band, power, 0.0)))
+        if not self._band[peak]:
+            return None
+        # the Hann window spreads a pure tone over the peak bin and its neighbours
+        if (
+            power[max(peak - 2, 0) : peak + 3].sum()
+            < self._policy.beep_purity * power.sum()
+        ):
+            return None
+        return float(self._freqs[peak])
+
+
+class SpeechLength:
+    """Tracks VAD events for a run of speech longer than a live greeting."""
+
+    def __init__(self, policy: VoicemailPolicy | None = None) -> None:
+        self._policy = policy or VoicemailPolicy()
+        self.longest = 0.0
+
+    def push(self, event: agents_vad.VADEvent) -> bool:
+        if event.type == agents_vad.VADEventType.END_OF_SPEECH or event.speaking:
+            self.longest = max(self.longest, event.speech_duration)
+        return self.longest >= self._policy.max_greeting
+
+
+def spot_keywords(transcript: str) -> str | None:
+    match = KEYWORDS.search(transcript)
+    return match.group(0) if match else None
+
+
+class VoicemailDetector:
+    """Decides from the callee's first seconds of audio whether a machine answered.
+
+    Runs next to the session rather than inside it: the callee's audio goes
+    through the tone detector and the prewarmed VAD, and the session's
+    interim transcripts through the keyword spotter, so the verdict does not
+    wait for an LLM turn. ``on_detected`` is awaited with the reason at most
+    once; after ``policy.deadline`` seconds the detector stops and costs
+    nothing for the rest of the call.
+    """
+
+    def __init__(
+        self,
+        session: AgentSession | None,
+        vad: agents_vad.VAD | None,
+        on_detected: Callable[[str], Awaitable[None]],
+        policy: VoicemailPolicy | None = None,
+    ) -> None:
+        policy = policy or VoicemailPolicy()
+        self._session = session
+        self._vad = vad
+        self._on_detected = on_detected
+        self._policy = policy
+        self._tone = ToneDetector(policy)
+        self._speech = SpeechLength(policy)
+        self._verdict: asyncio.Future[str] | None = None
+        self._task: asyncio.Task | None = None
+
+        self.reason: str | None = None
+
+    def start(self, participant: rtc.RemoteParticipant) -> None:
+        stream = rtc.AudioStream.from_participant(
+            participant=participant,
+            track_source=rtc.TrackSource.SOURCE_MICROPHONE,
+            sample_rate=SAMPLE_RATE,
+            num_channels=1,
+        )
+        self.start_with(stream)
+
+    def start_with(
+        self, stream: AsyncIterable[rtc.AudioFrameEvent | rtc.AudioFrame]
+    ) -> None:
+        self._task = asyncio.create_task(self._run(stream))
+
+    async def wait(self) -> str | None:
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+        return self.reason
+
+    async def aclose(self) -> None:
+        # once a verdict is in, let on_detected finish hanging up
+        if self._task is not None and self.reason is None:
+            self._task.cancel()
+        await self.wait()
+
+    def _on_transcript(self, ev: UserInputTranscribedEvent) -> None:
+        if (phrase := spot_keywords(ev.transcript)) is not None:
+            self._decide(f"voicemail phrase '{phrase}'")
+
+    def _decide(self, reason: str) -> None:
+        if self._verdict is not None and not self._verdict.done():
+            self._verdict.set_result(reason)
+
+    async def _run(
+        self, stream: AsyncIterable[rtc.AudioFrameEvent | rtc.AudioFrame]
+    ) -> None:
+        self._verdict = asyncio.get_running_loop().create_future()
+        vad_stream = self._vad.stream() if self._vad is not None else None
+        if self._session is not None:
+            self._session.on("user_input_transcribed", self._on_transcript)
+
+        async def listen() -> None:
+            async for ev in stream:
+                frame = ev.frame if isinstance(ev, rtc.AudioFrameEvent) else ev
+                if vad_stream is not None:
+                    vad_stream.push_frame(frame)
+                if self._tone.push(np.frombuffer(frame.data, dtype=np.int16)):
+                    self._decide("beep")
+
+        async def watch_speech() -> None:
+            async for ev in vad_stream:
+                if self._speech.push(ev):
+                    self._decide(f"{self._speech.longest:.1f}s of unbroken speech")
+
+        tasks = [asyncio.create_task(listen())]
+        if vad_stream is not None:
+            tasks.append(asyncio.create_task(watch_speech()))
+        try:
+            self.reason = await asyncio.wait_for(
+                asyncio.shield(self._verdict), self._policy.deadline
+            )
+        except asyncio.TimeoutError:
+            logger.info(
+                f"No answering machine detected in the first {self._policy.deadline:.0f}s"
+            )
+            return
+        finally:
+            if self._session is not None:
+                self._session.off("user_input_transcribed", self._on_transcript)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if vad_stream is not None:
+                await vad_stream.aclose()
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+
+        logger.info(f"Answering machine detected: {self.reason}")
+        await self._on_detected(self.reason)
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any
+from urllib.parse import urlsplit
+
+import aiohttp
+
+logger = logging.getLogger("webhooks")
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class WebhookError(Exception):
+    def __init__(
+        self, message: str, *, status: int | None = None, retryable: bool = True
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class _Delivery:
+    __slots__ = ("attempts", "data", "enqueued_at", "future", "spooled", "url")
+
+    def __init__(
+        self,
+        url: str,
+        data: dict[str, Any],
+        attempts: int = 0,
+        future: asyncio.Future | None = None,
+    ) -> None:
+        self.url = url
+        self.data = data
+        self.attempts = attempts
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        # set once written to the spool, so a late failure is not retried or spooled again
+        self.spooled = False
+
+
+class WebhookDispatcher:
+    """Process-level webhook delivery with a keep-alive connection pool.
+
+    Deliveries go through a bounded queue drained by a few worker tasks. Each
+    endpoint (scheme + host) has its own concurrency limit, failed deliveries
+    are retried with exponential backoff and jitter, and anything still queued
+    when the process drains is written to an on-disk spool that the next
+    dispatcher replays on start.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue: int = 1000,
+        workers: int = 4,
+        per_endpoint_limit: int = 4,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        timeout: float = 10.0,
+        spool_dir: str | None = None,
+    ) -> None:
+        self._queue: asyncio.Queue[_Delivery] = asyncio.Queue(maxsize=max_queue)
+        self._num_workers = workers
+        self._per_endpoint_limit = per_endpoint_limit
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._spool_dir = spool_dir or os.getenv("WEBHOOK_SPOOL_DIR", "webhook_spool")
+
+        self._session: aiohttp.ClientSession | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retries: dict[asyncio.Task, _Delivery] = {}
+        self._endpoint_limits: dict[str, asyncio.Semaphore] = {}
+        self._in_flight: set[_Delivery] = set()
+        # spool file I/O runs in a thread; writes are serialized so lines never interleave
+        self._spool_lock = asyncio.Lock()
+        self._spool_writes: set[asyncio.Task] = set()
+        self._replay_task: asyncio.Task | None = None
+        self._latencies: deque[float] = deque(maxlen=512)
+
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.spooled = 0
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60),
+            timeout=self._timeout,
+        )
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self._num_workers)
+        ]
+        self._replay_task = asyncio.create_task(self._replay_spool())
+
+    def post(self, data: dict[str, Any], url: str) -> None:
+        """Queue a delivery without waiting for it (fire-and-forget events)"""
+        self._put(_Delivery(url, data))
+
+    async def send(self, data: dict[str, Any], url: str) -> None:
+        """Queue a delivery and wait until it succeeds or runs out of retries"""
+        future = asyncio.get_running_loop().create_future()
+        self._put(_Delivery(url, data, future=future))
+        await future
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Wait for queued deliveries, spooling whatever is left at the deadline.
+
+        Deliveries still in flight at the deadline are spooled too. If one
+        then succeeds, the endpoint sees it twice, which is better than losing
+        it when the process exits mid-request.
+        """
+        deadline = time.monotonic() + timeout
+        if self._replay_task is not None:
+            # the replay has already claimed its files, so it must finish queueing
+            await self._replay_task
+        while (
+            self._queue.qsize() or self._in_flight or self._retries
+        ) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        leftovers = [delivery for delivery in self._in_flight if not delivery.spooled]
+        for task, delivery in list(self._retries.items()):
+            task.cancel()
+            leftovers.append(delivery)
+        self._retries.clear()
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+        if leftovers:
+            self._spool(leftovers)
+        await asyncio.gather(*self._spool_writes)
+        logger.info(f"Webhook dispatcher drained: {self.stats()}")
+
+    async def aclose(self, timeout: float = 10.0) -> None:
+        await self.drain(timeout)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def pct(p: float) -> float | None:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "in_flight": len(self._in_flight),
+            "pending_retries": len(self._retries),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "spooled": self.spooled,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+    def _put(self, delivery: _Delivery) -> None:
+        try:
+            self._queue.put_nowait(delivery)
+        except asyncio.QueueFull:
+            logger.warning(f"Webhook queue full, spooling delivery to {delivery.url}")
+            self._spool([delivery])
+
+    async def _worker(self) -> None:
+        while True:
+            delivery = await self._queue.get()
+            self._in_flight.add(delivery)
+            try:
+                await self._attempt(delivery)
+            finally:
+                self._in_flight.discard(delivery)
+                self._queue.task_done()
+
+    async def _attempt(self, delivery: _Delivery) -> None:
+        delivery.attempts += 1
+        try:
+            async with self._endpoint_limit(delivery.url):
+                await self._post(delivery)
+        except Exception as e:
+            if delivery.spooled:
+                logger.warning(
+                    f"Webhook to {delivery.url} failed after it was spooled ({e}), leaving it to the replay"
+                )
+                return
+            retryable = getattr(e, "retryable", True)
+            if retryable and delivery.attempts < self._max_attempts:
+                self.retried += 1
+                delay = min(
+                    self._max_delay, self._base_delay * 2 ** (delivery.attempts - 1)
+                )
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(
+                    f"Webhook to {delivery.url} failed ({e}), retry {delivery.attempts} in {delay:.1f}s"
+                )
+                task = asyncio.create_task(self._retry_later(delivery, delay))
+                self._retries[task] = delivery
+                task.add_done_callback(lambda t: self._retries.pop(t, None))
+                return
+
+            self.failed += 1
+            logger.error(
+                f"Giving up on webhook to {delivery.url} after {delivery.attempts} attempts: {e}"
+            )
+            if delivery.future is not None and not delivery.future.done():
+                delivery.future.set_exception(e)
+            elif retryable:
+                self._spool([delivery])
+            return
+
+        self.delivered += 1
+        self._latencies.append(time.monotonic() - delivery.enqueued_at)
+        if delivery.future is not None and not delivery.future.done():
+            delivery.future.set_result(None)
+
+    async def _post(self, delivery: _Delivery) -> None:
+        assert self._session is not None
+        logger.info(f"Sending webhook to {delivery.url}")
+        async with self._session.post(delivery.url, json=delivery.data) as response:
+            if response.status == 200 or response.status == 201:
+                logger.info(
+                    f"Webhook sent successfully to {delivery.url}, Response: {response.status}"
+                )
+                return
+            error_message = await response.text()
+            raise WebhookError(
+                f"Webhook failed with status {response.status}: {error_message}",
+                status=response.status,
+                retryable=response.status in RETRYABLE_STATUSES,
+            )
+
+    async def _retry_later(self, delivery: _Delivery, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._put(delivery)
+
+    def _endpoint_limit(self, url: str) -> asyncio.Semaphore:
+        parts = urlsplit(url)
+        endpoint = f"{parts.scheme}://{parts.netloc}"
+        if endpoint not in self._endpoint_limits:
+            self._endpoint_limits[endpoint] = asyncio.Semaphore(
+                self._per_endpoint_limit
+            )
+        return self._endpoint_limits[endpoint]
+
+    def _spool(self, deliveries: list[_Delivery]) -> None:
+        """Fail the deliveries over to the spool; the file is written off the event loop"""
+        lines = []
+        for delivery in deliveries:
+            delivery.spooled = True
+            lines.append(
+                json.dumps(
+                    {
+                        "url": delivery.url,
+                        "data": delivery.data,
+                        "attempts": delivery.attempts,
+                    }
+                )
+                + "\n"
+            )
+            if delivery.future is not None and not delivery.future.done():
+                delivery.future.set_exception(
+                    WebhookError(
+                        f"Webhook to {delivery.url} spooled for later delivery"
+                    )
+                )
+        self.spooled += len(deliveries)
+        task = asyncio.create_task(self._write_spool(lines))
+        self._spool_writes.add(task)
+        task.add_done_callback(self._spool_writes.discard)
+
+    async def _write_spool(self, lines: list[str]) -> None:
+        path = os.path.join(self._spool_dir, f"webhooks_{os.getpid()}.jsonl")
+        async with self._spool_lock:
+            try:
+                await asyncio.to_thread(_append_lines, path, lines)
+            except OSError as e:
+                logger.error(f"Failed to spool {len(lines)} undelivered webhooks: {e}")
+                return
+        logger.warning(f"Spooled {len(lines)} undelivered webhooks to {path}")
+
+    async def _replay_spool(self) -> None:
+        try:
+            spooled = await asyncio.to_thread(_claim_spool, self._spool_dir)
+        except OSError as e:
+            logger.error(f"Failed to replay spooled webhooks: {e}")
+            return
+        for name, records in spooled:
+            for record in records:
+                self._put(_Delivery(record["url"], record["data"]))
+            logger.info(f"Replaying {len(records)} spooled webhooks from {name}")
+
+
+def _append_lines(path: str, lines: list[str]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        f.writelines(lines)
+
+
+def _claim_spool(spool_dir: str) -> list[tuple[str, list[dict[str, Any]]]]:
+    """Read and remove the spool files no other process has claimed"""
+    if not os.path.isdir(spool_dir):
+        return []
+    spooled = []
+    for name in sorted(os.listdir(spool_dir)):
+        if not name.endswith(".jsonl"):
+            continue
+        path = os.path.join(spool_dir, name)
+        claimed = f"{path}.{os.getpid()}.replay"
+        try:
+            # rename first so two processes never replay the same file
+            os.rename(path, claimed)
+        except OSError:
+            continue
+        with open(claimed) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        os.remove(claimed)
+        spooled.append((name, records))
+    return spooled
+
+
+_dispatcher: WebhookDispatcher | None = None
+_dispatcher_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_dispatcher() -> WebhookDispatcher:
+    """Return the dispatcher for the running event loop, starting it if needed"""
+    global _dispatcher, _dispatcher_loop
+    loop = asyncio.get_running_loop()
+    if _dispatcher is None or _dispatcher_loop is not loop:
+        _dispatcher = WebhookDispatcher()
+        _dispatcher_loop = loop
+        _dispatcher.start()
+    return _dispatcher
+
+
+def post_webhook(data: dict[str, Any], url: str) -> None:
+    get_dispatcher().post(data, url)
+
+
+async def send_webhook(data: dict[str, Any], url: str) -> None:
+    await get_dispatcher().send(data, url)
+
+
+async def drain_webhooks(timeout: float = 10.0) -> None:
+    if _dispatcher is not None:
+        await _dispatcher.drain(timeout)
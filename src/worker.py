@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+from livekit.agents import JobContext, JobProcess, WorkerOptions, cli
+from livekit.plugins import silero
+
+from personas import (
+    default_persona,
+    load_personas,
+    resolve_persona,
+    served_pipelines,
+    session_profile,
+)
+from shared.capacity import CapacityGuard, LoopLagReporting
+from shared.latency import configure_multiprocess_metrics, serve_metrics
+from shared.plugin_pool import create_plugin_pool
+from shared.startup import log_prewarm, prewarm_profile
+from shared.storage import get_s3_client
+
+logger = logging.getLogger("worker")
+load_dotenv(".env.local")
+
+# Only the personas this worker serves are imported and warmed (see served_personas())
+SERVED = load_personas()
+
+
+def prewarm(proc: JobProcess):
+    """Warm one model set that every persona served on this process shares.
+
+    Personas with identical plugin configurations (e.g. the same LLM) resolve
+    to the same pool key, so they share warmed instances as well.
+    """
+    profile = prewarm_profile(proc)
+    with profile.step("vad"):
+        proc.userdata["vad"] = silero.VAD.load()
+    with profile.step("plugin_pool"):
+        proc.userdata["plugin_pool"] = create_plugin_pool(*served_pipelines())
+    for persona in SERVED.values():
+        if persona.prewarm is not None:
+            with profile.step(persona.name):
+                persona.prewarm(proc)
+    with profile.step("s3_client"):
+        get_s3_client()
+    log_prewarm(proc)
+
+
+async def entrypoint(ctx: JobContext):
+    """Hand the job to the persona named in its metadata or by its agent_name"""
+    persona = resolve_persona(ctx.job.metadata, ctx.job.agent_name)
+    logger.info(f"dispatching job {ctx.job.id} to persona {persona.name}")
+    await persona.entrypoint(ctx)
+
+
+if __name__ == "__main__":
+    # jobs dispatched without a persona in their metadata must still have somewhere to go
+    default = default_persona()
+    if sys.argv[1:2] != ["download-files"] and (
+        default is None or default.name not in SERVED
+    ):
+        sys.exit(
+            "No default persona among those served: set DEFAULT_PERSONA, PERSONAS to "
+            "a single persona, or AGENT_NAME to a persona's legacy agent name"
+        )
+    logger.info(f"serving personas {sorted(SERVED)}")
+
+    # Per-turn latency histograms from every job process, merged on one port
+    if os.getenv("LATENCY_METRICS_PORT"):
+        configure_multiprocess_metrics()
+        serve_metrics(int(os.environ["LATENCY_METRICS_PORT"]))
+
+    # Report load from sessions, CPU and job event-loop lag; `kill -USR1` toggles drain mode
+    capacity = CapacityGuard(session_profile)
+    capacity.drain_on_signal()
+
+    cli.run_app(
+        WorkerOptions(
+            entrypoint_fnc=LoopLagReporting(entrypoint),
+            prewarm_fnc=prewarm,
+            agent_name=os.getenv("AGENT_NAME", "revspot-voice-agent"),
+            **capacity.worker_options(),
+        )
+    )
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+from aiohttp import web
+
+from dialer import outcome_app
+from shared.campaign import CampaignCall, CampaignDialer, Lead, LeadStore, RedialPolicy
+from shared.webhooks import get_dispatcher
+
+FAST_REDIAL = RedialPolicy({"busy": (0.05, 0.05), "no_answer": (0.05,)})
+
+
+class FakeSIP:
+    """Stands in for the agent jobs and the SIP trunks they dial through.
+
+    Each dispatch runs a fake job that "rings" for ``call_seconds``, settles
+    on the next scripted status for the number (answered by default) and
+    reports back to the dialer through ``CampaignCall``, as the real jobs do.
+    """
+
+    def __init__(
+        self, script: dict[str, list[str]] | None = None, call_seconds: float = 0.02
+    ) -> None:
+        self.script = {
+            number: list(statuses) for number, statuses in (script or {}).items()
+        }
+        self.call_seconds = call_seconds
+        self.active: Counter[str] = Counter()
+        self.peak: Counter[str] = Counter()
+        self.dials: list[tuple[str, float]] = []
+        self._jobs: set[asyncio.Task] = set()
+
+    async def dispatch(self, lead: Lead, room_name: str, metadata: dict) -> None:
+        self.dials.append((lead.phone_number, time.monotonic()))
+        task = asyncio.create_task(self._job(metadata))
+        self._jobs.add(task)
+        task.add_done_callback(self._jobs.discard)
+
+    async def _job(self, metadata: dict) -> None:
+        trunk = metadata["trunk_id"]
+        self.active[trunk] += 1
+        self.peak[trunk] = max(self.peak[trunk], self.active[trunk])
+        call = CampaignCall(metadata)
+        try:
+            await asyncio.sleep(self.call_seconds)
+            statuses = self.script.get(metadata["phone_number"])
+            if statuses:
+                call.failed(statuses.pop(0))
+            else:
+                call.answered()
+        finally:
+            self.active[trunk] -= 1
+            await call.aclose()
+
+
+@pytest.fixture
+async def outcome_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("WEBHOOK_SPOOL_DIR", str(tmp_path / "spool"))
+    runners = []
+
+    async def serve(dialer: CampaignDialer) -> str:
+        runner = web.AppRunner(outcome_app(dialer))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        runners.append(runner)
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/campaign/outcome"
+
+    yield serve
+    await get_dispatcher().aclose()
+    for runner in runners:
+        await runner.cleanup()
+
+
+def _leads(n: int, trunk: str = "ST_a", start: int = 0) -> list[Lead]:
+    return [
+        Lead(
+            id=f"lead-{i}",
+            campaign="test",
+            phone_number=f"+9100000{i:05d}",
+            trunk_id=trunk,
+        )
+        for i in range(start, start + n)
+    ]
+
+
+async def _run(
+    store: LeadStore, sip: FakeSIP, outcome_server, **kwargs
+) -> CampaignDialer:
+    dialer = CampaignDialer(
+        store, sip, callback_url="", policy=FAST_REDIAL, poll_interval=0.05, **kwargs
+    )
+    dialer._callback_url = await outcome_server(dialer)
+    await asyncio.wait_for(dialer.run(until_idle=True), 10)
+    return dialer
+
+
+async def test_trunk_capacity_caps_concurrent_calls(outcome_server) -> None:
+    store = LeadStore()
+    store.add(_leads(12, "ST_small") + _leads(12, "ST_large", start=100))
+    sip = FakeSIP(call_seconds=0.05)
+
+    dialer = await _run(
+        store,
+        sip,
+        outcome_server,
+        calls_per_second=1000,
+        burst=100,
+        trunk_capacity={"ST_small": 2, "ST_large": 5},
+    )
+
+    assert sip.peak == {"ST_small": 2, "ST_large": 5}
+    assert store.counts() == {"done": 24}
+    assert dialer.outcomes == {"completed": 24}
+
+
+async def test_busy_and_unanswered_numbers_are_redialed_with_backoff(
+    outcome_server,
+) -> None:
+    store = LeadStore()
+    store.add(_leads(3))
+    sip = FakeSIP(
+        {
+            "+910000000000": ["busy", "busy"],  # answers on the third try
+            "+910000000001": ["no_answer", "no_answer"],  # gives up after one redial
+            "+910000000002": ["other"],  # not retryable
+        }
+    )
+
+    dialer = await _run(store, sip, outcome_server, calls_per_second=1000, burst=10)
+
+    assert store.state("lead-0") == ("done", "completed")
+    assert store.state("lead-1") == ("failed", "no_answer")
+    assert store.state("lead-2") == ("failed", "other")
+    assert store.get("lead-0").attempts == 3
+    assert store.get("lead-1").attempts == 2
+    assert dialer.outcomes == {"busy": 2, "no_answer": 2, "other": 1, "completed": 1}
+
+    redials = [t for number, t in sip.dials if number == "+910000000000"]
+    assert all(b - a >= 0.05 for a, b in zip(redials, redials[1:]))
+
+
+async def test_dials_are_paced_to_calls_per_second(outcome_server) -> None:
+    store = LeadStore()
+    store.add(_leads(6))
+    sip = FakeSIP()
+
+    await _run(store, sip, outcome_server, calls_per_second=20)
+
+    started = [t for _, t in sip.dials]
+    assert started[-1] - started[0] >= 5 / 20 * 0.9
+
+
+async def test_queue_survives_restart(tmp_path, outcome_server) -> None:
+    path = str(tmp_path / "campaign.sqlite3")
+    store = LeadStore(path)
+    store.add(_leads(2))
+    store.mark_dialing("lead-0")  # the previous dialer died mid-call
+    store.close()
+
+    store = LeadStore(path)
+    assert store.add(_leads(2)) == 0  # re-importing the CSV does not duplicate leads
+    await _run(store, FakeSIP(), outcome_server, calls_per_second=1000, burst=10)
+
+    assert store.counts() == {"done": 2}
+    assert store.get("lead-0").attempts == 2
+
+
+async def test_calls_that_never_report_back_are_released() -> None:
+    class SilentSIP(FakeSIP):
+        async def dispatch(self, lead, room_name, metadata) -> None:
+            self.dials.append((lead.phone_number, time.monotonic()))
+
+    store = LeadStore()
+    store.add(_leads(1))
+    sip = SilentSIP()
+
+    dialer = CampaignDialer(
+        store,
+        sip,
+        callback_url="",
+        policy=RedialPolicy({"lost": ()}),
+        call_timeout=0.05,
+        poll_interval=0.02,
+    )
+    await asyncio.wait_for(dialer.run(until_idle=True), 5)
+
+    assert store.state("lead-0") == ("failed", "lost")
+    assert dialer.in_flight == 0
+
+
+async def test_late_outcomes_from_an_earlier_attempt_are_ignored() -> None:
+    class NoJobs:
+        async def dispatch(self, lead, room_name, metadata) -> None:
+            pass
+
+    store = LeadStore()
+    store.add(_leads(1))
+    dialer = CampaignDialer(
+        store, NoJobs(), callback_url="", policy=RedialPolicy({"lost": (0,)})
+    )
+
+    await dialer._dial(store.get("lead-0"))
+    dialer.report_outcome("lead-0", "lost", attempt=1)
+    await dialer._dial(store.get("lead-0"))
+    assert store.get("lead-0").attempts == 2
+
+    # the first call reports back after all, while the redial is ringing
+    dialer.report_outcome("lead-0", "completed", attempt=1)
+    assert store.state("lead-0") == ("dialing", "lost") and dialer.in_flight == 1
+
+    dialer.report_outcome("lead-0", "completed", attempt=2)
+    assert store.state("lead-0") == ("done", "completed") and dialer.in_flight == 0
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from shared.capacity import (
+    CapacityGuard,
+    LagReporter,
+    SessionProfile,
+    parse_caps,
+    read_lag_reports,
+)
+
+PROFILES = {
+    "livspace": SessionProfile("livspace", cost=1.0, max_sessions=2),
+    "meragi": SessionProfile("meragi", cost=0.5),
+}
+
+
+def _classify(metadata: str | None) -> SessionProfile:
+    if metadata not in PROFILES:
+        raise ValueError(f"Unknown persona {metadata!r}")
+    return PROFILES[metadata]
+
+
+def _worker(*jobs: tuple[str, str]) -> SimpleNamespace:
+    return SimpleNamespace(
+        active_jobs=[
+            SimpleNamespace(job=SimpleNamespace(id=i, metadata=m)) for i, m in jobs
+        ]
+    )
+
+
+def _guard(tmp_path, cpu: float = 0.1, **kwargs) -> CapacityGuard:
+    return CapacityGuard(
+        _classify,
+        budget=4,
+        lag_slo=0.1,
+        threshold=0.75,
+        reports_dir=str(tmp_path),
+        cpu=lambda: cpu,
+        **kwargs,
+    )
+
+
+def _report(tmp_path, name: str, lag: float, age: float = 0.0) -> None:
+    (tmp_path / f"{name}.json").write_text(
+        json.dumps({"lag_p95": lag, "at": time.time() - age})
+    )
+
+
+def test_load_is_the_highest_pressure(tmp_path) -> None:
+    guard = _guard(tmp_path, cpu=0.2)
+    assert guard.load(_worker(("a", "livspace"), ("b", "meragi"))) == 1.5 / 4
+
+    _report(tmp_path, "101", 0.06)
+    _report(
+        tmp_path, "102", 0.3, age=30
+    )  # stale reports from finished jobs are ignored
+    assert guard.load(_worker()) == 0.6
+
+    assert _guard(tmp_path, cpu=1.3).load(_worker()) == 1.0
+
+
+def test_admission_enforces_caps_and_session_budget(tmp_path) -> None:
+    guard = _guard(tmp_path)
+    guard.load(_worker())
+    assert guard.admit("a", "livspace") is None
+    assert guard.admit("b", "livspace") is None
+    # accepted jobs count before they show up in active_jobs
+    assert "cap of 2" in guard.admit("c", "livspace")
+
+    guard.load(_worker(("a", "livspace"), ("b", "livspace")))
+    assert guard.admit("d", "meragi") is None
+    assert guard.admit("e", "meragi") is None
+    assert "budget" in guard.admit("f", "meragi")
+
+
+def test_unknown_personas_fall_back_to_a_default_cost(tmp_path) -> None:
+    guard = _guard(tmp_path)
+    assert guard.admit("a", "not-a-persona") is None
+    assert guard.load(_worker(("a", "not-a-persona"))) == 1.0 / 4
+
+
+def test_saturated_or_draining_workers_reject_jobs(tmp_path) -> None:
+    guard = _guard(tmp_path, cpu=0.9)
+    guard.load(_worker())
+    assert guard.admit("a", "meragi") == "worker is saturated"
+
+    guard = _guard(tmp_path)
+    guard.drain()
+    assert guard.load(_worker()) == 1.0
+    assert guard.admit("a", "meragi") == "worker is draining"
+    guard.drain(False)
+    assert guard.admit("a", "meragi") is None
+
+
+def test_parse_caps() -> None:
+    assert parse_caps("") == {}
+    assert parse_caps("livspace_inbound=8, meragi_inbound=20") == {
+        "livspace_inbound": 8,
+        "meragi_inbound": 20,
+    }
+
+
+async def test_lag_reporter_publishes_blocked_loop_time(tmp_path) -> None:
+    reporter = LagReporter(str(tmp_path), interval=0.02, publish_every=0.1)
+    reporter.start()
+    for _ in range(4):
+        time.sleep(0.1)  # block the loop like a CPU-bound callback would
+        await asyncio.sleep(0.03)
+
+    assert read_lag_reports(str(tmp_path)) >= 0.05
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+    await reporter.aclose()
+    assert os.listdir(tmp_path) == []
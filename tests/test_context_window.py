@@ -0,0 +1,104 @@
+import asyncio
+
+from livekit.agents import llm
+
+from fakes import FakeLatency, FakeLLM, FakeResponse
+from shared.context_window import ContextPolicy, ContextWindow
+
+SUMMARY = FakeResponse(
+    "Caller Rahul, project BLR12345, asked about the site visit date."
+)
+
+
+def _call(turns: int, tool_output: str = "") -> llm.ChatContext:
+    ctx = llm.ChatContext.empty()
+    ctx.add_message(role="system", content="You are a Livspace agent.")
+    ctx.add_message(role="assistant", content="Hi, this is Livspace. How can I help?")
+    for i in range(turns):
+        ctx.add_message(role="user", content=f"question {i} about my project")
+        if tool_output:
+            ctx.insert(
+                llm.FunctionCall(
+                    call_id=f"c{i}", name="get_project_details", arguments="{}"
+                )
+            )
+            ctx.insert(
+                llm.FunctionCallOutput(
+                    call_id=f"c{i}",
+                    name="get_project_details",
+                    output=tool_output,
+                    is_error=False,
+                )
+            )
+        ctx.add_message(role="assistant", content=f"answer {i}")
+    return ctx
+
+
+def _texts(ctx: llm.ChatContext) -> list[str]:
+    return [item.text_content for item in ctx.items if item.type == "message"]
+
+
+async def test_old_turns_are_folded_into_a_summary_between_turns() -> None:
+    window = ContextWindow(
+        ContextPolicy(keep_turns=2, history_tokens=10_000),
+        FakeLLM({"": SUMMARY}, latency=FakeLatency.instant()),
+    )
+
+    call = _call(5)
+    # before the summary exists, older turns are still sent
+    first = window.apply(call)
+    assert "question 0 about my project" in _texts(first)
+
+    await window._task
+    second = window.apply(call)
+    texts = _texts(second)
+    assert texts[0] == "You are a Livspace agent."
+    assert "BLR12345" in texts[1]
+    assert "question 0 about my project" not in texts
+    assert texts[2:] == [
+        "question 3 about my project",
+        "answer 3",
+        "question 4 about my project",
+        "answer 4",
+    ]
+    assert window.summaries == 1
+
+
+async def test_history_stays_within_the_token_budget() -> None:
+    window = ContextWindow(ContextPolicy(keep_turns=50, history_tokens=60))
+
+    ctx = window.apply(_call(40))
+
+    assert window.last_history_tokens <= 60
+    assert _texts(ctx)[-1] == "answer 39"
+    # whole turns are dropped, so no tool output is left without its call
+    assert ctx.items[1].type == "message"
+
+
+async def test_earlier_tool_outputs_are_compacted() -> None:
+    payload = "x" * 4000
+    window = ContextWindow(
+        ContextPolicy(keep_turns=3, tool_output_tokens=50, history_tokens=10_000)
+    )
+
+    ctx = window.apply(_call(3, tool_output=payload))
+
+    outputs = [item.output for item in ctx.items if item.type == "function_call_output"]
+    assert [len(o) < 300 for o in outputs] == [True, True, False]
+    assert outputs[-1] == payload
+
+
+async def test_failed_summaries_keep_turns_verbatim() -> None:
+    class BrokenLLM(FakeLLM):
+        def chat(self, **kwargs):
+            raise ConnectionError("LLM unavailable")
+
+    window = ContextWindow(
+        ContextPolicy(keep_turns=1, history_tokens=10_000), BrokenLLM()
+    )
+    call = _call(3)
+    window.apply(call)
+    await asyncio.gather(window._task, return_exceptions=True)
+
+    assert "question 0 about my project" in _texts(window.apply(call))
+    assert window.summary == ""
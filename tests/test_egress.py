@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+
+from livekit import api
+
+from shared.egress import LazyEgress, egress_stats
+
+
+class FakeEgressService:
+    def __init__(self) -> None:
+        self.requests: list[api.RoomCompositeEgressRequest] = []
+
+    async def start_room_composite_egress(self, request):
+        await asyncio.sleep(0.01)
+        self.requests.append(request)
+        return SimpleNamespace(egress_id="EG_test")
+
+
+def _lazy_egress() -> tuple[LazyEgress, FakeEgressService]:
+    service = FakeEgressService()
+    request = api.RoomCompositeEgressRequest(room_name="call-1", audio_only=True)
+    return LazyEgress(SimpleNamespace(egress=service), request), service
+
+
+async def test_failed_dial_never_starts_egress() -> None:
+    egress, service = _lazy_egress()
+    skipped = egress_stats()["skipped"]
+    await asyncio.sleep(0.02)
+
+    egress.cancel("busy")
+    egress.start()
+    await egress.aclose()
+
+    assert service.requests == []
+    assert not egress.started
+    assert egress.seconds_saved >= 0.02
+    assert egress_stats()["skipped"] == skipped + 1
+
+
+async def test_answered_call_starts_egress_in_background() -> None:
+    egress, service = _lazy_egress()
+
+    egress.start()
+    assert service.requests == []  # start() does not wait for the request
+
+    await egress.aclose()
+    assert egress.egress_id == "EG_test"
+    assert len(service.requests) == 1
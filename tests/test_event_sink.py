@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from shared.event_sink import Batch, EventSink, jsonl_file_writer
+
+
+class RecordingWriter:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.batches: list[Batch] = []
+        self.delay = delay
+
+    async def __call__(self, batch: Batch) -> None:
+        await asyncio.sleep(self.delay)
+        self.batches.append(batch)
+
+
+async def test_events_are_written_in_order_in_batches() -> None:
+    writer = RecordingWriter()
+    sink = EventSink(writer, batch_size=3, flush_interval=60)
+    sink.start()
+    for i in range(7):
+        sink.emit({"i": i}, "log")
+    await asyncio.sleep(0.01)
+
+    # a full batch wakes the writer, which drains the buffer in batch_size chunks
+    assert [len(batch) for batch in writer.batches] == [3, 3, 1]
+
+    await sink.aclose()
+    assert [data["i"] for batch in writer.batches for _, data in batch] == list(
+        range(7)
+    )
+    assert sink.stats()["written"] == 7 and sink.stats()["depth"] == 0
+
+
+async def test_partial_batches_flush_on_the_interval() -> None:
+    writer = RecordingWriter()
+    sink = EventSink(writer, batch_size=64, flush_interval=0.05)
+    sink.start()
+    sink.emit({"i": 0}, "log")
+    await asyncio.sleep(0.15)
+
+    assert writer.batches == [[("log", {"i": 0})]]
+    await sink.aclose()
+
+
+async def test_a_full_buffer_drops_the_oldest_events() -> None:
+    writer = RecordingWriter()
+    sink = EventSink(writer, max_events=4, batch_size=64)
+    for i in range(6):
+        sink.emit({"i": i}, "log")
+    await sink.aclose()
+
+    assert [data["i"] for batch in writer.batches for _, data in batch] == [2, 3, 4, 5]
+    assert sink.dropped == 2 and sink.high_watermark == 4
+
+    sink.emit({"i": 6}, "log")
+    assert sink.dropped == 3
+
+
+async def test_close_waits_for_the_batch_being_written() -> None:
+    writer = RecordingWriter(delay=0.1)
+    sink = EventSink(writer, batch_size=2)
+    sink.start()
+    for i in range(5):
+        sink.emit({"i": i}, "log")
+    await asyncio.sleep(0.01)  # the first batch is now mid-write
+    await sink.aclose()
+
+    assert [data["i"] for batch in writer.batches for _, data in batch] == list(
+        range(5)
+    )
+    assert sink.write_errors == 0
+
+
+async def test_jsonl_file_writer_appends_one_line_per_event(tmp_path) -> None:
+    path = str(tmp_path / "events.jsonl")
+    write = jsonl_file_writer()
+    await write([(path, {"i": 0}), (path, {"i": 1})])
+    await write([(path, {"i": 2})])
+
+    with open(path) as f:
+        assert [json.loads(line)["i"] for line in f] == [0, 1, 2]
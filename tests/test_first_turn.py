@@ -0,0 +1,23 @@
+import pytest
+
+from fakes import FakeLatency
+from first_turn import AGENTS, measure
+from shared.phrase_cache import get_phrase_cache
+
+
+@pytest.fixture(autouse=True)
+def phrase_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PHRASE_CACHE_DIR", str(tmp_path))
+    get_phrase_cache.cache_clear()
+    yield
+    get_phrase_cache.cache_clear()
+
+
+@pytest.mark.parametrize("persona", sorted(AGENTS))
+async def test_first_turn_stays_within_budget(persona: str) -> None:
+    result = await measure(persona, FakeLatency(llm_ttft=0.05, tts_ttfb=0.05))
+
+    assert result.failures == []
+    if result.ttft is not None:
+        # the LLM-written opener sends the system prompt once
+        assert result.prompt_tokens > 0
@@ -0,0 +1,85 @@
+import asyncio
+
+from livekit.agents import AgentSession
+
+import newprojectagent
+import projectagent
+from agent import PIPELINE, LivspaceAgent
+from fakes import FakeAudioOutput, FakeLatency, FakeResponse, fake_plugins
+
+TRANSFER = {
+    "project": FakeResponse(
+        "Hi, this is Raj from Project Support.", (("transfer_to_project_support", {}),)
+    ),
+    "new home": FakeResponse(
+        "Hi, this is Varsha from the New Project team.",
+        (("transfer_to_new_project_team", {}),),
+    ),
+    "something else": FakeResponse(
+        "Sure, taking you back.", (("return_to_main_agent", {}),)
+    ),
+}
+
+
+def _tool_names(agent) -> set[str]:
+    return {tool.__name__ for tool in agent.tools}
+
+
+async def _settle(session: AgentSession) -> None:
+    while session.current_speech is not None:
+        await session.current_speech.wait_for_playout()
+        await asyncio.sleep(0)
+
+
+async def test_transfer_switches_role_in_place() -> None:
+    with fake_plugins([PIPELINE], latency=FakeLatency.instant(), responses=TRANSFER):
+        agent = LivspaceAgent(dial_info={})
+        session = AgentSession(resume_false_interruption=False)
+        session.output.audio = FakeAudioOutput()
+        await session.start(agent)
+        await _settle(session)
+        llm, tts = agent.llm, agent.tts
+
+        await session.run(user_input="I have a question about my project")
+        await _settle(session)
+
+    assert session.current_agent is agent
+    assert agent.role is projectagent.ROLE
+    assert agent.instructions == projectagent.ROLE.instructions
+    assert "return_to_main_agent" in _tool_names(agent)
+    assert "transfer_to_project_support" not in _tool_names(agent)
+    assert "end_call" in _tool_names(agent)
+    assert agent.llm is llm and agent.tts is tts
+    assert tts.voice == projectagent.VOICE
+    assert [(a, b) for a, b, _ in agent.handoffs] == [("main", "project_support")]
+    # the team introduces itself
+    assert any(
+        item.type == "message"
+        and item.role == "assistant"
+        and "Raj" in item.text_content
+        for item in session.history.items
+    )
+    await session.aclose()
+
+
+async def test_return_to_main_restores_main_role() -> None:
+    with fake_plugins([PIPELINE], latency=FakeLatency.instant(), responses=TRANSFER):
+        agent = LivspaceAgent(dial_info={})
+        session = AgentSession(resume_false_interruption=False)
+        session.output.audio = FakeAudioOutput()
+        await session.start(agent)
+        await _settle(session)
+
+        await session.run(user_input="I'm building a new home")
+        await _settle(session)
+        assert agent.role is newprojectagent.ROLE
+        assert {"schedule_site_visit", "schedule_ec_visit"} <= _tool_names(agent)
+
+        await session.run(user_input="Can you help with something else?")
+        await _settle(session)
+
+    assert agent.role.name == "main"
+    assert "schedule_site_visit" not in _tool_names(agent)
+    assert "transfer_to_new_project_team" in _tool_names(agent)
+    assert agent.tts.voice == PIPELINE.tts.voice
+    await session.aclose()
@@ -0,0 +1,34 @@
+import pytest
+
+from livspace.constants import INSTRUCTIONS, KNOWLEDGE_BASE, RESIDENT_INSTRUCTIONS
+from livspace.knowledge_base import build_index
+from shared.retrieval import chunk_sections
+
+
+def test_resident_prompt_leaves_out_knowledge_base() -> None:
+    assert KNOWLEDGE_BASE in INSTRUCTIONS
+    assert KNOWLEDGE_BASE not in RESIDENT_INSTRUCTIONS
+    assert "search_knowledge_base" in RESIDENT_INSTRUCTIONS
+    assert len(RESIDENT_INSTRUCTIONS) < len(INSTRUCTIONS) / 2
+
+
+def test_every_knowledge_base_line_is_indexed() -> None:
+    indexed = "\n".join(f"{c.title}\n{c.text}" for c in chunk_sections(KNOWLEDGE_BASE))
+    for line in KNOWLEDGE_BASE.splitlines()[1:]:
+        heading = line.split(" ", 1)[-1]
+        assert line in indexed or heading in indexed
+
+
+@pytest.mark.parametrize(
+    "query, section",
+    [
+        ("is there a charge for the site visit", "3.3"),
+        ("what is the cancellation policy", "5.1"),
+        ("can I return a product from livspace home", "7.1"),
+        ("I want to apply for a job", "6"),
+        ("interiors for my office", "3.4"),
+    ],
+)
+def test_search_finds_the_right_section(query: str, section: str) -> None:
+    results = build_index().search(query, k=3)
+    assert section in [r.chunk.id for r in results]
@@ -0,0 +1,92 @@
+from livekit.agents import metrics
+
+from shared.latency import LatencyTracker
+
+
+def _turn_metrics(speech_id: str, eou: float, ttft: float, ttfb: float) -> list:
+    return [
+        metrics.EOUMetrics(
+            timestamp=0.0,
+            end_of_utterance_delay=eou,
+            transcription_delay=0.05,
+            on_user_turn_completed_delay=0.0,
+            last_speaking_time=0.0,
+            speech_id=speech_id,
+        ),
+        metrics.LLMMetrics(
+            label="livekit.plugins.google.llm.LLM",
+            request_id="req",
+            timestamp=0.0,
+            duration=1.0,
+            ttft=ttft,
+            cancelled=False,
+            completion_tokens=20,
+            prompt_tokens=2000,
+            prompt_cached_tokens=1500,
+            total_tokens=2020,
+            tokens_per_second=40.0,
+            speech_id=speech_id,
+        ),
+        metrics.TTSMetrics(
+            label="livekit.plugins.elevenlabs.tts.TTS",
+            request_id="req",
+            timestamp=0.0,
+            ttfb=ttfb,
+            duration=1.0,
+            audio_duration=2.0,
+            cancelled=False,
+            characters_count=40,
+            streamed=True,
+            speech_id=speech_id,
+        ),
+    ]
+
+
+def test_metrics_are_joined_into_turns_by_speech_id() -> None:
+    tracker = LatencyTracker("test_persona")
+    first, second = (
+        _turn_metrics("s1", 0.4, 0.3, 0.2),
+        _turn_metrics("s2", 0.6, 0.5, 0.25),
+    )
+    # events of concurrent speeches interleave
+    for ev in [first[0], second[0], first[1], second[1], first[2], second[2]]:
+        tracker.collect(ev)
+
+    turns = {t["speech_id"]: t for t in tracker.waterfall()}
+    assert turns["s1"]["e2e"] == 0.9
+    assert turns["s1"]["llm_provider"] == "google"
+    assert turns["s1"]["prompt_cached_tokens"] == 1500
+    assert turns["s2"]["tts_provider"] == "elevenlabs"
+
+    summary = tracker.summary()
+    assert summary["e2e"]["count"] == 2
+    assert summary["llm_ttft"]["p50"] in (0.3, 0.5)
+
+
+def test_partial_turns_have_no_end_to_end_latency() -> None:
+    tracker = LatencyTracker("test_persona")
+    # agent-initiated speech (e.g. the greeting) has no end of utterance
+    for ev in _turn_metrics("greeting", 0.0, 0.3, 0.2)[1:]:
+        tracker.collect(ev)
+
+    (turn,) = tracker.waterfall()
+    assert turn["e2e"] is None
+    assert "e2e" not in tracker.summary()
+
+
+def test_prompt_tokens_are_recorded_once_per_turn() -> None:
+    from prometheus_client import REGISTRY
+
+    labels = {"persona": "prompt_persona", "provider": "google"}
+    before = REGISTRY.get_sample_value("voice_agent_prompt_tokens_sum", labels) or 0.0
+    tracker = LatencyTracker("prompt_persona")
+    llm_metrics = _turn_metrics("s1", 0.4, 0.3, 0.2)[1]
+    # a retried request for the same speech reports the prompt again
+    tracker.collect(llm_metrics)
+    tracker.collect(llm_metrics)
+
+    assert (
+        REGISTRY.get_sample_value("voice_agent_prompt_tokens_sum", labels)
+        == before + 2000
+    )
+    assert tracker.waterfall()[0]["prompt_tokens"] == 2000
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from personas import (
+    PERSONAS,
+    default_persona,
+    resolve_persona,
+    served_personas,
+    session_profile,
+)
+
+
+@pytest.fixture(autouse=True)
+def worker_env(monkeypatch):
+    for name in ("AGENT_NAME", "PERSONAS", "DEFAULT_PERSONA", "PERSONA_SESSION_CAPS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_persona_is_chosen_from_job_metadata() -> None:
+    metadata = json.dumps(
+        {"persona": "master_outbound", "phone_number": "+919876543210"}
+    )
+    assert resolve_persona(metadata).name == "master_outbound"
+
+
+def test_legacy_agent_name_is_an_alias() -> None:
+    metadata = json.dumps({"agent_name": "livekit_livspace_inbound"})
+    assert resolve_persona(metadata).name == "livspace_inbound"
+
+
+def test_jobs_dispatched_to_a_legacy_agent_name_need_no_metadata() -> None:
+    # SIP dispatch rules send jobs to the agent_name with no persona in the metadata
+    job = resolve_persona("", agent_name="livekit_dra_homes_inbound")
+    assert job.name == "dra_homes_inbound"
+
+
+def test_default_persona_covers_empty_metadata(monkeypatch) -> None:
+    assert default_persona() is None
+
+    monkeypatch.setenv("DEFAULT_PERSONA", "meragi_inbound")
+    assert (
+        resolve_persona("", agent_name="revspot-voice-agent").name == "meragi_inbound"
+    )
+
+
+def test_unknown_persona_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        resolve_persona(json.dumps({"persona": "nobody"}))
+    with pytest.raises(ValueError):
+        resolve_persona("{}", agent_name="revspot-voice-agent")
+
+
+def test_workers_serve_only_their_personas(monkeypatch) -> None:
+    assert served_personas() == PERSONAS
+
+    monkeypatch.setenv("AGENT_NAME", "meragi-inbound-agent")
+    assert list(served_personas()) == ["meragi_inbound"]
+    assert default_persona().name == "meragi_inbound"
+    assert session_profile(None).persona == "meragi_inbound"
+
+    monkeypatch.setenv("PERSONAS", "livspace_inbound, master_outbound")
+    assert list(served_personas()) == ["livspace_inbound", "master_outbound"]
+    with pytest.raises(ValueError, match="not served"):
+        resolve_persona(json.dumps({"persona": "dra_homes_inbound"}))
+
+    monkeypatch.delenv("AGENT_NAME")
+    monkeypatch.setenv("PERSONAS", "livspace_demo")
+    assert resolve_persona(None).name == "livspace_demo"
+
+
+def test_persona_modules_are_imported_only_when_served() -> None:
+    modules = sorted(persona.module for persona in PERSONAS.values())
+    code = f"import sys, personas; print([m for m in {modules!r} if m in sys.modules])"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_registry_matches_the_persona_modules() -> None:
+    for persona in PERSONAS.values():
+        assert persona.name == persona.load().PERSONA
+        assert callable(persona.entrypoint)
+
+
+def test_personas_share_identical_plugin_configs() -> None:
+    specs = [spec for persona in PERSONAS.values() for spec in persona.pipelines]
+    configured = [key for spec in specs for key in spec.keys().values()]
+    assert len(set(configured)) < len(configured)
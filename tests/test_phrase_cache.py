@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from livekit import rtc
+
+from shared.phrase_cache import Live, PhraseCache
+
+
+class FakeTTS:
+    """Renders each character of the text as one 10 ms frame of its code point"""
+
+    label = "fake.TTS"
+    sample_rate = 16000
+    num_channels = 1
+
+    def __init__(self, voice_id: str = "voice-a") -> None:
+        self._opts = SimpleNamespace(voice_id=voice_id, model="fake-v1")
+        self.calls: list[str] = []
+
+    def synthesize(self, text: str) -> FakeStream:
+        self.calls.append(text)
+        return FakeStream(text)
+
+
+class FakeStream:
+    def __init__(self, text: str) -> None:
+        self._frames = [
+            rtc.AudioFrame(
+                data=(ord(c) % 30000).to_bytes(2, "little") * 160,
+                sample_rate=16000,
+                num_channels=1,
+                samples_per_channel=160,
+            )
+            for c in text
+        ]
+
+    async def __aenter__(self) -> FakeStream:
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self._frames:
+            yield SimpleNamespace(frame=frame)
+
+
+async def _collect(cache: PhraseCache, engine: FakeTTS, *segments: str) -> bytes:
+    pcm = bytearray()
+    async for frame in cache.stream(engine, list(segments)):
+        pcm += frame.data.tobytes()
+    return bytes(pcm)
+
+
+async def test_second_call_plays_from_memory(tmp_path) -> None:
+    cache = PhraseCache(str(tmp_path))
+    engine = FakeTTS()
+
+    first = await _collect(cache, engine, "Goodbye!")
+    second = await _collect(cache, engine, "Goodbye!")
+
+    assert first == second
+    assert engine.calls == ["Goodbye!"]
+    assert cache.stats()["hits"] == 1
+
+
+async def test_phrases_persist_across_processes(tmp_path) -> None:
+    engine = FakeTTS()
+    await PhraseCache(str(tmp_path)).warm(
+        engine, ["Good morning, am I speaking with Mr."]
+    )
+
+    other = PhraseCache(str(tmp_path))
+    await _collect(other, engine, "Good morning, am I speaking with Mr.")
+
+    assert len(engine.calls) == 1
+    assert other.stats()["disk_hits"] == 1
+
+
+async def test_cache_is_keyed_by_voice(tmp_path) -> None:
+    cache = PhraseCache(str(tmp_path))
+    await _collect(cache, FakeTTS("voice-a"), "Hello")
+    other_voice = FakeTTS("voice-b")
+    await _collect(cache, other_voice, "Hello")
+
+    assert other_voice.calls == ["Hello"]
+
+
+async def test_live_segments_are_stitched_but_never_cached(tmp_path) -> None:
+    cache = PhraseCache(str(tmp_path))
+    engine = FakeTTS()
+
+    stitched = await _collect(cache, engine, "Hi", Live("Asha?"))
+    expected = await _collect(
+        PhraseCache(str(tmp_path / "plain")), FakeTTS(), "HiAsha?"
+    )
+    await _collect(cache, engine, "Hi", Live("Asha?"))
+
+    assert stitched == expected
+    assert sorted(engine.calls) == ["Asha?", "Asha?", "Hi"]
@@ -0,0 +1,80 @@
+import os
+import time
+
+from livspace.pincodes import PincodeService
+
+ROWS = """pincode,city,tier,serviceable,experience_centre
+560037,Bangalore,1,true,Livspace EC HSR Layout
+411001,Pune,2,true,
+110001,Delhi,1,false,
+"""
+
+KEYS = {"pincode", "serviceable", "city", "tier", "experience_centre", "error"}
+
+
+def _service(tmp_path, rows: str = ROWS) -> PincodeService:
+    source = tmp_path / "pincodes.csv"
+    source.write_text(rows)
+    return PincodeService(str(source), str(tmp_path / "index"))
+
+
+def test_lookups_share_one_schema(tmp_path) -> None:
+    service = _service(tmp_path)
+
+    assert service.lookup("560037") == {
+        "pincode": "560037",
+        "serviceable": True,
+        "city": "Bangalore",
+        "tier": 1,
+        "experience_centre": "Livspace EC HSR Layout",
+        "error": None,
+    }
+    assert service.lookup("411001")["experience_centre"] is None
+    assert service.lookup("110001")["serviceable"] is False
+    assert service.lookup("110001")["city"] == "Delhi"
+
+    unknown = service.lookup("999999")
+    assert unknown["serviceable"] is False and unknown["error"] is None
+    for invalid in ("5600", "56003a", "012345"):
+        assert service.lookup(invalid)["error"]
+
+    for pincode in ("560037", "999999", "5600"):
+        assert set(service.lookup(pincode)) == KEYS
+
+
+def test_bundled_pincodes_are_serviceable(tmp_path) -> None:
+    service = PincodeService(index_dir=str(tmp_path))
+    for pincode in ("560001", "560103", "560037", "560078"):
+        assert service.lookup(pincode)["serviceable"]
+
+
+async def test_refresh_swaps_in_the_updated_file(tmp_path) -> None:
+    service = _service(tmp_path)
+    before = service.directory
+    assert not await service.refresh()
+
+    source = tmp_path / "pincodes.csv"
+    source.write_text(ROWS + "600001,Chennai,1,true,\n")
+    later = time.time() + 5
+    os.utime(source, (later, later))
+
+    assert await service.refresh()
+    assert service.directory is not before
+    assert service.lookup("600001")["city"] == "Chennai"
+    assert (
+        before.lookup("600001")["city"] is None
+    )  # readers of the old directory are unaffected
+
+
+def test_lookup_is_fast(tmp_path) -> None:
+    rows = "pincode,city,tier,serviceable,experience_centre\n" + "".join(
+        f"{pincode},City{pincode % 700},{pincode % 3},{pincode % 2},EC{pincode % 40}\n"
+        for pincode in range(110000, 990000, 45)
+    )
+    service = _service(tmp_path, rows)
+    assert len(service.directory) > 19000
+
+    started = time.perf_counter()
+    for pincode in range(110000, 120000):
+        service.lookup(str(pincode))
+    assert (time.perf_counter() - started) / 10000 < 1e-3
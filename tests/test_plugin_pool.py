@@ -0,0 +1,94 @@
+import pytest
+
+from shared import plugin_pool
+from shared.plugin_pool import PipelineSpec, PluginKey, PluginPool, build_plugin
+
+
+class Client:
+    def __init__(self, key: PluginKey) -> None:
+        self.key = key
+        self.closed = False
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def test_factories():
+    saved = dict(plugin_pool._FACTORIES)
+    for kind in ("stt", "llm", "tts", "turn_detection"):
+        plugin_pool.register_factory(kind, "test")(Client)
+    yield
+    plugin_pool._FACTORIES.clear()
+    plugin_pool._FACTORIES.update(saved)
+
+
+SPEC = PipelineSpec(
+    llm=PluginKey.create("llm", "test", model="gpt-4o-mini", temperature=0.3),
+    tts=PluginKey.create("tts", "test", voice="v1", voice_settings={"speed": 1.1}),
+    turn_detection=PluginKey.create("turn_detection", "test"),
+)
+
+
+def test_keys_compare_by_configuration() -> None:
+    a = PluginKey.create(
+        "tts", "test", voice="v1", voice_settings={"speed": 1.1, "style": 0}
+    )
+    b = PluginKey.create(
+        "tts", "test", voice="v1", voice_settings={"style": 0, "speed": 1.1}
+    )
+    nested = PluginKey.create("llm", "test", turn_detection={"type": "server_vad"})
+
+    assert a == b and hash(a) == hash(b)
+    assert a != PluginKey.create(
+        "tts", "test", voice="v2", voice_settings={"speed": 1.1, "style": 0}
+    )
+    assert hash(nested) == hash(
+        PluginKey.create("llm", "test", turn_detection={"type": "server_vad"})
+    )
+    assert list(SPEC.keys()) == ["llm", "tts", "turn_detection"]
+    assert (
+        PipelineSpec(llm=SPEC.llm, tts=SPEC.tts, turn_detection=SPEC.turn_detection)
+        == SPEC
+    )
+
+
+def test_unknown_providers_are_rejected() -> None:
+    with pytest.raises(ValueError, match="No plugin factory"):
+        build_plugin(PluginKey.create("tts", "nobody"))
+
+
+async def test_borrowed_plugins_are_recycled_on_release() -> None:
+    pool = PluginPool()
+    pool.prewarm(SPEC)
+    assert pool.created == 2 and pool.idle_count(SPEC.tts) == 1
+    # the turn detector binds to the job's executor, so it is built on first borrow
+    assert pool.idle_count(SPEC.turn_detection) == 0
+
+    lease = pool.lease(SPEC)
+    used = lease.plugins
+    assert pool.reused == 2 and pool.idle_count(SPEC.tts) == 0
+    assert used["tts"].key == SPEC.tts
+
+    await lease.arelease()
+    await lease.arelease()  # releasing twice is a no-op
+
+    assert used["llm"].closed and used["tts"].closed
+    assert not used["turn_detection"].closed
+    assert pool.idle_count(SPEC.llm) == 1 and pool.idle_count(SPEC.tts) == 1
+
+    again = pool.lease(SPEC).plugins
+    assert again["tts"] is not used["tts"] and not again["tts"].closed
+    assert again["turn_detection"] is used["turn_detection"]
+
+
+async def test_an_empty_pool_builds_on_demand() -> None:
+    pool = PluginPool()
+    other = PluginKey.create("tts", "test", voice="v2")
+
+    first = pool.acquire(SPEC.tts)
+    second = pool.acquire(SPEC.tts)
+    assert first is not second and pool.created == 2 and pool.reused == 0
+
+    await pool.recycle(SPEC.tts, first)
+    assert pool.idle_count(SPEC.tts) == 1 and pool.idle_count(other) == 0
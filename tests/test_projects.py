@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+from livspace import project_details
+from livspace.projects import FixtureBackend, ProjectLookup, slim
+
+
+class CountingBackend(FixtureBackend):
+    def __init__(self, delay: float = 0.01) -> None:
+        self.calls: list[tuple[str, str]] = []
+        self.delay = delay
+
+    async def fetch(self, identifier: str, identifier_type: str):
+        self.calls.append((identifier, identifier_type))
+        await asyncio.sleep(self.delay)
+        return await super().fetch(identifier, identifier_type)
+
+
+def test_projection_keeps_only_what_the_agent_uses() -> None:
+    result = slim(project_details.project_details_2)
+
+    assert result == {
+        "projects": [
+            {
+                "stage": "Partial Order Confirmed",
+                "city": "Bangalore",
+                "property_name": "Friends Plaza",
+                "created_at": "2025-08-18T13:25:40",
+            },
+            {
+                "stage": "Awaiting 10%",
+                "city": "Bangalore",
+                "property_name": "Taj Mahal",
+                "created_at": "2025-08-13T08:13:35",
+            },
+        ],
+        "error": None,
+    }
+    assert (
+        len(json.dumps(result)) < len(json.dumps(project_details.project_details_2)) / 4
+    )
+    assert slim(project_details.project_details_0) == {
+        "projects": [],
+        "error": "No projects available for user",
+    }
+
+
+async def test_concurrent_lookups_share_one_request() -> None:
+    backend = CountingBackend()
+    lookup = ProjectLookup(backend)
+
+    results = await asyncio.gather(
+        *(lookup.get("BLR12345", "project_id") for _ in range(5))
+    )
+
+    assert backend.calls == [("BLR12345", "project_id")]
+    assert all(r == results[0] for r in results)
+    assert results[0]["projects"][0]["city"] == "Singapore"
+    assert lookup.stats()["coalesced"] == 4
+
+
+async def test_repeat_callers_are_served_from_cache() -> None:
+    backend = CountingBackend(delay=0)
+    lookup = ProjectLookup(backend, ttl=0.05, max_entries=2)
+
+    await lookup.get("9876543210", "phone_number")
+    await lookup.get("+91 98765 43210", "phone_number")
+    assert len(backend.calls) == 1
+    assert lookup.hits == 1
+
+    # evicted once two other numbers are looked up
+    await lookup.get("0123456789", "phone_number")
+    await lookup.get("BLR98765", "project_id")
+    await lookup.get("9876543210", "phone_number")
+    assert len(backend.calls) == 4
+
+    await asyncio.sleep(0.06)
+    await lookup.get("9876543210", "phone_number")
+    assert len(backend.calls) == 5
+
+
+async def test_backend_failures_are_not_cached() -> None:
+    class FlakyBackend(FixtureBackend):
+        failures = 1
+
+        async def fetch(self, identifier, identifier_type):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("CRM timed out")
+            return await super().fetch(identifier, identifier_type)
+
+    lookup = ProjectLookup(FlakyBackend())
+
+    assert (await lookup.get("BLR12345", "project_id"))["error"]
+    assert (await lookup.get("BLR12345", "project_id"))["projects"]
+
+
+async def test_prefetched_caller_is_answered_without_a_second_request() -> None:
+    backend = CountingBackend()
+    lookup = ProjectLookup(backend)
+
+    lookup.prefetch("+919876543210")
+    await asyncio.sleep(0)  # the greeting starts playing
+    result = await lookup.get("9876543210", "phone_number")
+
+    assert backend.calls == [("9876543210", "phone_number")]
+    assert result["projects"][0]["property_name"] == "Friends Plaza"
+    assert lookup.stats()["coalesced"] == 1
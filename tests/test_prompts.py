@@ -0,0 +1,45 @@
+import pytest
+
+from dra_homes_inbound.agent import PROMPT as DRA_PROMPT
+from meragi_inbound.prompt import get_meragi_inbound_prompt
+from shared.prompts import PromptTemplate, dynamic_vars
+
+TEMPLATE = PromptTemplate(
+    "Hi {{name}}, calling about {{project}}. Bye {{name}}.", name="test"
+)
+
+
+def test_values_go_in_a_suffix_after_a_static_prefix() -> None:
+    first = TEMPLATE.render({"name": "Rahul", "project": "Inara"})
+    second = TEMPLATE.render({"name": "Priya", "project": "Inara", "unused": "x"})
+
+    assert TEMPLATE.variables == ("name", "project")
+    assert first.startswith(TEMPLATE.prefix) and second.startswith(TEMPLATE.prefix)
+    assert first.endswith("{{name}} = Rahul\n{{project}} = Inara\n")
+    assert second.endswith("{{name}} = Priya\n{{project}} = Inara\n")
+
+
+def test_rendering_is_cached_per_set_of_values() -> None:
+    assert TEMPLATE.render({"name": "Rahul"}, project="Inara") is TEMPLATE.render(
+        name="Rahul", project="Inara"
+    )
+
+
+def test_missing_values_are_rejected() -> None:
+    with pytest.raises(ValueError, match="test prompt has no value for project"):
+        TEMPLATE.render({"name": "Rahul", "project": None})
+    assert TEMPLATE.missing({}) == ["name", "project"]
+
+
+def test_a_prompt_without_placeholders_renders_as_is() -> None:
+    assert PromptTemplate("Static.").render() == "Static."
+
+
+def test_persona_prompts() -> None:
+    dial_info = {"dynamic_vars": {"lead_honorific": "Mr.", "customer_name": "Rahul"}}
+    instructions = DRA_PROMPT.render(dynamic_vars(dial_info))
+    assert DRA_PROMPT.variables == ("lead_honorific",)
+    assert instructions.endswith("{{lead_honorific}} = Mr.\n")
+    assert dynamic_vars(None) == {} and dynamic_vars({"dynamic_vars": None}) == {}
+
+    assert get_meragi_inbound_prompt("Priya").endswith("{{customer_name}} = Priya\n")
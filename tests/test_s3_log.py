@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from shared.event_sink import EventSink
+from shared.s3_log import MIN_PART_SIZE, S3LogWriter, S3StreamingLog
+
+
+class FakeS3:
+    """In-memory stand-in for the subset of the boto3 S3 client we use"""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, bytes] = {}
+        self.uploads: dict[str, list[tuple[int, bytes]]] = {}
+        self.calls: list[str] = []
+        self.bytes_sent = 0
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):  # noqa: N803
+        self.calls.append("put_object")
+        self.bytes_sent += len(Body)
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):  # noqa: N803
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = []
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):  # noqa: N803
+        self.calls.append("upload_part")
+        self.bytes_sent += len(Body)
+        self.uploads[UploadId].append((PartNumber, Body))
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):  # noqa: N803
+        self.calls.append("complete_multipart_upload")
+        parts = dict(self.uploads.pop(UploadId))
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[Key] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):  # noqa: N803
+        self.calls.append("abort_multipart_upload")
+        self.uploads.pop(UploadId, None)
+
+
+async def test_short_log_is_a_single_put() -> None:
+    s3 = FakeS3()
+    log = S3StreamingLog(s3, "bucket", "room/session_events.jsonl")
+    for i in range(3):
+        await log.write_json({"i": i})
+    await log.aclose()
+
+    assert s3.calls == ["put_object"]
+    lines = s3.objects["room/session_events.jsonl"].decode().splitlines()
+    assert [json.loads(line)["i"] for line in lines] == [0, 1, 2]
+
+
+async def test_long_log_uploads_each_byte_once() -> None:
+    s3 = FakeS3()
+    log = S3StreamingLog(s3, "bucket", "room/session_events.jsonl")
+    line = (json.dumps({"payload": "x" * 1000}) + "\n").encode()
+    count = (2 * MIN_PART_SIZE) // len(line) + 10
+    for _ in range(count):
+        await log.write(line)
+    await log.aclose()
+
+    assert s3.calls.count("upload_part") == 3
+    assert s3.calls[-1] == "complete_multipart_upload"
+    assert s3.objects["room/session_events.jsonl"] == line * count
+    assert s3.bytes_sent == len(line) * count
+
+
+async def test_event_sink_finalizes_s3_logs_on_close() -> None:
+    s3 = FakeS3()
+    sink = EventSink(S3LogWriter(s3, "bucket"), batch_size=2)
+    sink.start()
+    for i in range(5):
+        sink.emit({"i": i}, "room/a.jsonl")
+    sink.emit({"i": 0}, "room/b.jsonl")
+    await sink.aclose()
+
+    assert len(s3.objects["room/a.jsonl"].splitlines()) == 5
+    assert len(s3.objects["room/b.jsonl"].splitlines()) == 1
+
+
+async def test_closed_log_rejects_writes() -> None:
+    log = S3StreamingLog(FakeS3(), "bucket", "key")
+    await log.aclose()
+    with pytest.raises(RuntimeError):
+        await log.write(b"late\n")
+
+
+async def test_compressed_log_is_one_zstd_stream() -> None:
+    zstandard = pytest.importorskip("zstandard")
+    s3 = FakeS3()
+    log = S3StreamingLog(s3, "bucket", "room/session_events.jsonl", compression="zstd")
+    for i in range(100):
+        await log.write_json({"i": i})
+    await log.aclose()
+
+    body = s3.objects["room/session_events.jsonl.zst"]
+    assert log.bytes_stored == len(body) < log.bytes_written
+    lines = (
+        zstandard.ZstdDecompressor()
+        .decompressobj()
+        .decompress(body)
+        .decode()
+        .splitlines()
+    )
+    assert [json.loads(line)["i"] for line in lines] == list(range(100))
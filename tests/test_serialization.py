@@ -0,0 +1,92 @@
+import json
+
+from livekit.agents import metrics
+from livekit.agents.llm import FunctionCall, FunctionCallOutput, LLMError
+from livekit.agents.voice.events import (
+    ErrorEvent,
+    FunctionToolsExecutedEvent,
+    MetricsCollectedEvent,
+    UserStateChangedEvent,
+)
+
+from fakes import FakeLLM
+from shared.serialization import dumps, dumps_line, project_event
+
+
+def test_lines_are_compact_json() -> None:
+    line = dumps_line(
+        project_event(
+            UserStateChangedEvent(old_state="listening", new_state="speaking")
+        )
+    )
+
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert b", " not in line and b": " not in line
+    assert json.loads(line)["new_state"] == "speaking"
+    assert dumps({"text": "नमस्ते"}) == '{"text":"नमस्ते"}'.encode()
+
+
+def test_metrics_drop_fields_the_event_already_has() -> None:
+    ev = MetricsCollectedEvent(
+        metrics=metrics.LLMMetrics(
+            label="llm",
+            request_id="r1",
+            timestamp=1.0,
+            duration=0.9,
+            ttft=0.4,
+            cancelled=False,
+            completion_tokens=10,
+            prompt_tokens=90,
+            prompt_cached_tokens=64,
+            total_tokens=100,
+            tokens_per_second=11.1,
+            speech_id=None,
+        )
+    )
+    data = json.loads(dumps(project_event(ev)))
+
+    assert data["type"] == "metrics_collected" and data["created_at"] == ev.created_at
+    assert (
+        data["metrics"]["prompt_tokens"] == 90
+        and data["metrics"]["type"] == "llm_metrics"
+    )
+    assert not {"timestamp", "total_tokens", "tokens_per_second", "speech_id"} & set(
+        data["metrics"]
+    )
+
+
+def test_tool_outputs_are_paired_with_their_calls() -> None:
+    call = FunctionCall(
+        call_id="c1", name="check_pincode", arguments='{"pincode": "560102"}'
+    )
+    output = FunctionCallOutput(
+        call_id="c1", name="check_pincode", output="serviceable", is_error=False
+    )
+    data = project_event(
+        FunctionToolsExecutedEvent(
+            function_calls=[call], function_call_outputs=[output]
+        )
+    )
+
+    assert data["calls"] == [
+        {
+            "name": "check_pincode",
+            "call_id": "c1",
+            "arguments": '{"pincode": "560102"}',
+            "output": "serviceable",
+        }
+    ]
+
+
+def test_error_events_serialize_without_their_plugin_instance() -> None:
+    llm = FakeLLM()
+    error = LLMError(
+        timestamp=1.0,
+        label="llm",
+        error=TimeoutError("no first token"),
+        recoverable=True,
+    )
+    data = json.loads(dumps(project_event(ErrorEvent(error=error, source=llm))))
+
+    assert data["error"]["error"] == "TimeoutError: no first token"
+    assert data["source"] == type(llm).__module__
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+
+from shared.shutdown import ShutdownPipeline, replay_uploads
+
+
+class FakeS3:
+    """Blocking in-memory S3 client; ``hold`` keys stall until released"""
+
+    def __init__(
+        self, delay: float = 0.0, hold: tuple[str, ...] = (), fail: tuple[str, ...] = ()
+    ) -> None:
+        self.objects: dict[str, bytes] = {}
+        self.delay = delay
+        self.hold = hold
+        self.fail = fail
+        self.released = threading.Event()
+
+    def _wait(self, key: str) -> None:
+        time.sleep(self.delay)
+        if key in self.hold:
+            self.released.wait(5)
+        if key in self.fail:
+            raise ConnectionError("S3 unavailable")
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):  # noqa: N803
+        self._wait(Key)
+        self.objects[Key] = Body
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):  # noqa: N803
+        self._wait(Key)
+        with open(Filename, "rb") as f:
+            self.objects[Key] = f.read()
+
+
+def _log_file(tmp_path) -> str:
+    path = tmp_path / "session_events_room.jsonl"
+    path.write_text('{"type": "close"}\n')
+    return str(path)
+
+
+async def test_uploads_run_concurrently(tmp_path) -> None:
+    s3 = FakeS3(delay=0.2)
+    pipeline = ShutdownPipeline(deadline=5, spool_dir=str(tmp_path / "spool"), s3=s3)
+    log = _log_file(tmp_path)
+    pipeline.upload_file(log, "room/session_events_room.jsonl")
+    pipeline.upload_json({"items": []}, "room/transcript_room.json")
+    pipeline.upload_json({"llm_prompt_tokens": 10}, "room/summary_room.json")
+
+    started = time.monotonic()
+    await pipeline.run()
+
+    assert time.monotonic() - started < 0.5
+    assert pipeline.uploaded == 3 and pipeline.spooled == 0
+    assert json.loads(s3.objects["room/transcript_room.json"]) == {"items": []}
+    assert not os.path.exists(log)
+
+
+async def test_stragglers_are_spooled_at_the_deadline_and_replayed(tmp_path) -> None:
+    spool = str(tmp_path / "spool")
+    s3 = FakeS3(
+        hold=("room/session_events_room.jsonl",), fail=("room/summary_room.json",)
+    )
+    pipeline = ShutdownPipeline(deadline=0.2, spool_dir=spool, s3=s3)
+    log = _log_file(tmp_path)
+    pipeline.upload_file(log, "room/session_events_room.jsonl")
+    pipeline.upload_json({"items": []}, "room/transcript_room.json")
+    pipeline.upload_json({"llm_prompt_tokens": 10}, "room/summary_room.json")
+
+    started = time.monotonic()
+    await pipeline.run()
+    s3.released.set()
+
+    assert time.monotonic() - started < 1
+    assert pipeline.uploaded == 1 and pipeline.spooled == 2
+    assert not os.path.exists(log)
+
+    later = FakeS3()
+    assert await replay_uploads(spool, lambda: later) == 2
+    assert later.objects["room/session_events_room.jsonl"] == b'{"type": "close"}\n'
+    assert json.loads(later.objects["room/summary_room.json"]) == {
+        "llm_prompt_tokens": 10
+    }
+    assert os.listdir(spool) == []
+
+
+async def test_failed_replays_stay_spooled(tmp_path) -> None:
+    spool = str(tmp_path / "spool")
+    pipeline = ShutdownPipeline(
+        deadline=1, spool_dir=spool, s3=FakeS3(fail=("room/transcript_room.json",))
+    )
+    pipeline.upload_json({"items": []}, "room/transcript_room.json")
+    await pipeline.run()
+
+    down = FakeS3(fail=("room/transcript_room.json",))
+    assert await replay_uploads(spool, lambda: down) == 0
+    assert await replay_uploads(spool, lambda: FakeS3()) == 1
+    assert os.listdir(spool) == []
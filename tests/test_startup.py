@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from shared.plugin_pool import IMPORT_TIMES, PipelineSpec, PluginKey, import_plugins
+from shared.startup import (
+    StartupProfile,
+    import_time_by_package,
+    package_of,
+    parse_importtime,
+)
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |       1500 |     openai._client
+import time:      2500 |       4000 |   openai
+import time:       800 |       4800 | livekit.plugins.openai
+import time:       300 |        300 |     botocore.session
+import time:       200 |        500 | boto3
+"""
+
+
+def test_importtime_is_grouped_by_package() -> None:
+    imports = parse_importtime(IMPORTTIME)
+    assert [entry.module for entry in imports] == [
+        "_io",
+        "openai._client",
+        "openai",
+        "livekit.plugins.openai",
+        "botocore.session",
+        "boto3",
+    ]
+    assert imports[3].cumulative_seconds == 0.0048
+
+    packages = import_time_by_package(imports)
+    assert list(packages) == [
+        "openai",
+        "livekit.plugins.openai",
+        "botocore",
+        "boto3",
+        "_io",
+    ]
+    assert packages["openai"] == pytest.approx(0.004)
+
+
+def test_package_of() -> None:
+    assert package_of("livekit.plugins.google.llm") == "livekit.plugins.google"
+    assert package_of("livekit.agents.voice") == "livekit.agents"
+    assert package_of("boto3.session") == "boto3"
+
+
+def test_profile_records_each_step() -> None:
+    profile = StartupProfile()
+    with profile.step("vad"):
+        time.sleep(0.01)
+    with profile.step("plugin_pool"):
+        pass
+
+    assert [name for name, _ in profile.steps] == ["vad", "plugin_pool"]
+    assert profile.total >= 0.01
+    assert profile.summary().endswith(", plugin_pool 0.00s")
+
+
+def test_only_named_plugins_are_imported() -> None:
+    import_plugins(
+        PipelineSpec(
+            tts=PluginKey.create("tts", "elevenlabs"),
+            llm=PluginKey.create("llm", "fake"),
+        )
+    )
+    assert "livekit.plugins.elevenlabs" in IMPORT_TIMES
+    assert not any("fake" in module for module in IMPORT_TIMES)
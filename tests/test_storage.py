@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from fakes import FakeS3
+from shared import storage
+from shared.s3_log import MIN_PART_SIZE
+
+
+@pytest.fixture
+def s3(monkeypatch) -> FakeS3:
+    client = FakeS3()
+    monkeypatch.setattr(storage, "get_s3_client", lambda: client)
+    monkeypatch.setenv("S3_RECORDING_BUCKET", "recordings")
+    return client
+
+
+async def test_blocking_calls_run_on_the_io_executor() -> None:
+    thread = await storage.run_io(lambda: threading.current_thread().name)
+
+    assert thread.startswith("storage-io")
+    assert await storage.run_io(int, "ff", base=16) == 255
+
+
+async def test_json_is_uploaded_compact_without_a_temp_file(s3: FakeS3) -> None:
+    key = await storage.put_json({"room": "r1", "turns": [1, 2]}, "r1/summary.json")
+
+    assert key == "r1/summary.json"
+    assert s3.objects[key] == b'{"room":"r1","turns":[1,2]}'
+
+
+async def test_files_are_uploaded_from_disk(s3: FakeS3, tmp_path) -> None:
+    path = tmp_path / "transcript.json"
+    path.write_text(json.dumps({"items": []}))
+
+    await storage.put_file(str(path), "r1/transcript.json", bucket="other")
+
+    assert json.loads(s3.objects["r1/transcript.json"]) == {"items": []}
+
+
+async def test_streams_are_uploaded_as_multipart_parts(s3: FakeS3, monkeypatch) -> None:
+    parts: list[int] = []
+    upload_part = s3.upload_part
+
+    def record_part(**kwargs):
+        parts.append(len(kwargs["Body"]))
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(s3, "upload_part", record_part)
+    chunk = b"x" * (MIN_PART_SIZE // 2 + 1)
+
+    async def chunks():
+        for _ in range(3):
+            await asyncio.sleep(0)
+            yield chunk
+
+    await storage.put_stream(chunks(), "r1/audio.raw")
+    assert s3.objects["r1/audio.raw"] == chunk * 3
+    assert parts == [len(chunk) * 2, len(chunk)]
+
+    # a stream shorter than one part is a single put
+    await storage.put_stream([b"a", b"b"], "r1/small.raw")
+    assert s3.objects["r1/small.raw"] == b"ab" and len(parts) == 2
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from livekit.agents import Agent, AgentSession, RunContext, function_tool
+
+from fakes import FakeAudioOutput, FakeLatency, FakeLLM, FakeResponse, FakeTTS
+from shared.tool_budget import FILLERS, ToolBudget, budgeted
+
+QUICK = ToolBudget(
+    filler_after=0.2, timeout=0.6, fallback={"success": False, "error": "timed out"}
+)
+
+RESPONSES = {
+    "slow": FakeResponse("Sorry, the system is slow today.", (("stuck_lookup", {}),)),
+    "both": FakeResponse("Both are done.", (("crm_write", {}), ("project_lookup", {}))),
+    "fast": FakeResponse("All set.", (("project_lookup", {}),)),
+}
+
+
+class _ToolAgent(Agent):
+    def __init__(self, lookup_seconds: float = 0.3) -> None:
+        latency = FakeLatency.instant()
+        super().__init__(
+            instructions="test",
+            llm=FakeLLM(RESPONSES, latency=latency),
+            tts=FakeTTS(latency=latency),
+        )
+        self.lookup_seconds = lookup_seconds
+        self.cancelled = False
+
+    @function_tool
+    @budgeted(QUICK)
+    async def stuck_lookup(self, context: RunContext):
+        """Never returns"""
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    @function_tool
+    @budgeted(QUICK)
+    async def crm_write(self, context: RunContext):
+        """Writes to the CRM"""
+        await asyncio.sleep(0.3)
+        return {"success": True}
+
+    @function_tool
+    @budgeted(QUICK)
+    async def project_lookup(self, context: RunContext):
+        """Looks up a project"""
+        await asyncio.sleep(self.lookup_seconds)
+        return {"projects": []}
+
+
+async def _run(
+    agent: _ToolAgent, text: str
+) -> tuple[AgentSession, FakeAudioOutput, float, dict[str, str]]:
+    session = AgentSession(resume_false_interruption=False)
+    audio = FakeAudioOutput()
+    session.output.audio = audio
+    await session.start(agent)
+    started = time.perf_counter()
+    result = await session.run(user_input=text)
+    outputs = {
+        ev.item.name: ev.item.output
+        for ev in result.events
+        if ev.type == "function_call_output"
+    }
+    return session, audio, started, outputs
+
+
+def _said(session: AgentSession) -> list[str]:
+    return [
+        item.text_content
+        for item in session.history.items
+        if item.type == "message" and item.role == "assistant"
+    ]
+
+
+async def test_stuck_tool_times_out_with_fallback_after_a_filler() -> None:
+    agent = _ToolAgent()
+    session, audio, started, outputs = await _run(agent, "this will be slow")
+
+    assert agent.cancelled
+    assert "timed out" in outputs["stuck_lookup"]
+    # the filler plays while the tool runs and stays out of the chat context
+    assert any(0.15 < t - started < 0.5 for t in audio.segment_starts)
+    assert _said(session) == ["Sorry, the system is slow today."]
+    assert len(audio.segment_starts) == 2
+    await session.aclose()
+
+
+async def test_independent_tools_run_concurrently_with_one_filler() -> None:
+    session, audio, started, outputs = await _run(_ToolAgent(), "do both")
+
+    assert set(outputs) == {"crm_write", "project_lookup"}
+    assert audio.segment_starts[-1] - started < 0.55
+    assert len(audio.segment_starts) == 2
+    await session.aclose()
+
+
+async def test_fast_tools_play_no_filler() -> None:
+    session, audio, _, _ = await _run(_ToolAgent(lookup_seconds=0.01), "fast please")
+
+    assert len(audio.segment_starts) == 1
+    assert _said(session) == ["All set."]
+    assert not set(FILLERS) & set(_said(session))
+    await session.aclose()
@@ -0,0 +1,199 @@
+import asyncio
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import AgentSession, UserInputTranscribedEvent
+from livekit.agents.vad import VADEvent, VADEventType
+
+from shared.campaign import CampaignCall
+from shared.voicemail import (
+    SAMPLE_RATE,
+    SpeechLength,
+    ToneDetector,
+    VoicemailDetector,
+    VoicemailPolicy,
+    spot_keywords,
+)
+
+FAST = VoicemailPolicy(deadline=0.5)
+
+
+def _tone(hz: float, seconds: float, level: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (level * 32767 * np.sin(2 * np.pi * hz * t)).astype(np.int16)
+
+
+def _noise(seconds: float, level: float = 0.3) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (level * 32767 * rng.uniform(-1, 1, int(seconds * SAMPLE_RATE))).astype(
+        np.int16
+    )
+
+
+def _voiced(seconds: float) -> np.ndarray:
+    # a gliding pitch with harmonics, roughly what a voice looks like to the FFT
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 2 * np.pi * (140 * t + 40 * t**2)
+    wave = sum(np.sin(k * pitch) / k for k in range(1, 8))
+    return (0.1 * 32767 * wave).astype(np.int16)
+
+
+def _frames(samples: np.ndarray, ms: int = 10) -> list[rtc.AudioFrame]:
+    n = SAMPLE_RATE * ms // 1000
+    return [
+        rtc.AudioFrame(
+            samples[i : i + n].tobytes(), SAMPLE_RATE, 1, len(samples[i : i + n])
+        )
+        for i in range(0, len(samples) - n + 1, n)
+    ]
+
+
+async def _stream(samples: np.ndarray, hold: float = 5.0):
+    for frame in _frames(samples):
+        yield frame
+        await asyncio.sleep(0)
+    await asyncio.sleep(hold)  # the line stays open after the greeting
+
+
+def _detector(session=None, policy=FAST):
+    detected: list[str] = []
+
+    async def on_detected(reason: str) -> None:
+        detected.append(reason)
+
+    return VoicemailDetector(session, None, on_detected, policy), detected
+
+
+def test_beep_is_detected_in_pieces_of_any_size() -> None:
+    tones = ToneDetector()
+    samples = np.concatenate((_noise(0.2, level=0.001), _tone(1000, 0.3)))
+
+    hits = [tones.push(chunk) for chunk in np.array_split(samples, 37)]
+
+    assert hits[-1] and not hits[0]
+
+
+def test_short_blips_noise_and_voice_are_not_beeps() -> None:
+    for samples in (
+        _tone(1000, 0.08),
+        _noise(1.0),
+        _voiced(1.0),
+        _tone(1000, 0.5, level=0.001),
+        _tone(100, 0.5),
+    ):
+        assert not ToneDetector().push(samples)
+
+
+def test_long_unbroken_speech_reads_as_a_greeting() -> None:
+    speech = SpeechLength(VoicemailPolicy(max_greeting=3.0))
+
+    def event(kind, duration, speaking=True):
+        return VADEvent(
+            type=kind,
+            samples_index=0,
+            timestamp=0,
+            speech_duration=duration,
+            silence_duration=0,
+            speaking=speaking,
+        )
+
+    assert not speech.push(event(VADEventType.START_OF_SPEECH, 0.2))
+    assert not speech.push(
+        event(VADEventType.END_OF_SPEECH, 1.1, speaking=False)
+    )  # "Hello?"
+    assert not speech.push(event(VADEventType.INFERENCE_DONE, 2.9))
+    assert speech.push(event(VADEventType.INFERENCE_DONE, 3.2))
+
+
+def test_keywords() -> None:
+    assert (
+        spot_keywords("Hi, you've reached Sarah, please leave a message after the beep")
+        == "after the beep"
+    )
+    assert (
+        spot_keywords("The number you have dialled is switched off")
+        == "The number you have dialled"
+    )
+    assert spot_keywords("आप जिस नंबर पर कॉल कर रहे हैं वह अभी उपलब्ध नहीं है") == "जिस नंबर पर"
+    assert spot_keywords("Hello? Who is this?") is None
+    assert spot_keywords("Yes, I am looking for a 2BHK") is None
+
+
+def test_a_person_answering_for_someone_is_not_a_machine() -> None:
+    for answer in (
+        "Sir is not available, I'm his wife",
+        "He is busy on another call, call after some time",
+        "You've reached the Sharma residence",
+        "His phone was switched off, this is his office number",
+        "Woh abhi uplabdh nahi hain",
+    ):
+        assert spot_keywords(answer) is None, answer
+
+
+async def test_detector_reports_the_beep() -> None:
+    detector, detected = _detector()
+    detector.start_with(_stream(np.concatenate((_voiced(0.5), _tone(1400, 0.3)))))
+
+    assert await asyncio.wait_for(detector.wait(), 2) == "beep"
+    assert detected == ["beep"]
+
+
+async def test_detector_gives_up_at_the_deadline() -> None:
+    detector, detected = _detector()
+    detector.start_with(_stream(_voiced(0.5)))
+
+    assert await asyncio.wait_for(detector.wait(), 2) is None
+    assert detected == []
+
+
+async def test_detector_spots_interim_transcripts() -> None:
+    session = AgentSession()
+    detector, detected = _detector(session, VoicemailPolicy(deadline=2))
+    detector.start_with(_stream(_voiced(0.2)))
+    await asyncio.sleep(0.05)
+
+    session.emit(
+        "user_input_transcribed",
+        UserInputTranscribedEvent(transcript="Hello?", is_final=True),
+    )
+    session.emit(
+        "user_input_transcribed",
+        UserInputTranscribedEvent(transcript="the number you have di", is_final=False),
+    )
+    session.emit(
+        "user_input_transcribed",
+        UserInputTranscribedEvent(
+            transcript="the number you have dialled is not reachable", is_final=False
+        ),
+    )
+
+    assert (
+        await asyncio.wait_for(detector.wait(), 2)
+        == "voicemail phrase 'the number you have dialled'"
+    )
+    assert detected == ["voicemail phrase 'the number you have dialled'"]
+
+
+async def test_detector_does_not_hang_up_on_a_person() -> None:
+    session = AgentSession()
+    detector, detected = _detector(session, VoicemailPolicy(deadline=0.5))
+    detector.start_with(_stream(_voiced(0.2)))
+    await asyncio.sleep(0.05)
+
+    session.emit(
+        "user_input_transcribed",
+        UserInputTranscribedEvent(
+            transcript="Hello? He is not available", is_final=True
+        ),
+    )
+
+    assert await asyncio.wait_for(detector.wait(), 2) is None
+    assert detected == []
+
+
+async def test_voicemail_outcome_overrides_answered() -> None:
+    call = CampaignCall({})
+    call.answered()
+    call.voicemail()
+
+    assert call._status == "voicemail"
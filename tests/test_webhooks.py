@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import pytest
+from aiohttp import web
+
+from shared import webhooks
+from shared.webhooks import WebhookDispatcher, WebhookError
+
+
+@contextlib.asynccontextmanager
+async def serve(handler):
+    app = web.Application()
+    app.router.add_post("/events", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}/events"
+    finally:
+        await runner.cleanup()
+
+
+def read_spool(spool: str) -> list[dict]:
+    records = []
+    for name in sorted(os.listdir(spool)):
+        with open(os.path.join(spool, name)) as f:
+            records += [json.loads(line) for line in f]
+    return records
+
+
+async def test_failures_are_retried_with_exponential_backoff(
+    tmp_path, monkeypatch
+) -> None:
+    monkeypatch.setattr(webhooks.random, "uniform", lambda a, b: 1.0)
+    seen: list[float] = []
+
+    async def flaky(request: web.Request) -> web.Response:
+        seen.append(time.monotonic())
+        return web.Response(status=503 if len(seen) < 3 else 200)
+
+    async with serve(flaky) as url:
+        dispatcher = WebhookDispatcher(spool_dir=str(tmp_path), base_delay=0.05)
+        dispatcher.start()
+        try:
+            await dispatcher.send({"event": "call_completed"}, url)
+        finally:
+            await dispatcher.aclose(timeout=0)
+
+    assert len(seen) == 3 and dispatcher.retried == 2 and dispatcher.delivered == 1
+    assert seen[1] - seen[0] >= 0.05 and seen[2] - seen[1] >= 0.1
+
+
+async def test_client_errors_are_not_retried_or_spooled(tmp_path) -> None:
+    async def bad_request(request: web.Request) -> web.Response:
+        return web.Response(status=400, text="missing lead_id")
+
+    async with serve(bad_request) as url:
+        dispatcher = WebhookDispatcher(spool_dir=str(tmp_path / "spool"))
+        dispatcher.start()
+        try:
+            with pytest.raises(WebhookError, match="missing lead_id") as error:
+                await dispatcher.send({"event": "call_completed"}, url)
+            dispatcher.post({"event": "call_completed"}, url)
+        finally:
+            await dispatcher.aclose()
+
+    assert error.value.status == 400 and not error.value.retryable
+    assert dispatcher.retried == 0 and dispatcher.failed == 2
+    assert not os.path.exists(tmp_path / "spool")
+
+
+async def test_each_endpoint_has_its_own_concurrency_limit(tmp_path) -> None:
+    active = peak = 0
+
+    async def slow(request: web.Request) -> web.Response:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return web.Response(status=200)
+
+    async with serve(slow) as url:
+        dispatcher = WebhookDispatcher(
+            spool_dir=str(tmp_path), workers=6, per_endpoint_limit=2
+        )
+        dispatcher.start()
+        try:
+            await asyncio.gather(
+                *(dispatcher.send({"event": i}, url) for i in range(6))
+            )
+        finally:
+            await dispatcher.aclose()
+
+    assert peak == 2 and dispatcher.delivered == 6
+
+
+async def test_a_full_queue_spools_and_the_next_dispatcher_replays(tmp_path) -> None:
+    spool = str(tmp_path / "spool")
+    received: list[int] = []
+
+    async def record(request: web.Request) -> web.Response:
+        received.append((await request.json())["event"])
+        return web.Response(status=200)
+
+    async with serve(record) as url:
+        # not started, so nothing takes deliveries off the queue
+        full = WebhookDispatcher(spool_dir=spool, max_queue=1)
+        full.post({"event": 1}, url)
+        full.post({"event": 2}, url)
+        with pytest.raises(WebhookError, match="spooled"):
+            await full.send({"event": 3}, url)
+        await full.drain(timeout=0)
+
+        assert full.spooled == 3 and received == []
+        assert [record["data"]["event"] for record in read_spool(spool)] == [2, 3, 1]
+
+        replay = WebhookDispatcher(spool_dir=spool)
+        replay.start()
+        await replay.aclose()
+
+    assert sorted(received) == [1, 2, 3] and os.listdir(spool) == []
+
+
+async def test_in_flight_deliveries_are_spooled_at_the_deadline(tmp_path) -> None:
+    release = asyncio.Event()
+    requests = 0
+
+    async def slow_failure(request: web.Request) -> web.Response:
+        nonlocal requests
+        requests += 1
+        await release.wait()
+        return web.Response(status=503)
+
+    spool = str(tmp_path / "spool")
+    async with serve(slow_failure) as url:
+        dispatcher = WebhookDispatcher(spool_dir=spool, base_delay=0.01)
+        dispatcher.start()
+        try:
+            dispatcher.post({"event": "session_closed"}, url)
+            await dispatcher.drain(timeout=0.2)
+
+            assert [record["data"] for record in read_spool(spool)] == [
+                {"event": "session_closed"}
+            ]
+
+            # the request fails after the deadline: it is neither retried nor spooled twice
+            release.set()
+            await asyncio.sleep(0.2)
+            assert requests == 1 and dispatcher.spooled == 1
+        finally:
+            await dispatcher.aclose(timeout=0)